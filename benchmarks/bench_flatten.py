@@ -0,0 +1,110 @@
+"""
+Micro-benchmark: flattening transparent images for JPEG/BMP output.
+
+Compares the original inline code (convert P to RGBA, split() for the
+mask, paste) and expanding every mode to RGBA before one masked paste
+with transforms.flatten_alpha, reporting milliseconds per megapixel,
+how many image buffers Pillow allocated per call (whatever their size:
+an L band is a quarter of an RGB image) and the largest per-channel
+error against a reference alpha_composite.
+
+    python benchmarks/bench_flatten.py [--size 4000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from PIL import Image, ImageChops
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converter.transforms import flatten_alpha  # noqa: E402
+
+
+def legacy_flatten(img):
+    """The JPEG/BMP branch as it was in ImageConverter._convert_thread."""
+    if img.mode not in ('RGBA', 'LA', 'P'):
+        return img.convert('RGB')
+    background = Image.new('RGB', img.size, (255, 255, 255))
+    if img.mode == 'P':
+        img = img.convert('RGBA')
+    background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+    return background
+
+
+def rgba_flatten(img):
+    """Expand to RGBA, then paste with itself as the mask."""
+    img = img if img.mode == 'RGBA' else img.convert('RGBA')
+    background = Image.new('RGB', img.size, (255, 255, 255))
+    background.paste(img, mask=img)
+    return background
+
+
+def reference_flatten(img):
+    white = Image.new('RGBA', img.size, (255, 255, 255, 255))
+    return Image.alpha_composite(white, img.convert('RGBA')).convert('RGB')
+
+
+def max_error(result, reference):
+    return max(high for _, high in ImageChops.difference(result, reference).getextrema())
+
+
+def make_sources(size):
+    gradient = Image.linear_gradient('L').resize((size, size))
+    rgba = Image.merge('RGBA', (gradient, gradient.rotate(90), gradient.rotate(180),
+                                gradient.rotate(270)))
+    palette = rgba.convert('RGB').quantize(255)
+    palette.info['transparency'] = 0
+    pa = palette.convert('PA')
+    pa.putalpha(gradient)
+    return {
+        'RGBA': rgba,
+        'LA': Image.merge('LA', (gradient, gradient.rotate(90))),
+        'P+transparency': palette,
+        'PA': pa,
+    }
+
+
+def measure(func, img, repeat):
+    before = Image.core.get_stats()['new_count']
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(img)
+    elapsed = (time.perf_counter() - start) / repeat
+    buffers = (Image.core.get_stats()['new_count'] - before) / repeat
+    return elapsed, buffers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=4000, help="square image side in px")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    megapixels = args.size * args.size / 1e6
+    print(f"{args.size}x{args.size} ({megapixels:.1f} MP), {args.repeat} runs each\n")
+    print(f"{'mode':<16}{'legacy ms/MP':>14}{'RGBA ms/MP':>12}{'new ms/MP':>11}{'speedup':>9}"
+          f"{'legacy bufs':>13}{'new bufs':>10}{'legacy err':>12}{'new err':>9}")
+
+    for name, img in make_sources(args.size).items():
+        img.load()
+        legacy_time, legacy_bufs = measure(legacy_flatten, img, args.repeat)
+        rgba_time, _ = measure(rgba_flatten, img, args.repeat)
+        new_time, new_bufs = measure(flatten_alpha, img, args.repeat)
+
+        reference = reference_flatten(img)
+        legacy_err = max_error(legacy_flatten(img), reference)
+        new_err = max_error(flatten_alpha(img), reference)
+
+        print(f"{name:<16}{legacy_time * 1000 / megapixels:>14.2f}"
+              f"{rgba_time * 1000 / megapixels:>12.2f}"
+              f"{new_time * 1000 / megapixels:>11.2f}"
+              f"{legacy_time / new_time:>8.1f}x"
+              f"{legacy_bufs:>13.0f}{new_bufs:>10.0f}"
+              f"{legacy_err:>12}{new_err:>9}")
+
+
+if __name__ == "__main__":
+    main()
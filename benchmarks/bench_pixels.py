@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: 16 bit grey scans to 8 bit.
+
+Compares the old path (convert('L'), which clips everything above 255)
+with pixels.to_8bit on a decoded image (NumPy, and the Pillow fallback
+used without it), and with decoding straight to 8 bits from a memory
+map of an uncompressed TIFF. Reports milliseconds per megapixel and the
+largest error against exact rounding of v * 255 / 65535.
+
+    python benchmarks/bench_pixels.py [--width 8000] [--height 6000] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converter.engine import decode_for_targets  # noqa: E402
+from converter.pixels import _to_8bit_numpy, _to_8bit_pillow  # noqa: E402
+
+
+def make_scan(width, height):
+    """A 16 bit grey gradient with sensor-like noise, using the full range."""
+    rng = np.random.default_rng(0)
+    ramp = np.linspace(0, 65535, width)[None, :]
+    noise = rng.normal(0, 400, (height, width))
+    return np.clip(ramp + noise, 0, 65535).astype('<u2')
+
+
+def convert_l(img):
+    return img.convert('L')
+
+
+def decode_legacy(path):
+    with Image.open(path) as img:
+        return img.convert('L')
+
+
+def decode_mapped(path):
+    with Image.open(path) as img:
+        return decode_for_targets(img, [None], path, eight_bit=True)
+
+
+def measure(func, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(arg)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--width", type=int, default=8000)
+    parser.add_argument("--height", type=int, default=6000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    values = make_scan(args.width, args.height)
+    reference = ((values.astype(np.int64) * 255 + 32767) // 65535).astype(np.uint8)
+    megapixels = args.width * args.height / 1e6
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'scan.tif')
+        Image.fromarray(values).save(path)
+        with Image.open(path) as decoded:
+            decoded.load()
+
+        cases = [
+            ('convert (old)', convert_l, decoded),
+            ('Pillow point', _to_8bit_pillow, decoded),
+            ('NumPy', _to_8bit_numpy, decoded),
+            ('decode+convert (old)', decode_legacy, path),
+            ('decode mapped', decode_mapped, path),
+        ]
+
+        print(f"{args.width}x{args.height} ({megapixels:.1f} MP) {decoded.mode}, "
+              f"{args.repeat} runs each\n")
+        print(f"{'path':<22}{'ms/MP':>8}{'max err':>9}")
+        for name, func, arg in cases:
+            elapsed, result = measure(func, arg, args.repeat)
+            error = np.abs(np.asarray(result).astype(int) - reference).max()
+            print(f"{name:<22}{elapsed * 1000 / megapixels:>8.2f}{error:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Deterministic synthetic image corpus for the benchmark suite.
+
+Every image is derived from a seeded random.Random, so the same spec
+always produces byte-identical pixels on any machine.
+"""
+
+import os
+import random
+
+from PIL import Image, ImageChops, ImageDraw
+
+
+# Size classes: (width, height, files per corpus cell)
+SIZES = {
+    'icon': (32, 32, 64),
+    'small': (256, 256, 24),
+    'medium': (1920, 1080, 6),
+    'large': (6000, 4000, 2),
+    'huge': (10000, 10000, 1),
+}
+
+QUICK_SIZES = ('icon', 'small', 'medium')
+
+# Image kinds each source extension can hold
+SOURCE_KINDS = {
+    '.png': ('photo', 'graphic', 'alpha', 'palette'),
+    '.jpg': ('photo', 'graphic'),
+    '.jpeg': ('photo', 'graphic'),
+    '.webp': ('photo', 'graphic', 'alpha'),
+    '.bmp': ('photo', 'graphic', 'palette'),
+    '.tiff': ('photo', 'graphic', 'alpha', 'palette'),
+    '.tif': ('photo', 'graphic', 'alpha'),
+    '.gif': ('graphic', 'palette'),
+    '.ico': ('photo', 'graphic', 'alpha'),
+}
+
+# ICO stores at most 256x256
+MAX_SIDE = {'.ico': 256}
+
+
+def _noise(rng, width, height, mode='RGB'):
+    bands = len(mode)
+    return Image.frombytes(mode, (width, height), rng.randbytes(width * height * bands))
+
+
+def photo(rng, width, height):
+    """Smooth colour fields with fine grain, roughly like a photograph."""
+    base = _noise(rng, 12, 8).resize((width, height), Image.Resampling.BICUBIC)
+    grain = _noise(rng, 256, 256).resize((min(width, 256), min(height, 256)))
+    tiled = Image.new('RGB', (width, height))
+    for x in range(0, width, grain.width):
+        for y in range(0, height, grain.height):
+            tiled.paste(grain, (x, y))
+    return ImageChops.blend(base, tiled, 0.08)
+
+
+def graphic(rng, width, height):
+    """Flat shapes on a plain background, like UI art or diagrams."""
+    img = Image.new('RGB', (width, height), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(24):
+        x1, x2 = sorted(rng.randrange(width) for _ in range(2))
+        y1, y2 = sorted(rng.randrange(height) for _ in range(2))
+        fill = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.rectangle((x1, y1, x2, y2), fill=fill)
+        else:
+            draw.ellipse((x1, y1, x2, y2), fill=fill)
+    return img
+
+
+def make_image(kind, rng, width, height):
+    if kind == 'photo':
+        return photo(rng, width, height)
+    if kind == 'graphic':
+        return graphic(rng, width, height)
+    if kind == 'alpha':
+        img = photo(rng, width, height).convert('RGBA')
+        img.putalpha(Image.linear_gradient('L').resize((width, height)))
+        return img
+    if kind == 'palette':
+        img = graphic(rng, width, height).quantize(64)
+        img.info['transparency'] = 0
+        return img
+    raise ValueError(f"Unknown image kind: {kind}")
+
+
+def cell_dir(root, ext, size_name):
+    return os.path.join(root, ext.lstrip('.'), size_name)
+
+
+def build_cell(root, ext, size_name, seed=0):
+    """Create (or reuse) the files for one source extension and size class."""
+    folder = cell_dir(root, ext, size_name)
+    width, height, count = SIZES[size_name]
+    limit = MAX_SIDE.get(ext)
+    if limit:
+        width, height = min(width, limit), min(height, limit)
+
+    kinds = SOURCE_KINDS[ext]
+    marker = os.path.join(folder, '.complete')
+    if os.path.exists(marker):
+        return folder
+
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(f"{seed}:{ext}:{size_name}")
+    for index in range(count):
+        kind = kinds[index % len(kinds)]
+        img = make_image(kind, rng, width, height)
+        if ext in ('.jpg', '.jpeg'):
+            img.save(os.path.join(folder, f"{index:03d}-{kind}{ext}"), quality=90)
+        else:
+            img.save(os.path.join(folder, f"{index:03d}-{kind}{ext}"))
+
+    with open(marker, 'w') as f:
+        f.write(f"{seed}\n")
+    return folder
@@ -0,0 +1,213 @@
+"""
+Benchmark suite for the conversion engine.
+
+Generates a deterministic synthetic corpus (see corpus.py), converts
+every (source, size, target, quality, workers) combination through the
+headless CLI in a fresh process, and records images/s, MP/s, peak RSS
+and output bytes. Results can be saved as a baseline; later runs are
+compared against it and regressions are flagged (exit status 1).
+
+    python benchmarks/suite.py                     # quick sizes, compare to baseline
+    python benchmarks/suite.py --save-baseline     # record a new baseline
+    python benchmarks/suite.py --full --workers 1,8 --targets WebP,JPEG
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import corpus  # noqa: E402
+from converter.formats import INPUT_EXTENSIONS, SUPPORTED_FORMATS  # noqa: E402
+
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_CORPUS = os.path.join(tempfile.gettempdir(), "elsakr-bench-corpus")
+
+# Metrics compared against the baseline: (key, higher is better)
+METRICS = (
+    ('images_per_second', True),
+    ('megapixels_per_second', True),
+    ('peak_rss_mb', False),
+    ('output_bytes', False),
+)
+
+
+def case_id(case):
+    return (f"{case['source']}:{case['size']}->{case['target']}"
+            f"@q{case['quality']}/j{case['workers']}")
+
+
+def peak_child_rss_mb():
+    """Largest RSS of any reaped child process, in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 if sys.platform != 'darwin' else peak / (1024 * 1024)
+
+
+def measure(case):
+    """Run one case through the CLI. Executed in its own process so the
+    RSS high-water mark only covers this case."""
+    out_dir = tempfile.mkdtemp(prefix="elsakr-bench-out-")
+    report_path = os.path.join(out_dir, "report.json")
+    try:
+        command = [sys.executable, "-m", "converter", case['folder'],
+                   "-f", case['target'], "-q", str(case['quality']),
+                   "-j", str(case['workers']), "-o", out_dir,
+                   "--report", report_path, "--quiet"]
+        subprocess.run(command, cwd=REPO_ROOT, check=False,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        with open(report_path, encoding='utf-8') as f:
+            summary = json.load(f)['summary']
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    return {
+        'images': summary['converted'],
+        'failed': summary['failed'],
+        'wall_seconds': summary['wall_seconds'],
+        'images_per_second': summary['images_per_second'],
+        'megapixels_per_second': summary['megapixels_per_second'],
+        'peak_rss_mb': peak_child_rss_mb(),
+        'output_bytes': summary['output_bytes'],
+    }
+
+
+def run_case(case):
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__),
+                                "--measure", json.dumps(case)],
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout)
+
+
+def compare(results, baseline, threshold, bytes_threshold):
+    """List (case, metric, baseline, current) for every regression."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            limit = bytes_threshold if metric == 'output_bytes' else threshold
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > limit:
+                regressions.append((key, metric, old, new))
+    return regressions
+
+
+def split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the conversion engine.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS,
+                        help="where the synthetic corpus is generated and cached")
+    parser.add_argument("--sources", type=split_list,
+                        default=[ext.lstrip('.') for ext in INPUT_EXTENSIONS],
+                        help="source extensions, comma separated")
+    parser.add_argument("--targets", type=split_list, default=list(SUPPORTED_FORMATS),
+                        help="target formats, comma separated")
+    parser.add_argument("--sizes", type=split_list, default=list(corpus.QUICK_SIZES),
+                        help=f"size classes ({', '.join(corpus.SIZES)})")
+    parser.add_argument("--full", action="store_true",
+                        help="include every size class, up to 100MP")
+    parser.add_argument("--qualities", type=split_list, default=["85"])
+    parser.add_argument("--workers", type=split_list,
+                        default=["1", str(os.cpu_count() or 1)])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed relative slowdown / RSS growth (default: 0.10)")
+    parser.add_argument("--bytes-threshold", type=float, default=0.01,
+                        help="allowed relative growth of output bytes (default: 0.01)")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.measure:
+        print(json.dumps(measure(json.loads(args.measure))))
+        return 0
+
+    sizes = list(corpus.SIZES) if args.full else args.sizes
+    cases = []
+    for source in args.sources:
+        ext = '.' + source.lower()
+        for size in sizes:
+            folder = corpus.build_cell(args.corpus, ext, size)
+            for target in args.targets:
+                for quality in args.qualities:
+                    for workers in dict.fromkeys(args.workers):
+                        cases.append({'source': source, 'size': size, 'target': target,
+                                      'quality': int(quality), 'workers': int(workers),
+                                      'folder': folder})
+
+    print(f"{'case':<34}{'img/s':>9}{'MP/s':>9}{'peak MB':>9}{'out bytes':>12}")
+    results = {}
+    for case in cases:
+        key = case_id(case)
+        result = run_case(case)
+        results[key] = result
+        rss = f"{result['peak_rss_mb']:.0f}" if result['peak_rss_mb'] is not None else "-"
+        print(f"{key:<34}{result['images_per_second']:>9.1f}"
+              f"{result['megapixels_per_second']:>9.1f}{rss:>9}{result['output_bytes']:>12}"
+              + (f"  ({result['failed']} failed)" if result['failed'] else ""))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline yet; run with --save-baseline to record one.")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.bytes_threshold)
+    if not regressions:
+        print("\nNo regressions against the baseline.")
+        return 0
+
+    print("\nREGRESSIONS:")
+    for key, metric, old, new in regressions:
+        print(f"  {key:<34}{metric:<24}{old:>12.2f} -> {new:.2f}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
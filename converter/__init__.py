@@ -0,0 +1,67 @@
+"""
+Elsakr Image Converter - conversion engine package.
+"""
+
+from .engine import (
+    ConversionEngine,
+    ConversionResult,
+    ConversionSettings,
+    JobCancelled,
+    convert_file,
+    default_workers,
+    output_path_for,
+)
+from .distributed import Coordinator, Worker
+from .filestore import FileStore
+from .formats import INPUT_EXTENSIONS, SUPPORTED_FORMATS
+from .jobs import Job, JobQueue
+from .lossless import default_encoder_cache_path, encode_smallest
+from .manifest import Manifest, default_manifest_path
+from .output import COLLISION_POLICIES, OutputPlanner, write_atomic
+from .preflight import Preflight, RunHistory, default_history_path
+from .probe import ProbeCache, SourceInfo, probe_file
+from .profiles import OutputProfile, load_job, parse_profile
+from .report import RunReport, format_duration
+from .scanner import FolderScanner, scan_folder
+from .thumbnails import ThumbnailCache, ThumbnailLoader, default_thumbnail_dir, split_view
+
+__all__ = [
+    "COLLISION_POLICIES",
+    "INPUT_EXTENSIONS",
+    "SUPPORTED_FORMATS",
+    "ConversionEngine",
+    "ConversionResult",
+    "ConversionSettings",
+    "Coordinator",
+    "FileStore",
+    "FolderScanner",
+    "Job",
+    "JobCancelled",
+    "JobQueue",
+    "Manifest",
+    "OutputPlanner",
+    "OutputProfile",
+    "Preflight",
+    "ProbeCache",
+    "RunHistory",
+    "RunReport",
+    "SourceInfo",
+    "ThumbnailCache",
+    "ThumbnailLoader",
+    "Worker",
+    "convert_file",
+    "default_encoder_cache_path",
+    "default_history_path",
+    "default_manifest_path",
+    "default_thumbnail_dir",
+    "default_workers",
+    "encode_smallest",
+    "format_duration",
+    "load_job",
+    "output_path_for",
+    "parse_profile",
+    "probe_file",
+    "scan_folder",
+    "split_view",
+    "write_atomic",
+]
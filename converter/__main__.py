@@ -0,0 +1,11 @@
+"""
+Run the converter from the command line: python -m converter
+"""
+
+import sys
+
+from .cli import main
+
+
+if __name__ == "__main__":
+    sys.exit(main())
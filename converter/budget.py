@@ -0,0 +1,87 @@
+"""
+Memory estimates used to bound how much decoded image data is in flight.
+"""
+
+from PIL import Image
+
+from .formats import AUTO_FORMAT
+from .frames import frame_count, keeps_frames
+from .mapped import MAP_BAND_BYTES, raw_layout, reduce_factor
+from .profiles import profile_targets
+
+
+# Bytes per band for the modes whose bands aren't 8 bit
+BAND_BYTES = {
+    'I': 4, 'F': 4, 'I;16': 2, 'I;16B': 2, 'I;16L': 2, 'I;16N': 2,
+}
+
+# Peak number of full-size copies alive while a file is converted
+# (the decoded image plus one mode-converted or resized copy).
+WORKING_COPIES = 2
+
+# Extra output-sized copies an Auto output holds while it picks an
+# encoding (a palette copy and the decoded winner it checks)
+AUTO_COPIES = 2
+
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(text):
+    """Parse a byte count such as '512M' or '4G'."""
+    text = text.strip().upper().rstrip('B')
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ''
+    number = text[:-1] if unit else text
+    return int(float(number) * SIZE_UNITS[unit])
+
+
+def decoded_size(size, mode, image_format=None, targets=(), mapped=False):
+    """Estimated bytes of the decoded raster (width x height x bands).
+
+    targets are the sizes the image will be scaled to; a JPEG is only
+    drafted down, and a mapped raw raster reduced, if every one of them
+    is smaller than the image.
+    """
+    width, height = size
+
+    if targets and None not in targets and image_format == 'JPEG':
+        # draft() lets libjpeg decode at 1/2, 1/4 or 1/8 scale
+        ratio = min(min(width // w, height // h) for w, h in targets)
+        scale = next((s for s in (8, 4, 2) if s <= ratio), 1)
+        width, height = -(-width // scale), -(-height // scale)
+    elif mapped:
+        # Reduced band by band straight from the memory map
+        scale = reduce_factor(size, targets)
+        width, height = -(-width // scale), -(-height // scale)
+
+    return width * height * Image.getmodebands(mode) * BAND_BYTES.get(mode, 1)
+
+
+def header_memory(img, mappable, settings):
+    """Peak bytes converting a source with this header is expected to need.
+
+    img is an opened (not loaded) Image or a probe.SourceInfo; mappable
+    says whether its raster is one uncompressed block. The decoded image
+    is shared, but every output profile works on its own copy at the
+    same time. Animated GIF outputs also hold every frame (one byte per
+    pixel) until the end, as Pillow's GIF writer does, and Auto outputs
+    a couple more copies while they compare encodings.
+    """
+    targets = profile_targets(img.size, settings.profiles)
+    mapped = mappable and reduce_factor(img.size, targets) >= 2
+    raster = decoded_size(img.size, img.mode, img.format, targets, mapped)
+    if mapped:
+        raster += MAP_BAND_BYTES
+    extra = 0
+    for profile, target in zip(settings.profiles, targets):
+        if profile.output_format == 'GIF' and keeps_frames(img, 'GIF'):
+            width, height = target or img.size
+            extra += frame_count(img) * width * height
+        elif profile.output_format == AUTO_FORMAT:
+            extra += AUTO_COPIES * decoded_size(target or img.size, img.mode)
+    return raster * (WORKING_COPIES - 1 + len(settings.profiles)) + extra
+
+
+def estimate_memory(filepath, settings):
+    """header_memory() of filepath. Only the header is read; Image.open doesn't decode."""
+    with Image.open(filepath) as img:
+        return header_memory(img, raw_layout(img) is not None, settings)
@@ -0,0 +1,395 @@
+"""
+Headless command line interface for the conversion engine.
+
+Only imports the engine, never tkinter, so it works on machines without
+a display.
+
+    python -m converter INPUTS... [options]      convert here
+    python -m converter INPUTS... --coordinate HOST:PORT [options]
+                                                 hand the files out to workers
+    python -m converter worker HOST:PORT         convert for a coordinator
+"""
+
+import argparse
+import os
+import sys
+from multiprocessing import AuthenticationError
+
+from PIL import ImageColor
+
+from .budget import parse_size
+from . import formats
+from .distributed import (CHUNK_FILES, LEASE_SECONDS, Coordinator, Worker, new_token,
+                          parse_address)
+from .engine import ConversionEngine, ConversionSettings, default_workers
+from .lossless import default_encoder_cache_path
+from .manifest import Manifest, default_manifest_path
+from .preflight import RunHistory, default_history_path
+from .output import COLLISION_POLICIES
+from .profiles import load_job, parse_profile
+from .report import RunReport
+from .scanner import scan_folder
+from .transforms import RESIZE_MODES
+
+
+# Token shared by a coordinator and its workers, unless --token is given
+TOKEN_ENV = "ELSAKR_CONVERTER_TOKEN"
+
+
+def format_name(value):
+    try:
+        return formats.format_name(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def profile_value(value):
+    try:
+        return parse_profile(value)
+    except (ValueError, TypeError) as e:
+        raise argparse.ArgumentTypeError(f"invalid profile '{value}': {e}")
+
+
+def quality_value(value):
+    quality = int(value)
+    if not 1 <= quality <= 100:
+        raise argparse.ArgumentTypeError("quality must be between 1 and 100")
+    return quality
+
+
+def color_value(value):
+    try:
+        return ImageColor.getrgb(value)[:3]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid colour '{value}'")
+
+
+def memory_size(value):
+    try:
+        size = parse_size(value)
+    except (ValueError, IndexError):
+        raise argparse.ArgumentTypeError(f"invalid size '{value}'")
+    if size <= 0:
+        raise argparse.ArgumentTypeError("size must be positive")
+    return size
+
+
+def address_value(value):
+    try:
+        return parse_address(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid address '{value}' (expected HOST:PORT)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m converter",
+        description="Batch convert images between formats.")
+    parser.add_argument("inputs", nargs="+",
+                        help="image files or folders to convert")
+    parser.add_argument("-f", "--format", type=format_name, default="PNG",
+                        help="output format (default: PNG); 'auto' writes the smallest "
+                             "lossless PNG or WebP of each image")
+    parser.add_argument("-q", "--quality", type=quality_value, default=85,
+                        help="JPEG/WebP quality 1-100 (default: 85)")
+    parser.add_argument("--profile", type=profile_value, action="append", dest="profiles",
+                        metavar="SPEC",
+                        help="write an extra output per source (repeatable), e.g. "
+                             "format=webp,quality=80,max_width=1920,suffix=-1920; "
+                             "replaces -f/-q and the resize and quality search options")
+    parser.add_argument("--job", metavar="PATH",
+                        help="JSON file with a list of output profiles, "
+                             'e.g. {"profiles": [{"format": "WebP", "suffix": "-web"}]}')
+    parser.add_argument("-j", "--jobs", type=int, default=default_workers(),
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--max-bytes", type=memory_size, metavar="SIZE",
+                        help="JPEG/WebP: lower the quality per image until it fits, e.g. 200K")
+    parser.add_argument("--target-psnr", type=float, metavar="DB",
+                        help="JPEG/WebP: use the lowest quality that still reaches this PSNR")
+    parser.add_argument("--max-width", type=int, metavar="PX",
+                        help="downscale images wider than this")
+    parser.add_argument("--max-height", type=int, metavar="PX",
+                        help="downscale images taller than this")
+    parser.add_argument("--resize-mode", choices=RESIZE_MODES, default="fit",
+                        help="fit inside the max size, or fill it and crop (default: fit)")
+    parser.add_argument("--background", type=color_value, default=(255, 255, 255),
+                        metavar="COLOR",
+                        help="colour transparency is flattened onto for JPEG/BMP "
+                             "(default: white)")
+    parser.add_argument("--srgb", action="store_true",
+                        help="convert images with an embedded colour profile to sRGB")
+    parser.add_argument("--strip-metadata", action="store_true",
+                        help="leave EXIF and XMP (camera details, GPS position) out of "
+                             "the outputs; the colour profile is kept")
+    parser.add_argument("-o", "--output-dir",
+                        help="write outputs here instead of next to the sources; "
+                             "the structure of input folders is mirrored")
+    parser.add_argument("--on-collision", choices=COLLISION_POLICIES, default="suffix",
+                        help="when two outputs, or an output and a source, would share a "
+                             "name: add -1, -2... (default), skip, or overwrite")
+    parser.add_argument("--fsync", action="store_true",
+                        help="flush every output to disk before renaming it into place")
+    parser.add_argument("--include", action="append", metavar="GLOB",
+                        help="only convert files matching this pattern (repeatable)")
+    parser.add_argument("--exclude", action="append", metavar="GLOB",
+                        help="skip files and folders matching this pattern (repeatable)")
+    parser.add_argument("--max-depth", type=int, metavar="N",
+                        help="how many folder levels to descend (0 = top level only)")
+    parser.add_argument("--memory-budget", type=memory_size, metavar="SIZE",
+                        help="cap on decoded image data in flight, e.g. 2G or 512M")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="read up to N source files ahead on I/O threads and write "
+                             "outputs from them too; helps on network shares")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="convert identical source files once and link the other outputs")
+    parser.add_argument("--incremental", action="store_true",
+                        help="skip files whose output is already up to date")
+    parser.add_argument("--manifest", metavar="PATH",
+                        help="manifest used by --incremental "
+                             "(default: ~/.elsakr-converter/manifest.db)")
+    parser.add_argument("--hash", action="store_true",
+                        help="with --incremental, compare file contents when only "
+                             "the modification time changed")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only check the files' headers and print the estimated "
+                             "output size and run time")
+    parser.add_argument("--coordinate", type=address_value, metavar="HOST:PORT",
+                        help="don't convert here: listen on HOST:PORT and hand the files "
+                             "out in chunks to 'python -m converter worker' processes, which "
+                             "must see the same paths (e.g. a shared folder)")
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV),
+                        help=f"with --coordinate, the secret workers connect with "
+                             f"(default: ${TOKEN_ENV}, or a new one that is printed)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_FILES, metavar="N",
+                        help=f"with --coordinate, files per chunk (default: {CHUNK_FILES})")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS, metavar="SECONDS",
+                        help="with --coordinate, how long a silent worker keeps its chunk "
+                             f"before it's handed to another (default: {LEASE_SECONDS:g})")
+    parser.add_argument("--report", metavar="PATH",
+                        help="write per-file timings and a summary (.json or .csv)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="only print errors and the final summary")
+    return parser
+
+
+def build_worker_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m converter worker",
+        description="Convert chunks of a batch handed out by a coordinator "
+                    "(python -m converter ... --coordinate HOST:PORT).")
+    parser.add_argument("address", type=address_value, metavar="HOST:PORT",
+                        help="the coordinator's address")
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV),
+                        help=f"the coordinator's secret (default: ${TOKEN_ENV})")
+    parser.add_argument("-j", "--jobs", type=int, default=default_workers(),
+                        help="worker processes on this machine (default: CPU count)")
+    parser.add_argument("--memory-budget", type=memory_size, metavar="SIZE",
+                        help="cap on decoded image data in flight, e.g. 2G or 512M")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="read up to N source files ahead on I/O threads")
+    parser.add_argument("--name", help="shown by the coordinator (default: host:pid)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="only print errors and the final summary")
+    return parser
+
+
+def worker_main(argv):
+    args = build_worker_parser().parse_args(argv)
+    if not args.token:
+        print(f"A token is needed: pass --token or set {TOKEN_ENV}.", file=sys.stderr)
+        return 1
+
+    counts = {'converted': 0, 'skipped': 0, 'failed': 0}
+
+    def show(result):
+        if result.skipped:
+            counts['skipped'] += 1
+        elif result.ok:
+            counts['converted'] += 1
+            if not args.quiet:
+                print(f"{result.source} -> {result.output}")
+        else:
+            counts['failed'] += 1
+            print(f"Error converting {result.source}: {result.error}", file=sys.stderr)
+
+    worker = Worker(args.address, args.token, workers=args.jobs,
+                    memory_budget=args.memory_budget, prefetch=args.prefetch, name=args.name)
+    try:
+        worker.run(show)
+    except AuthenticationError:
+        print("The coordinator rejected the token.", file=sys.stderr)
+        return 1
+    except (ConnectionError, OSError) as e:
+        print(f"Can't reach the coordinator at {args.address[0]}:{args.address[1]}: {e}",
+              file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        # The coordinator hands our chunk to another worker
+        worker.cancel()
+        print("Cancelled.", file=sys.stderr)
+        return 130
+    print(f"Chunks: {worker.chunks}  Converted: {counts['converted']}  "
+          f"Failed: {counts['failed']}")
+    return 0
+
+
+def collect_files(inputs, include=None, exclude=None, max_depth=None):
+    """Expand folders (recursively) into the image files they contain."""
+    files = []
+    seen = set()
+    for path in inputs:
+        if os.path.isdir(path):
+            candidates = [found for found, _ in scan_folder(
+                path, include=include, exclude=exclude, max_depth=max_depth)]
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            if candidate not in seen:
+                seen.add(candidate)
+                files.append(candidate)
+    return files
+
+
+def start_coordinator(args, settings, files, manifest):
+    """Listen for workers and print how to start them; None if that fails."""
+    if args.dedupe or args.dry_run:
+        print("--dedupe and --dry-run can't be used with --coordinate.", file=sys.stderr)
+        return None
+    try:
+        coordinator = Coordinator(settings, files, args.coordinate,
+                                  token=args.token or new_token(), manifest=manifest,
+                                  chunk_files=args.chunk_size, lease_seconds=args.lease)
+    except OSError as e:
+        print(f"Can't listen on {args.coordinate[0]}:{args.coordinate[1]}: {e}",
+              file=sys.stderr)
+        return None
+    host, port = coordinator.address
+    print(f"Waiting for workers on {host}:{port}")
+    if not args.token:
+        print(f"Start them with: python -m converter worker {host}:{port} "
+              f"--token {coordinator.token}")
+    return coordinator
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ["worker"]:
+        return worker_main(argv[1:])
+    args = build_parser().parse_args(argv)
+
+    files = collect_files(args.inputs, include=args.include, exclude=args.exclude,
+                          max_depth=args.max_depth)
+    if not files:
+        print("No images found.", file=sys.stderr)
+        return 1
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    manifest = None
+    if args.incremental or args.manifest:
+        manifest = Manifest(args.manifest or default_manifest_path(), use_hash=args.hash)
+
+    profiles = list(args.profiles or [])
+    if args.job:
+        try:
+            profiles.extend(load_job(args.job))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Invalid job file {args.job}: {e}", file=sys.stderr)
+            return 1
+
+    roots = [path for path in args.inputs if os.path.isdir(path)]
+    try:
+        settings = ConversionSettings(args.format, args.quality, output_folder=args.output_dir,
+                                      source_roots=roots, max_width=args.max_width,
+                                      max_height=args.max_height,
+                                      resize_mode=args.resize_mode,
+                                      background=args.background, max_bytes=args.max_bytes,
+                                      target_psnr=args.target_psnr,
+                                      profiles=profiles or None,
+                                      collision=args.on_collision, fsync=args.fsync,
+                                      srgb=args.srgb, strip_metadata=args.strip_metadata,
+                                      encoder_cache=default_encoder_cache_path())
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    history = RunHistory(default_history_path())
+    if args.coordinate:
+        runner = start_coordinator(args, settings, files, manifest)
+        if runner is None:
+            if manifest is not None:
+                manifest.close()
+            return 1
+        results = runner.iter_results()
+    else:
+        runner = ConversionEngine(settings, workers=args.jobs, manifest=manifest,
+                                  memory_budget=args.memory_budget, dedupe=args.dedupe,
+                                  prefetch=args.prefetch, history=history)
+        plan = runner.preflight(files)
+        if args.dry_run:
+            if manifest is not None:
+                manifest.close()
+            for info in plan.rejected:
+                print(f"Rejected {info.path}: {info.error}", file=sys.stderr)
+            print(plan.summary_text())
+            return 1 if plan.rejected else 0
+        if not args.quiet:
+            print(f"Pre-flight: {plan.summary_text()}")
+        results = runner.iter_results(files)
+
+    report = RunReport()
+    total = len(files) * runner.outputs_per_file
+    converted = 0
+    skipped = 0
+    failed = 0
+    saved_bytes = 0
+
+    cancelled = False
+    try:
+        for done, result in enumerate(results, 1):
+            report.add(result)
+            if result.skipped:
+                skipped += 1
+                if result.error and not args.quiet:
+                    print(f"Skipped {result.source}: {result.error}")
+            elif result.ok:
+                converted += 1
+                saved_bytes += result.saved_bytes
+                if not args.quiet:
+                    print(f"[{done}/{total}] {result.source} -> {result.output}")
+            else:
+                failed += 1
+                print(f"Error converting {result.source}: {result.error}", file=sys.stderr)
+    except KeyboardInterrupt:
+        # Workers drop their files at the next stage instead of finishing them
+        runner.cancel()
+        cancelled = True
+    finally:
+        report.finish()
+        if manifest is not None:
+            manifest.close()
+
+    if not cancelled:
+        history.add_report(report)
+        try:
+            history.save()
+        except OSError:
+            pass
+
+    if args.report:
+        report.write(args.report)
+    print(report.summary_text())
+
+    if args.dedupe:
+        stats = runner.dedup_stats
+        print(f"Duplicates: {stats['duplicates']}  "
+              f"avoided {stats['bytes_avoided'] / (1024 * 1024):.2f} MB "
+              f"and {stats['seconds_avoided']:.1f} s of encoding")
+
+    saved_mb = saved_bytes / (1024 * 1024)
+    print(f"Converted: {converted}  Skipped: {skipped}  Failed: {failed}  "
+          f"Saved: {saved_mb:.2f} MB")
+    if cancelled:
+        print("Cancelled.", file=sys.stderr)
+        return 130
+    return 1 if failed else 0
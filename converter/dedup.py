@@ -0,0 +1,98 @@
+"""
+Content-based de-duplication of source files.
+"""
+
+import hashlib
+import os
+import shutil
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .manifest import file_hash
+
+
+PARTIAL_BYTES = 64 * 1024
+
+
+def partial_hash(path, size, chunk=PARTIAL_BYTES):
+    """Cheap fingerprint from the first and last chunk of a file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(chunk))
+        if size > 2 * chunk:
+            f.seek(-chunk, os.SEEK_END)
+            digest.update(f.read(chunk))
+    return digest.hexdigest()
+
+
+def _refine(groups, key_func, io_threads):
+    """Split each group of candidate duplicates by key_func(path, size)."""
+    candidates = [(path, size) for group in groups for path, size in group]
+    refined = defaultdict(list)
+    with ThreadPoolExecutor(max_workers=io_threads) as pool:
+        keys = pool.map(lambda item: _safe_key(key_func, *item), candidates)
+        for (path, size), key in zip(candidates, keys):
+            if key is not None:
+                refined[(size, key)].append((path, size))
+    return [group for group in refined.values() if len(group) > 1]
+
+
+def _safe_key(key_func, path, size):
+    try:
+        return key_func(path, size)
+    except OSError:
+        return None
+
+
+def find_duplicates(files, io_threads=8):
+    """Group files with identical contents.
+
+    Returns (unique, duplicates): unique keeps the first path of every
+    distinct file in the original order, and duplicates maps each of
+    those to the other paths with the same bytes. Paths that are the
+    same file on disk (symlinks, hard links) are matched by inode; the
+    rest are narrowed by size, then a partial hash, then a full hash.
+    """
+    files = list(files)
+    by_size = defaultdict(list)
+    by_inode = {}
+    duplicates = defaultdict(list)
+
+    for path in files:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        inode = (st.st_dev, st.st_ino)
+        if st.st_ino and inode in by_inode:
+            duplicates[by_inode[inode]].append(path)
+            continue
+        by_inode[inode] = path
+        by_size[st.st_size].append((path, st.st_size))
+
+    groups = [group for group in by_size.values() if len(group) > 1]
+    groups = _refine(groups, partial_hash, io_threads)
+    groups = _refine(groups, lambda path, size: file_hash(path), io_threads)
+
+    order = {path: index for index, path in enumerate(files)}
+    for group in groups:
+        paths = sorted((path for path, _ in group), key=order.get)
+        for path in paths[1:]:
+            # Its own aliases (links to the same inode) follow it
+            duplicates[paths[0]].extend([path, *duplicates.pop(path, ())])
+
+    duplicated = {dup for dups in duplicates.values() for dup in dups}
+    unique = [path for path in files if path not in duplicated]
+    return unique, dict(duplicates)
+
+
+def link_or_copy(source, target):
+    """Make target a hard link to source, or a copy if linking fails."""
+    if os.path.abspath(source) == os.path.abspath(target):
+        return
+    temp = target + ".dedup-tmp"
+    try:
+        os.link(source, temp)
+    except OSError:
+        shutil.copyfile(source, temp)
+    os.replace(temp, target)
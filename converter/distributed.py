@@ -0,0 +1,391 @@
+"""
+Distributed conversion: a coordinator leases chunks of a batch to workers.
+
+Workers can run on other machines, as long as every machine sees the
+sources and the output folder at the same paths (e.g. one share mounted
+in the same place everywhere). Messages are pickled over
+multiprocessing.connection sockets that check a shared token, so only
+run this on a network you trust.
+"""
+
+import copy
+import itertools
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+from collections import deque
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from .engine import ConversionEngine
+from .output import OutputPlanner
+from .probe import ProbeCache
+
+
+DEFAULT_PORT = 47800
+
+# Files handed to a worker at a time
+CHUNK_FILES = 200
+
+# A worker that hasn't renewed its lease for this long loses the chunk
+LEASE_SECONDS = 120
+
+# Workers a chunk may be lost with before its files are failed instead
+MAX_ATTEMPTS = 3
+
+# How long a worker waits before asking again when every chunk is leased
+WAIT_SECONDS = 1.0
+
+# Chunks planned ahead per connected worker
+PLAN_AHEAD = 2
+
+
+def parse_address(text, default_host='127.0.0.1'):
+    """(host, port) from 'host:port', 'host' or ':port'."""
+    if ':' not in text:
+        return text, DEFAULT_PORT
+    host, _, port = text.rpartition(':')
+    return host or default_host, int(port)
+
+
+def new_token():
+    return secrets.token_hex(16)
+
+
+class Chunk:
+    """Files leased to one worker at a time, with their planned outputs."""
+
+    def __init__(self, number, tasks):
+        self.number = number
+        # [(filepath, {profile index: output path})]
+        self.tasks = tasks
+        self.owner = None
+        self.deadline = 0.0
+        self.attempts = 0
+
+
+class Coordinator:
+    """Plans a batch and leases it out to Workers in chunks.
+
+    Output paths are planned here for the whole batch, in batch order,
+    so outputs never collide across workers. Outputs a Manifest says are
+    current are reported as skipped without being handed out, and every
+    success is recorded in it. Chunks are planned a few at a time ahead
+    of the workers, so a batch of millions doesn't have to be planned
+    before the first one starts.
+
+    A leased chunk is renewed by its worker while it converts. When the
+    worker disconnects, or its lease runs out (it hung, or its machine
+    dropped off the network), the chunk goes back to the front of the
+    queue. A chunk that has lost MAX_ATTEMPTS workers is failed instead,
+    so one file that kills its worker can't take every node down in turn.
+
+    iter_results() yields the results as workers report them and returns
+    once every chunk is done. Workers connect to self.address with
+    self.token.
+    """
+
+    def __init__(self, settings, files, address=('127.0.0.1', DEFAULT_PORT), token=None,
+                 manifest=None, chunk_files=CHUNK_FILES, lease_seconds=LEASE_SECONDS):
+        # Workers may run elsewhere, where only absolute paths mean the same
+        if settings.output_folder:
+            settings = copy.copy(settings)
+            settings.output_folder = os.path.abspath(settings.output_folder)
+        self.settings = settings
+        self.files = [os.path.abspath(filepath) for filepath in files]
+        self.token = token or new_token()
+        self.chunk_files = max(1, chunk_files)
+        self.lease_seconds = lease_seconds
+        self.manifest = manifest
+        self.connected = 0
+        # Chunks each worker (by name) has finished
+        self.workers = {}
+        self._engine = ConversionEngine(settings, workers=1, manifest=manifest)
+        self._planner = OutputPlanner(self.files, settings.collision)
+        self._keys = [settings.cache_key(index) for index in range(len(settings.profiles))]
+        self._unplanned = iter(self.files)
+        self._planned_all = False
+        self._numbers = itertools.count()
+        self._chunks = {}
+        self._waiting = deque()
+        self._incoming = queue.Queue()
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._listener = Listener(address, authkey=self.token.encode())
+        self.address = self._listener.address
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def outputs_per_file(self):
+        return len(self.settings.profiles)
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except (AuthenticationError, EOFError, ConnectionError):
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        """Answer one worker's requests until it disconnects."""
+        owner = object()
+        name = None
+        with self._lock:
+            self._connections.add(conn)
+            self.connected += 1
+        try:
+            while True:
+                message = conn.recv()
+                kind = message[0]
+                if kind == 'hello':
+                    name = message[1]
+                    conn.send(('settings', self.settings, self.lease_seconds))
+                elif kind == 'claim':
+                    conn.send(self._claim(owner))
+                elif kind == 'renew':
+                    conn.send(self._renew(owner, message[1]))
+                elif kind == 'results':
+                    self._complete(message[1], message[2], name)
+                    conn.send(('ok',))
+                else:
+                    conn.send(('error', f"unknown request '{kind}'"))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            with self._lock:
+                self._connections.discard(conn)
+                self.connected -= 1
+                lost = [chunk for chunk in self._chunks.values() if chunk.owner is owner]
+                for chunk in lost:
+                    self._requeue(chunk)
+
+    def _claim(self, owner):
+        with self._lock:
+            if self._waiting:
+                chunk = self._waiting.popleft()
+                chunk.owner = owner
+                chunk.attempts += 1
+                chunk.deadline = time.monotonic() + self.lease_seconds
+                return ('chunk', chunk.number, chunk.tasks)
+            if self._planned_all and not self._chunks:
+                return ('done',)
+            return ('wait', WAIT_SECONDS)
+
+    def _renew(self, owner, number):
+        with self._lock:
+            chunk = self._chunks.get(number)
+            if chunk is None or chunk.owner is not owner:
+                # Finished by another worker, or taken back when the lease ran out
+                return ('lost',)
+            chunk.deadline = time.monotonic() + self.lease_seconds
+            return ('ok',)
+
+    def _complete(self, number, results, name):
+        """Take a chunk's results; the first worker to report a chunk wins."""
+        with self._lock:
+            chunk = self._chunks.pop(number, None)
+            if chunk is None:
+                return
+            if chunk.owner is None:
+                # Its lease had run out, but it finished before anyone else
+                self._waiting.remove(chunk)
+            self.workers[name] = self.workers.get(name, 0) + 1
+            # Queued before the lock is released, so the run can't look finished without them
+            self._incoming.put(results)
+
+    def _requeue(self, chunk):
+        """Put a lost chunk back at the front, or fail it. Call with the lock held."""
+        chunk.owner = None
+        if chunk.attempts < MAX_ATTEMPTS:
+            self._waiting.appendleft(chunk)
+            return
+        del self._chunks[chunk.number]
+        error = f"lost {chunk.attempts} workers while converting this file's chunk"
+        self._incoming.put([result for filepath, outputs in chunk.tasks
+                            for result in self._engine._error_results(filepath, outputs,
+                                                                      error)])
+
+    def _reap(self):
+        """Take back chunks whose lease has run out."""
+        now = time.monotonic()
+        with self._lock:
+            for chunk in list(self._chunks.values()):
+                if chunk.owner is not None and chunk.deadline < now:
+                    self._requeue(chunk)
+
+    def _plan_chunks(self):
+        """Plan chunks until each connected worker has a few waiting.
+
+        Yields the skipped results (current outputs, name collisions)
+        found on the way.
+        """
+        while not self._planned_all:
+            with self._lock:
+                if len(self._waiting) >= PLAN_AHEAD * max(1, self.connected):
+                    return
+            tasks = []
+            for filepath in self._unplanned:
+                skipped, outputs, _ = self._engine._plan(filepath, self._planner, self._keys)
+                yield from skipped
+                if outputs:
+                    tasks.append((filepath, outputs))
+                    if len(tasks) >= self.chunk_files:
+                        break
+            with self._lock:
+                if tasks:
+                    chunk = Chunk(next(self._numbers), tasks)
+                    self._chunks[chunk.number] = chunk
+                    self._waiting.append(chunk)
+                else:
+                    self._planned_all = True
+
+    def iter_results(self):
+        """Yield a ConversionResult per output as workers report them."""
+        try:
+            while True:
+                yield from self._plan_chunks()
+                self._reap()
+                with self._lock:
+                    if self._planned_all and not self._chunks and self._incoming.empty():
+                        break
+                try:
+                    results = self._incoming.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                for result in results:
+                    yield self._engine._record(result, self._keys)
+        finally:
+            if self.manifest is not None:
+                self.manifest.commit()
+            self.close()
+
+    def cancel(self):
+        self.close()
+
+    def close(self):
+        """Stop listening and disconnect every worker."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            connections = list(self._connections)
+        self._listener.close()
+        for conn in connections:
+            # Shutting the socket down wakes the thread blocked reading it
+            try:
+                sock = socket.fromfd(conn.fileno(), socket.AF_INET, socket.SOCK_STREAM)
+                sock.shutdown(socket.SHUT_RDWR)
+                sock.close()
+            except OSError:
+                pass
+
+
+class Worker:
+    """Claims chunks from a Coordinator and converts them on this machine.
+
+    Each chunk runs through a local ConversionEngine (so headers are
+    probed, and files converted, on this machine's processes) with the
+    output paths the coordinator planned. A background thread renews the
+    lease while the chunk is converting; if the coordinator says the
+    chunk was given to another worker, it's abandoned unreported. run()
+    returns once the coordinator has nothing left, or goes away.
+    """
+
+    def __init__(self, address, token, workers=None, memory_budget=None, prefetch=0,
+                 name=None):
+        self.address = address
+        self.token = token
+        self.workers = workers
+        self.memory_budget = memory_budget
+        self.prefetch = prefetch
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        # The engine converting the current chunk; each chunk gets its own
+        self.engine = None
+        self.chunks = 0
+        self._cancel = threading.Event()
+
+    def _renew(self, call, number, interval, stop, lost):
+        engine = self.engine
+        while not stop.wait(interval):
+            try:
+                reply = call('renew', number)
+            except (EOFError, OSError):
+                # The coordinator is gone; nobody will take these results
+                self.cancel()
+                return
+            if reply[0] == 'lost':
+                # The lease ran out and another worker has the chunk now
+                lost.set()
+                engine.cancel()
+                return
+
+    def run(self, on_result=None):
+        """Convert chunks until done; on_result(result) is called for every result."""
+        conn = Client(self.address, authkey=self.token.encode())
+        lock = threading.Lock()
+
+        def call(*message):
+            # The renewing thread shares the connection
+            with lock:
+                conn.send(message)
+                return conn.recv()
+
+        try:
+            _, settings, lease_seconds = call('hello', self.name)
+            probes = ProbeCache()
+            while not self._cancel.is_set():
+                reply = call('claim')
+                if reply[0] == 'done':
+                    break
+                if reply[0] == 'wait':
+                    time.sleep(reply[1])
+                    continue
+
+                _, number, tasks = reply
+                planned = dict(tasks)
+                # A chunk that's lost cancels its own engine, not the worker
+                self.engine = ConversionEngine(settings, workers=self.workers,
+                                               memory_budget=self.memory_budget,
+                                               prefetch=self.prefetch, probes=probes)
+                if self._cancel.is_set():
+                    break
+                stop, lost = threading.Event(), threading.Event()
+                renewer = threading.Thread(target=self._renew,
+                                           args=(call, number, lease_seconds / 3, stop, lost),
+                                           daemon=True)
+                renewer.start()
+                results = []
+                try:
+                    for result in self.engine.iter_results(list(planned), planned):
+                        if lost.is_set():
+                            break
+                        results.append(result)
+                        if on_result is not None:
+                            on_result(result)
+                finally:
+                    stop.set()
+                    renewer.join()
+                if self._cancel.is_set():
+                    break
+                if lost.is_set():
+                    continue
+                call('results', number, results)
+                self.chunks += 1
+        except (EOFError, OSError):
+            # The coordinator finished (or stopped) while we were asking
+            pass
+        finally:
+            conn.close()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.engine is not None:
+            self.engine.cancel()
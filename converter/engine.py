@@ -0,0 +1,995 @@
+"""
+Conversion engine - converts batches of images on a pool of worker processes.
+"""
+
+import io
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from .budget import estimate_memory, header_memory
+from .dedup import find_duplicates, link_or_copy
+from .formats import AUTO_FORMAT, SUPPORTED_FORMATS
+from .frames import (FrameSequence, animation_options, icon_options, keeps_frames, source_icons,
+                     square)
+from .lossless import encode_smallest, encoder_cache
+from .manifest import data_hash, file_hash
+from .metadata import read_metadata
+from .mapped import MAP_MIN_BYTES, MAPPABLE_FORMATS, load_mapped, map_file
+from .output import COLLISION_POLICIES, OutputPlanner, write_atomic
+from .pixels import WIDE_MODES, cmyk_to_rgb, needs_8bit, to_8bit, to_srgb
+from .preflight import Preflight
+from .prefetch import read_source
+from .probe import ProbeCache
+from .profiles import OutputProfile, profile_targets
+from .report import StageTimer
+from .search import encode, search_quality
+from .transforms import draft_for_targets, flatten_alpha, resize_image
+
+
+def default_workers():
+    """Number of worker processes to use when none is configured."""
+    return os.cpu_count() or 1
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker once its run has been cancelled."""
+
+
+# (cancel event, run event) of the engine that started this worker process
+_control = None
+
+
+def _init_worker(cancel_event, run_event):
+    global _control
+    _control = (cancel_event, run_event)
+
+
+def checkpoint():
+    """Give up here if the run was cancelled, and wait here while it's paused.
+
+    Called between the stages of a conversion; does nothing outside a
+    worker process.
+    """
+    if _control is None:
+        return
+    cancel_event, run_event = _control
+    while not run_event.wait(0.2):
+        if cancel_event.is_set():
+            raise JobCancelled("cancelled")
+    if cancel_event.is_set():
+        raise JobCancelled("cancelled")
+
+
+class ConversionResult:
+    """Outcome of converting a single source file to one output profile."""
+
+    def __init__(self, source, output=None, error=None, original_size=0, new_size=0,
+                 skipped=False):
+        self.source = source
+        self.output = output
+        self.error = error
+        self.original_size = original_size
+        self.new_size = new_size
+        self.skipped = skipped
+        self.source_mtime_ns = None
+        self.content_hash = None
+        # Wall time the conversion took in the worker, and per stage
+        self.seconds = 0.0
+        self.timings = {}
+        self.source_format = None
+        self.output_format = None
+        self.input_pixels = 0
+        self.output_pixels = 0
+        # Set when the output was linked from an identical source's output
+        self.duplicate_of = None
+        # Quality chosen by the per-image search, if one ran
+        self.quality = None
+        # Lossless encoding the Auto format picked (see lossless.CANDIDATES)
+        self.encoder = None
+        # Index of the output profile this result belongs to
+        self.profile = 0
+        # Encoded bytes the engine still has to write to output (prefetch mode)
+        self.data = None
+        # Abandoned because the run was cancelled; never reported
+        self.cancelled = False
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def saved_bytes(self):
+        return self.original_size - self.new_size if self.ok else 0
+
+
+class ConversionSettings:
+    """Options shared by every file in a conversion run.
+
+    Each source is decoded once and written once per output profile. The
+    single-output keyword arguments build the one profile used when
+    profiles isn't given.
+    """
+
+    def __init__(self, output_format='PNG', quality=85, output_folder=None, source_roots=(),
+                 max_width=None, max_height=None, resize_mode='fit',
+                 background=(255, 255, 255), max_bytes=None, target_psnr=None,
+                 profiles=None, collision='suffix', fsync=False, srgb=False,
+                 strip_metadata=False, encoder_cache=None):
+        if profiles is None:
+            profiles = [OutputProfile(output_format, quality, max_width, max_height,
+                                      resize_mode, max_bytes=max_bytes,
+                                      target_psnr=target_psnr)]
+        self.profiles = tuple(profiles)
+        if not self.profiles:
+            raise ValueError("At least one output profile is required")
+        names = [name for profile in self.profiles for name in profile.filenames('')]
+        if len(set(names)) != len(names):
+            raise ValueError("Output profiles need distinct formats or suffixes")
+        if collision not in COLLISION_POLICIES:
+            raise ValueError(f"Unknown collision policy: {collision}")
+        # Colour transparent pixels are flattened onto for JPEG/BMP
+        self.background = tuple(background)
+        # What to do when two outputs (or an output and a source) share a name
+        self.collision = collision
+        # fsync every output before it replaces the old file
+        self.fsync = fsync
+        # Convert images with an embedded colour profile to sRGB
+        self.srgb = srgb
+        # Leave EXIF and XMP out of outputs (the colour profile stays)
+        self.strip_metadata = strip_metadata
+        # Where Auto outputs remember the encoding chosen for each image
+        self.encoder_cache = encoder_cache
+        self.output_folder = output_folder or None
+        # Scanned folders; files under one are mirrored below output_folder
+        self.source_roots = tuple(os.path.abspath(root) for root in source_roots)
+
+    def cache_key(self, index=0):
+        """Stable string identifying how one profile's outputs are encoded."""
+        options = dict(vars(self.profiles[index]), background=self.background)
+        if self.srgb:
+            options['srgb'] = True
+        if self.strip_metadata:
+            options['strip_metadata'] = True
+        return json.dumps(options, sort_keys=True, default=str)
+
+
+def source_root_for(filepath, settings):
+    """The deepest scanned folder containing filepath, if any."""
+    folder = os.path.dirname(os.path.abspath(filepath))
+    best = None
+    for root in settings.source_roots:
+        if folder == root or folder.startswith(root.rstrip(os.sep) + os.sep):
+            if best is None or len(root) > len(best):
+                best = root
+    return best
+
+
+def output_path_for(filepath, settings, index=0):
+    """Where profile number index of filepath is written."""
+    if settings.output_folder:
+        out_dir = settings.output_folder
+        root = source_root_for(filepath, settings)
+        if root is not None:
+            # Mirror the scanned folder structure
+            rel_dir = os.path.relpath(os.path.dirname(os.path.abspath(filepath)), root)
+            if rel_dir != os.curdir:
+                out_dir = os.path.join(out_dir, rel_dir)
+    else:
+        out_dir = os.path.dirname(filepath)
+
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(out_dir, settings.profiles[index].filename(stem))
+
+
+def prepare_image(img, output_format, background=(255, 255, 255)):
+    """Convert img to a mode the output format can store."""
+    if needs_8bit(img.mode, output_format):
+        # Scaled down, where convert() would clip everything above 255
+        img = to_8bit(img)
+    if img.mode == 'CMYK' and output_format != 'TIFF':
+        img = cmyk_to_rgb(img)
+    if output_format in ('JPEG', 'BMP'):
+        # These formats don't support transparency
+        img = flatten_alpha(img, background)
+    return img
+
+
+def save_options(profile):
+    """Keyword arguments passed to Image.save for the profile's format."""
+    save_kwargs = {}
+
+    if profile.output_format == 'JPEG':
+        save_kwargs['quality'] = profile.quality
+        save_kwargs['optimize'] = True
+    elif profile.output_format == 'WebP':
+        save_kwargs['quality'] = profile.quality
+    elif profile.output_format == 'PNG':
+        save_kwargs['optimize'] = True
+
+    return save_kwargs
+
+
+def decode_for_targets(img, targets, filepath, source=None, eight_bit=False):
+    """Decode an opened image at the smallest size covering every target.
+
+    JPEGs are drafted. Large uncompressed BMP/TIFF rasters are read
+    through a memory map (or the prefetched bytes) instead of being
+    copied in, and reduced band by band when every target is smaller.
+    With eight_bit, 16 bit grey is scaled to 8 bits (straight from the
+    map where possible). Returns the loaded image, which may be a new
+    object.
+    """
+    if targets and None not in targets:
+        draft_for_targets(img, targets)
+
+    if img.format in MAPPABLE_FORMATS:
+        try:
+            size = len(source.data) if source is not None else os.path.getsize(filepath)
+            mapped = None
+            if size >= MAP_MIN_BYTES:
+                buffer = source.data if source is not None else map_file(filepath)
+                mapped = load_mapped(img, buffer, targets, eight_bit)
+        except (OSError, ValueError):
+            mapped = None
+        if mapped is not None:
+            return mapped
+
+    img.load()
+    return to_8bit(img) if eight_bit else img
+
+
+def _transform(img, profile, background):
+    """Resize img and convert it to a mode the profile's format can store."""
+    out = resize_image(img, profile.max_width, profile.max_height, profile.resize_mode)
+    return prepare_image(out, profile.output_format, background)
+
+
+def _encode_frames(frames, profile, settings, metadata=None):
+    """Encode every frame of a freshly opened multi-frame source.
+
+    Frames are decoded, transformed and handed to the encoder one at a
+    time, and cancelling is checked between them. Returns (buffer,
+    output pixels per frame).
+    """
+    converted = []
+
+    def transform(frame):
+        checkpoint()
+        out = frame
+        if metadata is not None:
+            out = metadata.orient(out)
+        if settings.srgb:
+            srgb = to_srgb(out)
+            if srgb is not out:
+                converted.append(True)
+            out = srgb
+        out = _transform(out, profile, settings.background)
+        # The source frame is overwritten by the next seek
+        return out.copy() if out is frame else out
+
+    with frames() as source:
+        sequence = FrameSequence(source, transform)
+        options = dict(save_options(profile),
+                       **animation_options(source, profile.output_format, sequence))
+        if metadata is not None:
+            if converted:
+                metadata = metadata.without_icc()
+            options.update(metadata.save_options(sequence, profile.output_format,
+                                                 settings.strip_metadata))
+        return encode(sequence, profile.output_format, options), sequence.width * sequence.height
+
+
+def convert_profile(img, filepath, settings, index, output_path, write=True, frames=None,
+                    icons=(), metadata=None):
+    """Transform, encode and write one output from the decoded image.
+
+    With write=False the encoded bytes are left in result.data instead.
+    frames, if given, opens the source again so every frame can be
+    streamed into the output (see frames.keeps_frames); icons are an ICO
+    source's own bitmaps for an ICO output. metadata (see
+    metadata.read_metadata) is written to the formats that hold it.
+    """
+    profile = settings.profiles[index]
+    timer = StageTimer()
+    result = ConversionResult(filepath)
+    result.profile = index
+    result.output_format = profile.output_format
+    try:
+        checkpoint()
+        if settings.output_folder:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        if frames is not None:
+            # Frames are transformed as they're encoded; it all counts as encoding
+            buffer, result.output_pixels = _encode_frames(frames, profile, settings, metadata)
+            timer.lap('encode')
+        else:
+            out = _transform(img, profile, settings.background)
+            if out is img:
+                # save() keeps its arguments on the image object, and the other
+                # outputs' threads save the same one; share the pixels, not it
+                out = img._new(img.im)
+            options = save_options(profile)
+            if profile.output_format == 'ICO':
+                out = square(out)
+                options.update(icon_options(out, icons))
+            if metadata is not None:
+                options.update(metadata.save_options(out, profile.output_format,
+                                                     settings.strip_metadata))
+            result.output_pixels = out.width * out.height
+            timer.lap('transform')
+
+            if profile.output_format == AUTO_FORMAT:
+                def options_for(candidate, output_format):
+                    if metadata is None:
+                        return {}
+                    return metadata.save_options(candidate, output_format,
+                                                 settings.strip_metadata)
+
+                buffer, output_format, result.encoder = encode_smallest(
+                    out, options_for, encoder_cache(settings.encoder_cache))
+                # Planned with every extension it may take (see OutputPlanner.claim)
+                output_path = os.path.splitext(output_path)[0] + SUPPORTED_FORMATS[output_format]
+            elif profile.searches_quality:
+                buffer, result.quality = search_quality(out, profile.output_format, options,
+                                                        profile.max_bytes, profile.target_psnr)
+            else:
+                buffer = encode(out, profile.output_format, options)
+            del out
+            timer.lap('encode')
+
+        checkpoint()
+        if write:
+            write_atomic(output_path, buffer.getbuffer(), fsync=settings.fsync)
+            timer.lap('write')
+        else:
+            result.data = buffer.getvalue()
+        result.output = output_path
+        result.new_size = buffer.getbuffer().nbytes
+    except JobCancelled as e:
+        result.error = str(e)
+        result.cancelled = True
+    except Exception as e:
+        result.error = str(e)
+    result.timings = timer.timings
+    return result
+
+
+def convert_file(filepath, settings, compute_hash=False, outputs=None, source=None):
+    """Convert one file to the profiles in outputs ({profile index: path}).
+
+    outputs defaults to every profile at its output_path_for() path. The
+    source is decoded once; the outputs are then transformed and encoded
+    from that shared image on one thread each (Pillow releases the GIL
+    while resampling and encoding). Runs inside a worker process and
+    returns one ConversionResult per output.
+
+    Outputs that keep every frame of an animation or multi-page source
+    read the frames again through their own handle, one at a time.
+
+    With source (a prefetched SourceData) nothing is read from disk and
+    nothing is written: the caller owns the I/O and gets the encoded
+    bytes back in result.data.
+    """
+    start = time.perf_counter()
+    if outputs is None:
+        outputs = {index: output_path_for(filepath, settings, index)
+                   for index in range(len(settings.profiles))}
+    timer = StageTimer()
+    try:
+        checkpoint()
+        if source is None:
+            st = os.stat(filepath)
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+        else:
+            size, mtime_ns = source.size, source.mtime_ns
+
+        def reopen():
+            return Image.open(filepath if source is None else io.BytesIO(source.data))
+
+        with reopen() as img:
+            source_format = img.format
+            input_pixels = img.width * img.height
+            # Already parsed with the header; EXIF orientation decides the targets
+            metadata = read_metadata(img)
+            targets = profile_targets(metadata.oriented_size(img.size),
+                                      [settings.profiles[i] for i in outputs])
+            frames = {index: reopen for index in outputs
+                      if keeps_frames(img, settings.profiles[index].output_format)}
+            icons = []
+            if any(settings.profiles[index].output_format == 'ICO' for index in outputs):
+                icons = source_icons(img)
+            # Go to 8 bits while decoding if no output keeps the extra depth
+            eight_bit = img.mode in WIDE_MODES and all(
+                needs_8bit(img.mode, settings.profiles[index].output_format)
+                for index in outputs if index not in frames)
+            if len(frames) < len(outputs):
+                img = decode_for_targets(img, metadata.stored_sizes(targets), filepath,
+                                         source, eight_bit)
+            timer.lap('decode')
+
+            if len(frames) < len(outputs):
+                img = metadata.orient(img)
+                if settings.srgb:
+                    srgb = to_srgb(img)
+                    if srgb is not img:
+                        # The pixels no longer match the source's profile
+                        metadata = metadata.without_icc()
+                    img = srgb
+                timer.lap('transform')
+
+            def convert(index, output_path):
+                return convert_profile(img, filepath, settings, index, output_path,
+                                       source is None, frames.get(index), icons, metadata)
+
+            if len(outputs) == 1:
+                results = [convert(*next(iter(outputs.items())))]
+            else:
+                with ThreadPoolExecutor(max_workers=len(outputs)) as pool:
+                    results = list(pool.map(lambda item: convert(*item), outputs.items()))
+        content_hash = None
+        if compute_hash:
+            content_hash = file_hash(filepath) if source is None else data_hash(source.data)
+    except Exception as e:
+        results = []
+        for index in outputs:
+            result = ConversionResult(filepath, error=str(e))
+            result.profile = index
+            result.output_format = settings.profiles[index].output_format
+            result.cancelled = isinstance(e, JobCancelled)
+            results.append(result)
+        return _finish_results(results, timer, start)
+
+    for result in results:
+        result.original_size = size
+        result.source_mtime_ns = mtime_ns
+        result.source_format = source_format
+        result.input_pixels = input_pixels
+        result.content_hash = content_hash
+    return _finish_results(results, timer, start)
+
+
+def _finish_results(results, timer, start):
+    """Share the time spent on the shared image and the wall time across the outputs."""
+    seconds = (time.perf_counter() - start) / len(results)
+    for result in results:
+        timings = dict(result.timings)
+        for stage, elapsed in timer.timings.items():
+            timings[stage] = timings.get(stage, 0.0) + elapsed / len(results)
+        result.timings = timings
+        result.seconds = seconds
+    return results
+
+
+class ConversionEngine:
+    """Runs conversions on a process pool and streams the results back.
+
+    Only a bounded number of files is in flight at once so large batches
+    don't flood the pool. If a worker dies (e.g. a decoder crash on a
+    corrupt file) the pool is rebuilt and the files that were in flight
+    are retried one at a time in isolation, so only the culprit fails.
+
+    Every file is decoded once and converted to each of the settings'
+    output profiles, yielding one result per profile.
+
+    Output paths are planned in batch order with an OutputPlanner, so two
+    sources never write the same file (a.png and a.jpg -> a.webp) and an
+    output never replaces a source, unless the settings' collision policy
+    is 'overwrite'. Outputs are written atomically.
+
+    With a Manifest, outputs that are still current are reported as
+    skipped, only the missing profiles are submitted, and every success
+    is recorded.
+
+    With a memory_budget (bytes), each file's decoded size is estimated
+    from its header before it's admitted, and files wait until the
+    estimates of everything in flight fit the budget. A file bigger than
+    the whole budget still runs, but only on its own.
+
+    With dedupe, sources with identical contents are converted once and
+    the output is hard-linked (or copied) to the other names; the work
+    avoided is tallied in self.dedup_stats.
+
+    With prefetch, up to that many upcoming sources are read into memory
+    on I/O threads while earlier ones are being converted, and the
+    workers hand their encoded outputs back to be written on the same
+    threads. The workers then never wait on the disk (or the network
+    share) themselves. A read ahead counts towards the memory budget
+    from when it starts, so it waits if the budget is used up.
+
+    Before anything is submitted, every file's header is probed in
+    parallel (see preflight()); files that can't be read fail straight
+    away instead of partway through the run. Probes are cached in
+    probes (pass a ProbeCache to keep them across runs), and a
+    RunHistory makes the plan's size and time estimates follow past runs.
+
+    cancel() and pause() may be called from any thread while results are
+    being consumed. The workers see both through shared events and stop
+    (or wait) at the next stage boundary of the file they're on.
+    """
+
+    def __init__(self, settings, workers=None, manifest=None, memory_budget=None,
+                 dedupe=False, prefetch=0, probes=None, history=None):
+        self.settings = settings
+        self.manifest = manifest
+        self.memory_budget = memory_budget
+        self.dedupe = dedupe
+        self.prefetch = max(0, prefetch or 0)
+        self.probes = probes if probes is not None else ProbeCache()
+        self.history = history
+        self.plan = None
+        # {(filepath, profile index): current output or None} found by preflight()
+        self._current_outputs = {}
+        self.dedup_stats = {'duplicates': 0, 'bytes_avoided': 0, 'seconds_avoided': 0.0}
+        # {(duplicate, profile index): skipped result} waiting for the original's output
+        self._collisions = {}
+        self.workers = max(1, workers or default_workers())
+        self.max_in_flight = self.workers * 2
+        self.memory_in_use = 0
+        self.results = queue.Queue()
+        self._thread = None
+        self._cancel = multiprocessing.Event()
+        self._running = multiprocessing.Event()
+        self._running.set()
+
+    def cancel(self):
+        """Stop the run; work already handed to the workers is abandoned."""
+        self._cancel.set()
+        # Wake paused workers so they notice
+        self._running.set()
+
+    def pause(self):
+        """Stop starting new files; workers wait at their next stage."""
+        if not self.cancelled:
+            self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def _executor(self, workers):
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(self._cancel, self._running))
+
+    @property
+    def outputs_per_file(self):
+        """Results yielded for each source file (one per output profile)."""
+        return len(self.settings.profiles)
+
+    def preflight(self, files):
+        """Probe the files' headers in parallel and return the run's Preflight.
+
+        Files whose outputs the manifest says are all current aren't
+        opened. The plan is kept as self.plan, and iter_results() uses it
+        as it is for the same list of files. Probing stops early if the
+        run is cancelled.
+        """
+        files = list(files)
+        current = set()
+        self._current_outputs = {}
+        if self.manifest is not None:
+            keys = [self.settings.cache_key(index)
+                    for index in range(len(self.settings.profiles))]
+            current = {filepath for filepath in files
+                       if all(self._remember_current(filepath, index, key)
+                              for index, key in enumerate(keys))}
+        infos = self.probes.probe([filepath for filepath in files if filepath not in current],
+                                  cancelled=lambda: self.cancelled)
+        self.plan = Preflight(files, infos, self.settings, self.history, self.workers,
+                              up_to_date=len(current))
+        return self.plan
+
+    def _task_args(self, filepath, outputs, source=None):
+        compute_hash = self.manifest is not None and self.manifest.use_hash
+        return (filepath, self.settings, compute_hash, outputs, source)
+
+    def _is_current(self, filepath, output_path, settings_key):
+        if self.manifest is None:
+            return False
+        try:
+            return self.manifest.is_current(filepath, settings_key, output_path)
+        except Exception:
+            return False
+
+    def _current_output(self, filepath, output_path, index, settings_key):
+        """output_path, or the alternate name it was written as, if that's current."""
+        stem, ext = os.path.splitext(output_path)
+        for extension in (ext, *self.settings.profiles[index].alternate_extensions):
+            if self._is_current(filepath, stem + extension, settings_key):
+                return stem + extension
+        return None
+
+    def _remember_current(self, filepath, index, settings_key):
+        """The current output at filepath's usual path, kept for _plan() to reuse."""
+        current = self._current_output(filepath, output_path_for(filepath, self.settings, index),
+                                       index, settings_key)
+        self._current_outputs[filepath, index] = current
+        return current
+
+    def _plan(self, filepath, planner, settings_keys):
+        """Pick a file's output paths.
+
+        Returns (skipped results, {profile index: path} still to convert,
+        every assigned path by profile index).
+        """
+        skipped, outputs, planned = [], {}, {}
+        for index, settings_key in enumerate(settings_keys):
+            wanted = output_path_for(filepath, self.settings, index)
+            alternates = self.settings.profiles[index].alternate_extensions
+            output_path = planner.claim(filepath, wanted, alternates)
+            planned[index] = output_path
+            current = None
+            if output_path == wanted and (filepath, index) in self._current_outputs:
+                # Already asked by preflight()
+                current = self._current_outputs.pop((filepath, index))
+            elif output_path is not None:
+                current = self._current_output(filepath, output_path, index, settings_key)
+            if output_path is None:
+                result = ConversionResult(
+                    filepath, skipped=True,
+                    error=f"{wanted} is already used by {planner.owner(wanted, alternates)}")
+            elif current is not None:
+                result = ConversionResult(filepath, current, skipped=True)
+            else:
+                outputs[index] = output_path
+                continue
+            result.profile = index
+            result.output_format = self.settings.profiles[index].output_format
+            skipped.append(result)
+        return skipped, outputs, planned
+
+    def _error_results(self, filepath, indices, error):
+        results = []
+        for index in indices:
+            result = ConversionResult(filepath, error=error)
+            result.profile = index
+            result.output_format = self.settings.profiles[index].output_format
+            results.append(result)
+        return results
+
+    def _memory_cost(self, filepath, source=None):
+        if self.memory_budget is None:
+            return 0
+        info = self.probes.cached(filepath)
+        if info is not None and info.ok:
+            # Probed by preflight(); only the worker opens the file again
+            held = len(source.data) if source is not None else 0
+            return held + header_memory(info, info.mappable, self.settings)
+        if source is None:
+            try:
+                return estimate_memory(filepath, self.settings)
+            except Exception:
+                # Unreadable headers fail fast in the worker anyway
+                return 0
+        try:
+            return len(source.data) + estimate_memory(io.BytesIO(source.data), self.settings)
+        except Exception:
+            return len(source.data)
+
+    def _prefetch_cost(self, filepath):
+        """_memory_cost() of filepath once it's read: its bytes plus decoding them."""
+        if self.memory_budget is None:
+            return 0
+        info = self.probes.cached(filepath)
+        if info is not None and info.ok:
+            size = info.file_size
+        else:
+            try:
+                size = os.path.getsize(filepath)
+            except OSError:
+                size = 0
+        return size + self._memory_cost(filepath)
+
+    def _write_results(self, results):
+        """Write the encoded outputs a worker handed back. Runs on an I/O thread."""
+        for result in results:
+            if result.data is None:
+                continue
+            if self.cancelled:
+                result.data = None
+                result.cancelled = True
+                continue
+            start = time.perf_counter()
+            try:
+                write_atomic(result.output, result.data, fsync=self.settings.fsync)
+            except OSError as e:
+                result.error = str(e)
+                result.output = None
+            result.data = None
+            elapsed = time.perf_counter() - start
+            result.timings['write'] = result.timings.get('write', 0.0) + elapsed
+            result.seconds += elapsed
+        return results
+
+    def _record(self, result, settings_keys):
+        if self.manifest is not None and result.ok and not result.skipped:
+            self.manifest.record(result, settings_keys[result.profile])
+        return result
+
+    def _find_duplicates(self, files, planner, settings_keys):
+        """Yield skipped results, then return (tasks, duplicates, plans).
+
+        A file with any output out of date is converted to all of its
+        outputs, so that they can be linked to every duplicate. Outputs
+        skipped for a name collision still get their skipped result: a
+        duplicate's when its original's output is linked to it (see
+        self._collisions), the rest here. A duplicate converts the outputs
+        its original doesn't write itself.
+        """
+        plans, collisions = {}, {}
+        for filepath in files:
+            skipped, outputs, planned = self._plan(filepath, planner, settings_keys)
+            if not outputs:
+                yield from skipped
+                continue
+            plans[filepath] = planned
+            # The skips of current outputs are dropped: those are converted again
+            collisions.update(((filepath, result.profile), result) for result in skipped
+                              if planned[result.profile] is None)
+        unique, duplicates = find_duplicates(plans)
+        tasks = [(filepath, {index: path for index, path in plans[filepath].items()
+                             if path is not None})
+                 for filepath in unique]
+        originals = {dup: filepath for filepath, dups in duplicates.items() for dup in dups}
+        for dup, filepath in originals.items():
+            own = {index: path for index, path in plans[dup].items()
+                   if path is not None and plans[filepath][index] is None}
+            if own:
+                tasks.append((dup, own))
+        for filepath, index in list(collisions):
+            if filepath not in originals or plans[originals[filepath]][index] is None:
+                yield collisions.pop((filepath, index))
+        self._collisions = collisions
+        return tasks, duplicates, plans
+
+    def _link_duplicates(self, result, duplicates, plans, settings_keys):
+        """Give every duplicate of result.source a copy of its output."""
+        for filepath in duplicates.get(result.source, ()):
+            output_path = plans[filepath][result.profile]
+            if output_path is None:
+                # Name collision under the 'skip' policy; skipped as _plan() said
+                yield self._collisions.pop((filepath, result.profile))
+                continue
+            if not result.ok:
+                yield from self._error_results(filepath, [result.profile], result.error)
+                continue
+
+            # Auto outputs take the extension of the encoding that won
+            output_path = os.path.splitext(output_path)[0] + os.path.splitext(result.output)[1]
+            try:
+                st = os.stat(filepath)
+                os.makedirs(os.path.dirname(output_path) or os.curdir, exist_ok=True)
+                link_or_copy(result.output, output_path)
+            except OSError as e:
+                yield from self._error_results(filepath, [result.profile], str(e))
+                continue
+
+            dup = ConversionResult(filepath, output_path, original_size=st.st_size,
+                                   new_size=result.new_size)
+            dup.source_mtime_ns = st.st_mtime_ns
+            dup.content_hash = result.content_hash
+            dup.duplicate_of = result.source
+            dup.encoder = result.encoder
+            dup.profile = result.profile
+            dup.output_format = result.output_format
+
+            if result.profile == 0:
+                self.dedup_stats['duplicates'] += 1
+                self.dedup_stats['bytes_avoided'] += st.st_size
+            self.dedup_stats['seconds_avoided'] += result.seconds
+            yield self._record(dup, settings_keys)
+
+    def _finished(self, results, duplicates, plans, settings_keys):
+        """Record a file's worker results and fan them out to its duplicates."""
+        for result in results:
+            yield self._record(result, settings_keys)
+            if duplicates:
+                yield from self._link_duplicates(result, duplicates, plans, settings_keys)
+
+    def _convert_isolated(self, filepath, outputs):
+        """Convert a file in its own single-worker pool."""
+        with self._executor(1) as executor:
+            try:
+                return executor.submit(convert_file,
+                                       *self._task_args(filepath, outputs)).result()
+            except BrokenProcessPool:
+                return self._error_results(filepath, outputs, "worker process crashed")
+            except Exception as e:
+                return self._error_results(filepath, outputs, str(e))
+
+    def iter_results(self, files, planned=None):
+        """Convert files, yielding a ConversionResult per output as each finishes.
+
+        planned ({filepath: {profile index: output path}}) gives output
+        paths picked elsewhere, e.g. by a distributed.Coordinator for the
+        whole batch; they're converted as given, without the manifest or
+        dedupe, and files without an entry are left out.
+        """
+        files = list(files)
+        plan = self.plan
+        if plan is None or plan.paths != files:
+            plan = self.preflight(files)
+        profiles = range(len(self.settings.profiles))
+        for info in plan.rejected:
+            indices = profiles if planned is None else planned.get(info.path, ())
+            yield from self._error_results(info.path, indices, info.error)
+        rejected = {info.path for info in plan.rejected}
+        readable = [filepath for filepath in files if filepath not in rejected]
+
+        settings_keys = [self.settings.cache_key(index) for index in profiles]
+        # Every source is protected from being overwritten, readable or not
+        planner = OutputPlanner(files, self.settings.collision)
+        duplicates, plans = {}, {}
+        self.dedup_stats = {'duplicates': 0, 'bytes_avoided': 0, 'seconds_avoided': 0.0}
+        if planned is not None:
+            tasks = [(filepath, planned[filepath]) for filepath in readable
+                     if planned.get(filepath)]
+        elif self.dedupe:
+            tasks, duplicates, plans = yield from self._find_duplicates(readable, planner,
+                                                                        settings_keys)
+        else:
+            tasks = ((filepath, None) for filepath in readable)
+
+        pending = deque(tasks)
+        ready = deque()
+        in_flight = {}
+        costs = {}
+        writes = {}
+        head_cost = None
+        executor = self._executor(self.workers)
+        io_pool = ThreadPoolExecutor(max_workers=self.prefetch) if self.prefetch else None
+        self.memory_in_use = 0
+
+        try:
+            while (pending or ready or in_flight or writes) and not self.cancelled:
+                # Plan the next files, and start reading them ahead of time
+                while pending and len(ready) < max(1, self.prefetch) and not self.paused:
+                    filepath, outputs = pending.popleft()
+                    if outputs is None:
+                        # With dedupe the paths were planned up front
+                        skipped, outputs, _ = self._plan(filepath, planner, settings_keys)
+                        yield from skipped
+                        if not outputs:
+                            continue
+                    read, reserved = None, 0
+                    if io_pool is not None:
+                        reserved = self._prefetch_cost(filepath)
+                        # Reads ahead count towards the budget from the start
+                        if ((ready or in_flight) and self.memory_budget is not None
+                                and self.memory_in_use + reserved > self.memory_budget):
+                            pending.appendleft((filepath, outputs))
+                            break
+                        self.memory_in_use += reserved
+                        read = io_pool.submit(read_source, filepath)
+                    ready.append((filepath, outputs, read, reserved))
+
+                waiting_read = None
+                while ready and len(in_flight) < self.max_in_flight and not self.paused:
+                    filepath, outputs, read, reserved = ready[0]
+                    if read is not None and not read.done() and (in_flight or writes):
+                        # Collect finished work while the read completes
+                        waiting_read = read
+                        break
+
+                    source = None
+                    if read is not None:
+                        try:
+                            source = read.result()
+                        except OSError as e:
+                            ready.popleft()
+                            self.memory_in_use -= reserved
+                            yield from self._finished(
+                                self._error_results(filepath, outputs, str(e)),
+                                duplicates, plans, settings_keys)
+                            continue
+                    if head_cost is None:
+                        head_cost = self._memory_cost(filepath, source)
+
+                    # Back-pressure: wait for running files to free their share
+                    if (in_flight and self.memory_budget is not None
+                            and self.memory_in_use - reserved + head_cost > self.memory_budget):
+                        break
+
+                    ready.popleft()
+                    future = executor.submit(convert_file,
+                                             *self._task_args(filepath, outputs, source))
+                    in_flight[future] = (filepath, outputs)
+                    costs[future] = head_cost
+                    # Swap the read's reservation for what it really holds
+                    self.memory_in_use += head_cost - reserved
+                    head_cost = None
+                    del source
+
+                if not in_flight and not writes:
+                    if self.paused:
+                        self._running.wait(0.2)
+                    continue
+
+                waiting = [*in_flight, *writes]
+                if waiting_read is not None:
+                    waiting.append(waiting_read)
+                # Time out now and then so a cancel is noticed mid-file
+                done, _ = wait(waiting, timeout=0.2, return_when=FIRST_COMPLETED)
+
+                suspects = []
+                for future in done:
+                    if future in writes:
+                        del writes[future]
+                        results = [result for result in future.result()
+                                   if not result.cancelled]
+                        yield from self._finished(results, duplicates, plans, settings_keys)
+                        continue
+                    if future not in in_flight:
+                        # A read finished; the next pass submits it
+                        continue
+
+                    filepath, outputs = in_flight.pop(future)
+                    self.memory_in_use -= costs.pop(future)
+                    try:
+                        results = future.result()
+                    except BrokenProcessPool:
+                        suspects.append((filepath, outputs))
+                        continue
+                    except Exception as e:
+                        results = self._error_results(filepath, outputs, str(e))
+                    results = [result for result in results if not result.cancelled]
+                    if io_pool is not None and any(r.data is not None for r in results):
+                        writes[io_pool.submit(self._write_results, results)] = filepath
+                        continue
+                    yield from self._finished(results, duplicates, plans, settings_keys)
+
+                if suspects:
+                    # Every unfinished task is lost with the pool; we can't
+                    # tell which one crashed it, so retry each on its own.
+                    suspects.extend(in_flight.values())
+                    in_flight.clear()
+                    self.memory_in_use -= sum(costs.values())
+                    costs.clear()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = self._executor(self.workers)
+
+                    for filepath, outputs in suspects:
+                        if self.cancelled:
+                            break
+                        results = [result for result in self._convert_isolated(filepath, outputs)
+                                   if not result.cancelled]
+                        yield from self._finished(results, duplicates, plans, settings_keys)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            if io_pool is not None:
+                # Let started writes finish so no temp files are left behind
+                io_pool.shutdown(wait=True, cancel_futures=True)
+            if self.manifest is not None:
+                self.manifest.commit()
+
+    def _run(self, files):
+        try:
+            for result in self.iter_results(files):
+                self.results.put(result)
+        finally:
+            self.results.put(None)
+
+    def start(self, files):
+        """Start converting in the background.
+
+        Results are put on self.results as they complete, followed by None
+        once the whole batch is done.
+        """
+        self._thread = threading.Thread(target=self._run, args=(list(files),), daemon=True)
+        self._thread.start()
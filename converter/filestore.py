@@ -0,0 +1,92 @@
+"""
+Compact store for the queue of source files.
+"""
+
+import os
+from array import array
+
+
+UNKNOWN_SIZE = -1
+MISSING_SIZE = -2
+
+
+class FileStore:
+    """Ordered, de-duplicated list of source paths with their sizes and extensions.
+
+    Sizes and extensions live in flat arrays instead of one object per
+    file, and a set backs membership checks, so queueing tens of thousands
+    of paths stays fast and small. Sizes that were not known when a path
+    was added are looked up lazily the first time they're asked for.
+    """
+
+    def __init__(self):
+        self._paths = []
+        self._index = set()
+        self._sizes = array('q')
+        self._exts = array('H')
+        self._ext_names = []
+        self._ext_ids = {}
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __contains__(self, path):
+        return path in self._index
+
+    def __getitem__(self, index):
+        return self._paths[index]
+
+    def _ext_id(self, path):
+        ext = os.path.splitext(path)[1].upper()
+        ext_id = self._ext_ids.get(ext)
+        if ext_id is None:
+            ext_id = self._ext_ids[ext] = len(self._ext_names)
+            self._ext_names.append(ext)
+        return ext_id
+
+    def add(self, path, size=UNKNOWN_SIZE):
+        """Queue a path. Returns False if it was already queued."""
+        if path in self._index:
+            return False
+        self._index.add(path)
+        self._paths.append(path)
+        self._sizes.append(size)
+        self._exts.append(self._ext_id(path))
+        return True
+
+    def extend(self, paths, sizes=None):
+        """Queue several paths. Returns how many were new."""
+        if sizes is None:
+            return sum(self.add(path) for path in paths)
+        return sum(self.add(path, size) for path, size in zip(paths, sizes))
+
+    def remove_at(self, index):
+        path = self._paths.pop(index)
+        self._index.discard(path)
+        del self._sizes[index]
+        del self._exts[index]
+        return path
+
+    def remove(self, path):
+        if path in self._index:
+            self.remove_at(self._paths.index(path))
+
+    def clear(self):
+        self.__init__()
+
+    def extension(self, index):
+        return self._ext_names[self._exts[index]]
+
+    def size(self, index):
+        """Size of the file in bytes, or None if it can't be read."""
+        size = self._sizes[index]
+        if size == UNKNOWN_SIZE:
+            try:
+                size = os.path.getsize(self._paths[index])
+            except OSError:
+                size = MISSING_SIZE
+            self._sizes[index] = size
+        return size if size >= 0 else None
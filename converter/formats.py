@@ -0,0 +1,32 @@
+"""
+Image formats the converter reads and writes.
+"""
+
+SUPPORTED_FORMATS = {
+    'PNG': '.png',
+    'JPEG': '.jpg',
+    'WebP': '.webp',
+    'BMP': '.bmp',
+    'TIFF': '.tiff',
+    'GIF': '.gif',
+    'ICO': '.ico',
+    'Auto': '.png',
+}
+
+# Picks the smallest lossless encoding of each image (see lossless.py).
+# Outputs are named .png, or .webp when lossless WebP wins.
+AUTO_FORMAT = 'Auto'
+AUTO_EXTENSIONS = ('.png', '.webp')
+
+INPUT_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tiff', '.tif', '.gif', '.ico')
+
+
+def format_name(value):
+    """Match a format name case-insensitively (webp -> WebP, jpg -> JPEG)."""
+    aliases = {'jpg': 'JPEG', 'tif': 'TIFF'}
+    lookup = {name.lower(): name for name in SUPPORTED_FORMATS}
+    name = aliases.get(value.lower(), lookup.get(value.lower()))
+    if name is None:
+        raise ValueError(f"unsupported format '{value}' "
+                         f"(choose from {', '.join(SUPPORTED_FORMATS)})")
+    return name
@@ -0,0 +1,179 @@
+"""
+Multi-frame sources (animations, multi-page TIFF) and multi-size icons.
+"""
+
+from PIL import Image, ImageSequence
+
+
+# Outputs that keep every frame of an animated source
+ANIMATED_FORMATS = ('GIF', 'WebP')
+
+# Sources whose frames are an animation rather than separate pages
+ANIMATED_SOURCES = ('GIF', 'WEBP', 'PNG')
+
+# Icon sizes written to ICO outputs, up to the size of the image
+ICO_SIZES = ((16, 16), (24, 24), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256))
+
+
+def frame_count(img):
+    """Number of frames (or pages) in an opened image, from its headers."""
+    return getattr(img, 'n_frames', 1)
+
+
+def keeps_frames(img, output_format):
+    """Whether converting the opened img to output_format keeps all its frames.
+
+    Animations stay animated as GIF or WebP, and pages stay pages in a
+    TIFF. Pages aren't turned into animations (they needn't share a
+    size), and other formats get the first frame.
+    """
+    if frame_count(img) < 2:
+        return False
+    if output_format == 'TIFF':
+        return True
+    return output_format in ANIMATED_FORMATS and img.format in ANIMATED_SOURCES
+
+
+class _PerFrame(list):
+    """A per-frame value (duration, disposal) filled in as frames are decoded.
+
+    Savers accept lists of per-frame values but only index one after
+    seeking to its frame, so the values needn't be known up front.
+    """
+
+    def __init__(self, frames, key):
+        super().__init__()
+        self._frames = frames
+        self._key = key
+
+    def __getitem__(self, index):
+        return self._frames.frame_info[index][self._key]
+
+    def __len__(self):
+        return self._frames.n_frames
+
+
+class FrameSequence(Image.Image):
+    """The transformed frames of a multi-frame source, made one at a time.
+
+    To Image.save(save_all=True) this looks like a multi-frame image.
+    Every seek() decodes the next source frame (via ImageSequence) and
+    passes it through transform, so only the current frame and the first
+    one (savers seek back to it when they finish) are held, however long
+    the animation is. Frames have to be visited in order.
+    """
+
+    def __init__(self, source, transform):
+        super().__init__()
+        self.n_frames = frame_count(source)
+        self.is_animated = True
+        # Per-frame source details, recorded as each frame is produced
+        self.frame_info = []
+        self._frames = ImageSequence.Iterator(source)
+        self._source = source
+        self._transform = transform
+        self._index = -1
+        self._first = None
+        self.seek(0)
+
+    def durations(self):
+        return _PerFrame(self, 'duration')
+
+    def disposals(self):
+        return _PerFrame(self, 'disposal')
+
+    def _show(self, frame):
+        self.im = frame.im
+        self._mode = frame.mode
+        self._size = frame.size
+        self.palette = frame.palette
+        self.info = dict(frame.info)
+
+    def tell(self):
+        return self._index
+
+    def seek(self, frame):
+        if frame == self._index:
+            return
+        if frame == 0 and self._first is not None:
+            self._index = 0
+            self._show(self._first)
+            return
+        if not 0 <= frame < self.n_frames:
+            raise EOFError("no more frames")
+        if frame < self._index:
+            raise ValueError("frames can only be read in order")
+
+        source = self._frames[frame]
+        self.frame_info.extend({} for _ in range(frame + 1 - len(self.frame_info)))
+        # Frames come out composited, so "restore to previous" has to become
+        # "restore to background" (the writer only diffs against the last frame)
+        disposal = getattr(source, 'disposal_method', 0)
+        self.frame_info[frame] = {
+            'duration': source.info.get('duration', 0),
+            'disposal': 2 if disposal == 3 else disposal,
+        }
+        out = self._transform(source)
+        if frame == 0:
+            self._first = out
+        self._index = frame
+        self._show(out)
+
+
+def animation_options(img, output_format, frames):
+    """Extra save arguments for writing frames, read from the source img."""
+    options = {'save_all': True}
+    if output_format not in ANIMATED_FORMATS:
+        return options
+
+    if output_format == 'WebP':
+        options['duration'] = frames.durations()
+        # No loop count in the source means play once
+        options['loop'] = img.info.get('loop', 1)
+        # A GIF's background is a palette index, meaningless to WebP
+        options['background'] = (0, 0, 0, 0)
+    else:
+        if 'loop' in img.info:
+            options['loop'] = img.info['loop']
+        if img.format == 'GIF':
+            options['disposal'] = frames.disposals()
+        elif img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+            # Frames are full canvases; transparent areas must be able to reappear
+            options['disposal'] = 2
+    return options
+
+
+def square(img):
+    """Pad img with transparency to a centred square, as icons expect."""
+    side = max(img.size)
+    if img.width == img.height:
+        return img
+    canvas = Image.new('RGBA', (side, side))
+    img = img if img.mode == 'RGBA' else img.convert('RGBA')
+    canvas.paste(img, ((side - img.width) // 2, (side - img.height) // 2))
+    return canvas
+
+
+def source_icons(img):
+    """Every bitmap of an opened ICO source (none for other formats)."""
+    if img.format != 'ICO':
+        return []
+    return [img.ico.getimage(size) for size in sorted(img.ico.sizes())]
+
+
+def icon_options(img, icons=()):
+    """Save arguments for a multi-resolution ICO of the (square) img.
+
+    Every standard size up to the image's is written. icons are the
+    source's own bitmaps (see source_icons); they're used for the sizes
+    they match, so hand-tuned small sizes aren't replaced by downscales.
+    """
+    side = max(img.size)
+    sizes = [size for size in ICO_SIZES if size[0] <= side] or [(side, side)]
+    options = {'sizes': sizes}
+    own = [icon for icon in icons if icon.size in sizes and icon.size != img.size]
+    if own:
+        # Pillow scales the sizes nobody provided from the last image it was
+        # given, so that must be the full-size one
+        options['append_images'] = own + [img]
+    return options
@@ -0,0 +1,202 @@
+"""
+A queue of conversion jobs that run one at a time.
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+
+from .report import RateMeter
+
+
+class Job:
+    """One batch of files for a ConversionEngine, waiting in or run by a JobQueue.
+
+    The queue's thread tallies every result here (and feeds it to an
+    optional RunReport); a UI reads snapshot() at its own frame rate
+    instead of handling each result itself.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    PAUSED = 'paused'
+    CANCELLED = 'cancelled'
+    DONE = 'done'
+
+    def __init__(self, engine, files, priority=0, name=None, report=None):
+        self.engine = engine
+        self.files = list(files)
+        self.priority = priority
+        self.name = name
+        self.report = report
+        self.state = self.QUEUED
+        self.total = len(self.files) * engine.outputs_per_file
+        self.done = 0
+        self.converted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.saved_bytes = 0
+        self.pixels = 0
+        # The engine's Preflight, once the files' headers have been probed
+        self.plan = None
+        # Set if the engine itself failed, rather than a single file
+        self.error = None
+        self.meter = RateMeter()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.state in (self.CANCELLED, self.DONE)
+
+    def add(self, result):
+        with self._lock:
+            self.done += 1
+            if self.report is not None:
+                self.report.add(result)
+            if result.skipped:
+                self.skipped += 1
+            elif result.ok:
+                self.converted += 1
+                self.saved_bytes += result.saved_bytes
+                self.pixels += result.input_pixels
+            else:
+                self.failed += 1
+
+    def snapshot(self):
+        """Consistent copy of the progress counters, plus live rates and ETA.
+
+        Until the first results give a live rate, the ETA is the plan's
+        estimate.
+        """
+        plan = self.plan
+        with self._lock:
+            snap = {
+                'state': self.state,
+                'done': self.done,
+                'total': self.total,
+                'converted': self.converted,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'saved_bytes': self.saved_bytes,
+            }
+            pixels = self.pixels
+        per_second, pixels_per_second = self.meter.sample(snap['done'], pixels)
+        if self.state == self.PAUSED:
+            per_second = pixels_per_second = 0.0
+        remaining = snap['total'] - snap['done']
+        snap['checking'] = plan is None and self.state == self.RUNNING
+        snap['rejected'] = len(plan.rejected) if plan is not None else 0
+        snap['per_second'] = per_second
+        snap['megapixels_per_second'] = pixels_per_second / 1e6
+        if per_second > 0:
+            snap['eta_seconds'] = remaining / per_second
+        elif plan is not None and plan.sources and not snap['done']:
+            snap['eta_seconds'] = plan.seconds
+        else:
+            snap['eta_seconds'] = None
+        return snap
+
+
+class JobQueue:
+    """Runs submitted jobs one after another on a background thread.
+
+    The highest priority waiting job goes next, in submission order
+    among equals. Results are tallied on their Job as they arrive; a job
+    is put on self.completed once it has finished or been cancelled.
+    """
+
+    def __init__(self):
+        self.completed = queue.Queue()
+        self.current = None
+        self._waiting = []
+        self._order = itertools.count()
+        self._lock = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, engine, files, priority=0, name=None, report=None):
+        """Queue a job behind the running one and return it."""
+        job = Job(engine, files, priority, name, report)
+        with self._lock:
+            heapq.heappush(self._waiting, (-priority, next(self._order), job))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._lock.notify()
+        return job
+
+    def pending(self):
+        """Waiting jobs, next first."""
+        with self._lock:
+            return [job for _, _, job in sorted(self._waiting)]
+
+    def cancel(self, job=None):
+        """Cancel job (default: the running one). Waiting jobs are just dropped."""
+        with self._lock:
+            job = job or self.current
+            if job is None or job.finished:
+                return
+            if job is self.current:
+                job.engine.cancel()
+                job.state = Job.CANCELLED
+                return
+            self._waiting = [entry for entry in self._waiting if entry[2] is not job]
+            heapq.heapify(self._waiting)
+            job.state = Job.CANCELLED
+        self.completed.put(job)
+
+    def cancel_all(self):
+        for job in self.pending():
+            self.cancel(job)
+        self.cancel()
+
+    def pause(self):
+        """Pause the running job; the queue waits behind it."""
+        with self._lock:
+            if self.current is not None and self.current.state == Job.RUNNING:
+                self.current.engine.pause()
+                self.current.state = Job.PAUSED
+
+    def resume(self):
+        with self._lock:
+            if self.current is not None and self.current.state == Job.PAUSED:
+                self.current.engine.resume()
+                self.current.state = Job.RUNNING
+
+    def close(self):
+        """Cancel everything and stop the background thread."""
+        self.cancel_all()
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+
+    def _next(self):
+        with self._lock:
+            while not self._waiting and not self._closed:
+                self._lock.wait()
+            if self._closed:
+                return None
+            job = heapq.heappop(self._waiting)[2]
+            job.state = Job.RUNNING
+            self.current = job
+            return job
+
+    def _run(self):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            try:
+                job.plan = job.engine.preflight(job.files)
+                if not job.engine.cancelled:
+                    for result in job.engine.iter_results(job.files):
+                        job.add(result)
+            except Exception as e:
+                job.error = str(e)
+            finally:
+                with self._lock:
+                    if job.state != Job.CANCELLED:
+                        job.state = Job.DONE
+                    self.current = None
+                self.completed.put(job)
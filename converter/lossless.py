@@ -0,0 +1,257 @@
+"""
+Automatic lossless encoder selection, for the 'Auto' output format.
+
+Each image is encoded several lossless ways in memory (PNG at a few
+zlib settings, an exact palette PNG when it has 256 colours or fewer,
+lossless WebP) and the smallest encoding that decodes back to the very
+same pixels is kept. Choices are remembered by pixel hash, so a re-run
+encodes only the winner.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageChops
+
+from .pixels import WIDE_MODES, numpy
+from .search import encode
+
+
+# Part of every cache key; bump it when CANDIDATES change so old choices are searched again
+CANDIDATES_VERSION = 1
+
+# Modes an exact palette is built for
+PALETTE_MODES = ('RGB', 'RGBA', 'L', 'LA')
+
+# Modes lossless WebP stores without losing anything
+WEBP_MODES = ('RGB', 'RGBA', 'L', 'LA', 'P', '1')
+
+# WebP can't store images wider or taller than this
+WEBP_MAX_SIDE = 16383
+
+# Method 6 was no smaller than 4 on our samples, at several times the time
+WEBP_LOSSLESS = {'lossless': True, 'quality': 100, 'method': 4, 'exact': True}
+
+# Rows hashed at a time, so hashing a huge image doesn't copy all of it
+HASH_ROWS = 256
+
+# Seconds a worker waits for another process's write to the choice cache
+CACHE_TIMEOUT = 5.0
+
+
+def default_encoder_cache_path():
+    """Per-user cache of chosen encoders, next to the manifest."""
+    return os.path.join(os.path.expanduser("~"), ".elsakr-converter", "encoders.db")
+
+
+def exact_palette(img):
+    """img as a P image holding exactly its colours, or None if it has over 256.
+
+    Built with NumPy when it's installed. Without it only RGB images are
+    mapped (Pillow's quantize() can't take a fixed palette with alpha).
+    """
+    if img.mode not in PALETTE_MODES:
+        return None
+    colours = img.getcolors(256)
+    if colours is None:
+        return None
+    colours = [colour if isinstance(colour, tuple) else (colour,) for _, colour in colours]
+    alpha = img.mode in ('RGBA', 'LA')
+    palette = bytearray()
+    for colour in sorted(colours):
+        if img.mode in ('L', 'LA'):
+            colour = colour[:1] * 3 + colour[1:]
+        palette += bytes(colour)
+
+    np = numpy()
+    if np is not None:
+        bands = np.asarray(img).reshape(img.height, img.width, -1)
+        packed = np.zeros((img.height, img.width), dtype=np.uint32)
+        for band in range(bands.shape[2]):
+            packed |= bands[..., bands.shape[2] - 1 - band].astype(np.uint32) << (8 * band)
+        keys = np.array(sorted(int.from_bytes(bytes(colour), 'big') for colour in colours),
+                        dtype=np.uint32)
+        indices = np.searchsorted(keys, packed).astype(np.uint8)
+        out = Image.frombytes('P', img.size, indices.tobytes())
+    elif img.mode == 'RGB':
+        fixed = Image.new('P', (1, 1))
+        fixed.putpalette(palette)
+        out = img.quantize(palette=fixed, dither=Image.Dither.NONE)
+    else:
+        return None
+    out.putpalette(palette, 'RGBA' if alpha else 'RGB')
+    return out
+
+
+class Candidate:
+    """One lossless encoding to try: a format and its options, maybe on a palette copy."""
+
+    def __init__(self, name, output_format, options, modes=None, palette=False):
+        self.name = name
+        self.output_format = output_format
+        self.options = options
+        # Source modes this encoding is tried for (None = every mode)
+        self.modes = modes
+        self.palette = palette
+
+    def accepts(self, img):
+        if self.modes is not None and img.mode not in self.modes:
+            return False
+        return self.output_format != 'WebP' or max(img.size) <= WEBP_MAX_SIDE
+
+    def encode(self, img, options_for):
+        """img encoded this way, or None if it can't be."""
+        if self.palette:
+            img = exact_palette(img)
+            if img is None:
+                return None
+        options = dict(self.options, **options_for(img, self.output_format))
+        try:
+            return encode(img, self.output_format, options)
+        except (OSError, ValueError, KeyError):
+            # e.g. Pillow built without WebP
+            return None
+
+
+CANDIDATES = (
+    Candidate('png', 'PNG', {'optimize': True}),
+    Candidate('png-fast', 'PNG', {'compress_level': 6}),
+    Candidate('png-rle', 'PNG', {'compress_level': 9, 'compress_type': zlib.Z_RLE}),
+    Candidate('png-palette', 'PNG', {'optimize': True}, PALETTE_MODES, palette=True),
+    Candidate('webp', 'WebP', WEBP_LOSSLESS, WEBP_MODES),
+)
+
+
+def pixel_hash(img):
+    """BLAKE2b digest of img's mode, size, palette and pixels."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{CANDIDATES_VERSION}:{img.mode}:{img.width}x{img.height}".encode())
+    if img.mode == 'P':
+        digest.update(bytes(img.getpalette('RGBA') or ()))
+        digest.update(repr(img.info.get('transparency')).encode())
+    for top in range(0, img.height, HASH_ROWS):
+        digest.update(img.crop((0, top, img.width, min(img.height, top + HASH_ROWS))).tobytes())
+    return digest.hexdigest()
+
+
+def decodes_exactly(img, buffer):
+    """True if buffer decodes to img's pixels (alpha, and colour under it, included)."""
+    buffer.seek(0)
+    with Image.open(buffer) as decoded:
+        decoded.load()
+        if img.mode in WIDE_MODES:
+            return decoded.mode == img.mode and decoded.tobytes() == img.tobytes()
+        mode = 'RGBA' if img.has_transparency_data else 'RGB'
+        if decoded.mode != img.mode or img.mode not in ('RGB', 'L'):
+            reference, decoded = img.convert(mode), decoded.convert(mode)
+        else:
+            reference = img
+        difference = ImageChops.difference(reference, decoded)
+        return difference.getbbox(alpha_only=False) is None
+
+
+class EncoderCache:
+    """SQLite table of the encoding chosen for each image, keyed on pixel_hash().
+
+    Every worker process opens the file once (see encoder_cache()) and
+    they share it through SQLite's locking. It's only a cache: when it
+    can't be read or written, the search just runs again.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS choices (
+            hash TEXT PRIMARY KEY,
+            encoder TEXT NOT NULL
+        )
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Outputs of one file are encoded on threads of their own
+        self._conn = sqlite3.connect(path, timeout=CACHE_TIMEOUT, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(self.SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT encoder FROM choices WHERE hash = ?",
+                                         (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def put(self, key, name):
+        try:
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO choices VALUES (?, ?)", (key, name))
+                self._conn.commit()
+        except sqlite3.Error:
+            pass
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def encoder_cache(path):
+    """This process's EncoderCache for path, or None without a path or if it can't be opened."""
+    if path is None:
+        return None
+    with _caches_lock:
+        if path not in _caches:
+            try:
+                _caches[path] = EncoderCache(path)
+            except (OSError, sqlite3.Error):
+                _caches[path] = None
+        return _caches[path]
+
+
+def _no_options(img, output_format):
+    return {}
+
+
+def encode_smallest(img, options_for=None, cache=None):
+    """Encode img losslessly and return (buffer, output format, candidate name).
+
+    Every candidate that accepts img is encoded at once, on a thread
+    each (Pillow releases the GIL while encoding), and the smallest one
+    that decodes to the same pixels wins; PNG with optimize is the
+    fallback. options_for(img, output_format) adds save options, such as
+    metadata, to each. With a cache (an EncoderCache) a remembered choice
+    is encoded on its own.
+    """
+    options_for = options_for or _no_options
+    candidates = [candidate for candidate in CANDIDATES if candidate.accepts(img)]
+
+    key = None
+    if cache is not None:
+        key = pixel_hash(img)
+        name = cache.get(key)
+        for candidate in candidates:
+            if candidate.name == name:
+                buffer = candidate.encode(img, options_for)
+                if buffer is not None:
+                    return buffer, candidate.output_format, candidate.name
+
+    with ThreadPoolExecutor(max_workers=len(candidates)) as pool:
+        buffers = list(pool.map(lambda candidate: candidate.encode(img, options_for),
+                                candidates))
+    ranked = sorted((buffer.getbuffer().nbytes, order)
+                    for order, buffer in enumerate(buffers) if buffer is not None)
+    chosen = 0
+    for _, order in ranked:
+        if decodes_exactly(img, buffers[order]):
+            chosen = order
+            break
+
+    if key is not None:
+        cache.put(key, candidates[chosen].name)
+    return buffers[chosen], candidates[chosen].output_format, candidates[chosen].name
@@ -0,0 +1,150 @@
+"""
+Persistent manifest of finished conversions, used to skip unchanged files.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+
+
+def default_manifest_path():
+    """Per-user manifest location used by the GUI and the CLI's --incremental."""
+    return os.path.join(os.path.expanduser("~"), ".elsakr-converter", "manifest.db")
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """BLAKE2b digest of a file's contents."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def data_hash(data):
+    """file_hash() of a file already read into memory."""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+class Manifest:
+    """SQLite index of source files and the outputs made from them.
+
+    A row is keyed on the source and output paths (a source can have one
+    output per profile) and remembers the source size and mtime (plus an
+    optional content hash), the settings the output was made with, and
+    the output's own size and mtime. An output is skipped when
+    all of those still match, which costs one primary-key lookup and two
+    stat calls. Rows are committed in small batches while a run is going,
+    so a killed run resumes roughly where it stopped.
+    """
+
+    VERSION = 2
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS outputs (
+            source TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            hash TEXT,
+            settings TEXT NOT NULL,
+            output TEXT NOT NULL,
+            output_size INTEGER NOT NULL,
+            output_mtime_ns INTEGER NOT NULL,
+            PRIMARY KEY (source, output)
+        )
+    """
+
+    def __init__(self, path, use_hash=False, commit_every=256, commit_interval=2.0):
+        self.path = path
+        self.use_hash = use_hash
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+
+        # The engine thread writes, the caller may close; never concurrently.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.VERSION:
+            # Older layouts are only a cache; start over
+            self._conn.execute("DROP TABLE IF EXISTS outputs")
+            self._conn.execute(f"PRAGMA user_version = {self.VERSION}")
+        self._conn.execute(self.SCHEMA)
+        self._conn.commit()
+
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def lookup(self, source, output_path):
+        return self._conn.execute(
+            "SELECT size, mtime_ns, hash, settings, output, output_size, output_mtime_ns "
+            "FROM outputs WHERE source = ? AND output = ?", (source, output_path)).fetchone()
+
+    def is_current(self, source, settings_key, output_path):
+        """True if output_path is an up-to-date conversion of source."""
+        row = self.lookup(source, output_path)
+        if row is None:
+            return False
+
+        size, mtime_ns, content_hash, settings, output, output_size, output_mtime_ns = row
+        if settings != settings_key:
+            return False
+
+        try:
+            st = os.stat(source)
+            out = os.stat(output_path)
+        except OSError:
+            return False
+
+        if out.st_size != output_size or out.st_mtime_ns != output_mtime_ns:
+            return False
+        if st.st_size != size:
+            return False
+
+        if st.st_mtime_ns != mtime_ns:
+            # Touched but maybe not modified (copied trees, checkouts...)
+            if not self.use_hash or content_hash is None:
+                return False
+            if file_hash(source) != content_hash:
+                return False
+            self._conn.execute("UPDATE outputs SET mtime_ns = ? WHERE source = ?",
+                               (st.st_mtime_ns, source))
+            self._changed()
+
+        return True
+
+    def record(self, result, settings_key):
+        """Remember a successful conversion."""
+        try:
+            out = os.stat(result.output)
+        except OSError:
+            return
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (result.source, result.original_size, result.source_mtime_ns,
+             result.content_hash, settings_key, result.output,
+             out.st_size, out.st_mtime_ns))
+        self._changed()
+
+    def _changed(self):
+        self._uncommitted += 1
+        now = time.monotonic()
+        if (self._uncommitted >= self.commit_every
+                or now - self._last_commit >= self.commit_interval):
+            self.commit()
+
+    def commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def close(self):
+        if self._conn is not None:
+            self.commit()
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,179 @@
+"""
+Decoding uncompressed BMP/TIFF rasters straight from a memory map.
+"""
+
+import mmap
+
+from PIL import Image
+
+from .pixels import RAW16_DTYPES, numpy, raw16_to_l
+from .transforms import REDUCIBLE_MODES
+
+
+MAPPABLE_FORMATS = ('BMP', 'TIFF')
+
+# Smaller files decode just as fast the normal way
+MAP_MIN_BYTES = 8 * 1024 * 1024
+
+# Rows are unpacked and reduced this many bytes at a time
+MAP_BAND_BYTES = 16 * 1024 * 1024
+
+# Bits per pixel of the raw layouts handled here
+RAW_BITS = {
+    '1': 1, 'L': 8, 'P': 8, 'LA': 16, 'I;16': 16, 'I;16L': 16, 'I;16B': 16,
+    'RGB': 24, 'BGR': 24, 'RGBA': 32, 'RGBX': 32, 'BGRA': 32, 'BGRX': 32, 'CMYK': 32,
+}
+
+
+# Palette and bilevel bands are expanded before they're reduced
+BAND_MODES = {'1': 'L', 'P': 'RGB'}
+
+
+def raw_layout(img):
+    """(offset, rawmode, row_bytes, orientation) of an unloaded image whose
+    pixels are one contiguous uncompressed block, or None.
+
+    Multi-strip TIFFs qualify as long as the strips follow each other in
+    the file.
+    """
+    if img.format not in MAPPABLE_FORMATS or not img.tile:
+        return None
+
+    width, height = img.size
+    # Tiles are plain tuples before Pillow 11, so they're unpacked by position
+    codec, _, first_offset, args = img.tile[0][:4]
+    if codec != 'raw' or isinstance(args, str) or len(args) != 3:
+        return None
+    rawmode, stride, orientation = args
+    if rawmode not in RAW_BITS or orientation not in (1, -1):
+        return None
+    row_bytes = stride or (width * RAW_BITS[rawmode] + 7) // 8
+
+    y = 0
+    for tile in img.tile:
+        codec, (x0, y0, x1, y1), offset, args = tile[:4]
+        if (codec != 'raw' or tuple(args) != (rawmode, stride, orientation)
+                or (x0, x1) != (0, width) or y0 != y
+                or offset != first_offset + y * row_bytes):
+            return None
+        y = y1
+    if y != height or (len(img.tile) > 1 and orientation != 1):
+        return None
+    return first_offset, rawmode, row_bytes, orientation
+
+
+def map_file(filepath):
+    """Read-only memory map of a whole file."""
+    with open(filepath, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def reduce_factor(size, targets):
+    """Largest integer downscale that keeps every target size covered."""
+    if not targets or None in targets:
+        return 1
+    width, height = size
+    return max(1, min(min(width // w, height // h) for w, h in targets))
+
+
+def _band_range(img, layout, top, rows):
+    """Byte range in the file holding image rows [top, top + rows)."""
+    offset, _, row_bytes, orientation = layout
+    if orientation == -1:
+        # Bottom-up: image row y is stored at file row height - 1 - y
+        start = offset + (img.height - top - rows) * row_bytes
+    else:
+        start = offset + top * row_bytes
+    return start, start + rows * row_bytes
+
+
+def _release(buffer, start, end):
+    """Let the OS drop mapped pages that have been consumed."""
+    if isinstance(buffer, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED'):
+        start -= start % mmap.PAGESIZE
+        try:
+            buffer.madvise(mmap.MADV_DONTNEED, start, end - start)
+        except (OSError, ValueError):
+            pass
+
+
+def _narrows(img, eight_bit):
+    """Whether 16 bit grey is scaled to 8 bits straight from the buffer."""
+    return eight_bit and img.mode in RAW16_DTYPES and numpy() is not None
+
+
+def _band(img, buffer, layout, top, rows, eight_bit=False):
+    """Unpack image rows [top, top + rows) from the buffer."""
+    _, rawmode, row_bytes, orientation = layout
+    start, end = _band_range(img, layout, top, rows)
+    if _narrows(img, eight_bit):
+        with memoryview(buffer) as view:
+            return raw16_to_l(view[start:end], img.width, rows, rawmode, row_bytes,
+                              orientation)
+    with memoryview(buffer) as view:
+        band = Image.frombuffer(img.mode, (img.width, rows), view[start:end], 'raw',
+                                rawmode, row_bytes, orientation)
+    if img.mode == 'P':
+        band.putpalette(img.palette)
+        band = band.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    elif img.mode == '1':
+        band = band.convert('L')
+    return band
+
+
+def _reduced(img, buffer, layout, factor, eight_bit=False):
+    """Reduce the raster by factor one band at a time.
+
+    Only the reduced image and one band are in memory at once, never
+    the full-size raster.
+    """
+    row_bytes = layout[2]
+    rows = max(1, MAP_BAND_BYTES // (row_bytes * factor)) * factor
+    reduced = None
+    for top in range(0, img.height, rows):
+        count = min(rows, img.height - top)
+        band = _band(img, buffer, layout, top, count, eight_bit)
+        if factor > 1:
+            band = band.reduce(factor)
+        _release(buffer, *_band_range(img, layout, top, count))
+        if reduced is None:
+            reduced = Image.new(band.mode, (-(-img.width // factor), -(-img.height // factor)))
+        reduced.paste(band, (0, top // factor))
+    reduced.info = {k: v for k, v in img.info.items() if k != 'transparency'}
+    return reduced
+
+
+def load_mapped(img, buffer, targets=(), eight_bit=False):
+    """Decode an opened, unloaded BMP/TIFF from buffer without reading the file.
+
+    buffer is a memory map of the file (see map_file) or its bytes. When
+    every target is at least 2x smaller the raster is reduced band by
+    band; otherwise, if the raw layout matches Pillow's own, the image
+    is a zero-copy view of the buffer. With eight_bit, 16 bit grey is
+    scaled to 8 bits band by band as it's read (see pixels.raw16_to_l).
+    Returns None when none of this applies and the image should be
+    loaded normally.
+    """
+    layout = raw_layout(img)
+    if layout is None or len(buffer) < layout[0] + layout[2] * img.height:
+        return None
+
+    factor = reduce_factor(img.size, targets)
+    if _narrows(img, eight_bit):
+        return _reduced(img, buffer, layout, factor, eight_bit)
+    if factor >= 2:
+        band_mode = BAND_MODES.get(img.mode, img.mode)
+        if band_mode not in REDUCIBLE_MODES:
+            return None
+        return _reduced(img, buffer, layout, factor)
+
+    offset, rawmode, row_bytes, orientation = layout
+    if rawmode != img.mode or rawmode not in Image._MAPMODES:
+        return None
+    data = memoryview(buffer)[offset:offset + row_bytes * img.height]
+    mapped = Image.frombuffer(img.mode, img.size, data, 'raw',
+                              rawmode, row_bytes, orientation)
+    if img.mode == 'P':
+        mapped.putpalette(img.palette)
+    mapped.info = dict(img.info)
+    return mapped
@@ -0,0 +1,158 @@
+"""
+EXIF, ICC profile and XMP carried from sources to outputs.
+"""
+
+import re
+
+from PIL import Image, PngImagePlugin
+
+
+# Outputs that get the source's metadata
+METADATA_FORMATS = ('JPEG', 'WebP', 'PNG', 'TIFF')
+
+ORIENTATION = 0x0112
+EXIF_IFD = 0x8769
+XMP_TAG = 700
+ICC_TAG = 34675
+
+# TIFF tags describing the source file's own pixel layout; a TIFF's
+# EXIF is its first IFD, so these come along and would be wrong in (or
+# override) the output's
+LAYOUT_TAGS = (254, 255, 256, 257, 258, 259, 262, 266, 273, 277, 278, 279, 280, 281, 284,
+               317, 320, 322, 323, 324, 325, 338, 339, 340, 341, 347, 513, 514, 530, 531, 532,
+               XMP_TAG, ICC_TAG)
+
+# Pixel dimensions in the EXIF sub-IFD; stale once the image is resized
+DIMENSION_TAGS = (0xA002, 0xA003)
+
+# JPEG stores EXIF and XMP in 64 KB APP1 segments
+JPEG_SEGMENT_BYTES = 65000
+
+# Transpose that displays an image the way its EXIF orientation says
+TRANSPOSES = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+_XMP_ORIENTATION = re.compile(rb'(tiff:Orientation(?:="|>))[0-9]')
+
+
+def colour_family(mode):
+    """'RGB', 'L' or 'CMYK': the kind of ICC profile pixels in mode need."""
+    if mode == 'CMYK':
+        return 'CMYK'
+    return 'L' if Image.getmodebase(mode) == 'L' else 'RGB'
+
+
+class Metadata:
+    """A source's metadata, read once and written to each of its outputs.
+
+    exif is encoded bytes with the orientation already applied (see
+    orient()), so outputs are stored upright and say so.
+    """
+
+    def __init__(self, exif=None, icc=None, xmp=None, orientation=1, colour=None):
+        self.exif = exif
+        self.icc = icc
+        self.xmp = xmp
+        self.orientation = orientation
+        # Colour family of the pixels the ICC profile describes
+        self.colour = colour
+
+    @property
+    def swaps_axes(self):
+        return self.orientation in (5, 6, 7, 8)
+
+    def oriented_size(self, size):
+        """size (width, height) as displayed, after orient()."""
+        return size[::-1] if self.swaps_axes else size
+
+    def stored_sizes(self, sizes):
+        """Displayed target sizes (None = unchanged) turned back to the stored orientation."""
+        if not self.swaps_axes:
+            return sizes
+        return [size[::-1] if size else size for size in sizes]
+
+    def orient(self, img):
+        """img turned upright, or img itself if it already is."""
+        method = TRANSPOSES.get(self.orientation)
+        return img if method is None else img.transpose(method)
+
+    def without_icc(self):
+        """Copy for outputs whose colours were converted away from the profile."""
+        return Metadata(self.exif, None, self.xmp, self.orientation, self.colour)
+
+    def save_options(self, img, output_format, strip=False):
+        """Save arguments writing the metadata with img (an output) as output_format.
+
+        strip drops EXIF and XMP but keeps the colour profile, which the
+        pixels need to be shown right. A profile is only written if img
+        is still in the colour family it describes.
+        """
+        if output_format not in METADATA_FORMATS:
+            return {}
+        icc = self.icc if colour_family(img.mode) == self.colour else None
+        # Pillow would otherwise copy whatever profile img.info still has
+        options = {'icc_profile': icc}
+        if strip:
+            return options
+
+        exif, xmp = self.exif, self.xmp
+        if output_format == 'JPEG':
+            exif = exif if exif and len(exif) <= JPEG_SEGMENT_BYTES else None
+            xmp = xmp if xmp and len(xmp) <= JPEG_SEGMENT_BYTES else None
+        if output_format == 'TIFF' and xmp:
+            # TIFF keeps XMP as a tag of the IFD the EXIF tags go to
+            tags = Image.Exif()
+            if exif:
+                tags.load(exif)
+            tags[XMP_TAG] = xmp
+            exif, xmp = tags, None
+        elif output_format == 'PNG' and xmp:
+            info = PngImagePlugin.PngInfo()
+            info.add_itxt('XML:com.adobe.xmp', xmp.decode('utf-8', 'replace'))
+            options['pnginfo'] = info
+            xmp = None
+
+        if exif:
+            options['exif'] = exif
+        if xmp:
+            options['xmp'] = xmp
+        return options
+
+
+def read_metadata(img):
+    """Metadata of an opened image, from the headers Pillow has already parsed.
+
+    Nothing is decoded: EXIF is only parsed where the header carried it
+    (or, for TIFF, from its first IFD).
+    """
+    exif = None
+    orientation = 1
+    if 'exif' in img.info or img.format == 'TIFF':
+        tags = img.getexif()
+        orientation = tags.get(ORIENTATION, 1)
+        if orientation not in TRANSPOSES:
+            orientation = 1
+        for tag in (ORIENTATION, *LAYOUT_TAGS):
+            tags.pop(tag, None)
+        if EXIF_IFD in tags:
+            details = tags.get_ifd(EXIF_IFD)
+            for tag in DIMENSION_TAGS:
+                details.pop(tag, None)
+        if len(tags):
+            exif = tags.tobytes()
+
+    xmp = img.info.get('xmp')
+    if isinstance(xmp, str):
+        xmp = xmp.encode('utf-8')
+    if xmp and orientation != 1:
+        xmp = _XMP_ORIENTATION.sub(rb'\g<1>1', xmp)
+
+    return Metadata(exif, img.info.get('icc_profile') or None, xmp or None, orientation,
+                    colour_family(img.mode))
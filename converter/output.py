@@ -0,0 +1,108 @@
+"""
+Output naming and atomic writes.
+"""
+
+import os
+import tempfile
+
+
+# What to do when two outputs (or an output and a source) share a path
+COLLISION_POLICIES = ('suffix', 'skip', 'overwrite')
+
+# Files are written in chunks this large; big writes keep network shares busy
+WRITE_CHUNK = 4 * 1024 * 1024
+
+
+def _current_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once: changing the umask to look at it isn't thread safe
+UMASK = _current_umask()
+
+
+def _path_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class OutputPlanner:
+    """Assigns every (source, profile) of a batch a distinct output path.
+
+    Source paths are claimed up front, so an output never replaces one of
+    the batch's own sources, and each output claims its path in batch
+    order. When a path is already claimed the policy decides: 'suffix'
+    picks the first free name-1, name-2, ...; 'skip' leaves that output
+    out; 'overwrite' keeps the path (last writer wins).
+    """
+
+    def __init__(self, sources, policy='suffix'):
+        if policy not in COLLISION_POLICIES:
+            raise ValueError(f"Unknown collision policy: {policy}")
+        self.policy = policy
+        self._claimed = {_path_key(source): source for source in sources}
+
+    def _free(self, stem, extensions):
+        return all(_path_key(stem + ext) not in self._claimed for ext in extensions)
+
+    def claim(self, source, path, alternates=()):
+        """Return the path to write source's output to, or None to skip it.
+
+        alternates are other extensions the output may be written with
+        instead (see OutputProfile.alternate_extensions); the name is
+        claimed with each of them, so whichever is used is free.
+        """
+        stem, ext = os.path.splitext(path)
+        extensions = (ext, *alternates)
+        if self._free(stem, extensions) or self.policy == 'overwrite':
+            pass
+        elif self.policy == 'skip':
+            return None
+        else:
+            n = 1
+            while not self._free(f"{stem}-{n}", extensions):
+                n += 1
+            stem = f"{stem}-{n}"
+        for extension in extensions:
+            self._claimed[_path_key(stem + extension)] = source
+        return stem + ext
+
+    def owner(self, path, alternates=()):
+        """The source that claimed path, or path with one of the alternates, if any."""
+        stem, ext = os.path.splitext(path)
+        for extension in (ext, *alternates):
+            owner = self._claimed.get(_path_key(stem + extension))
+            if owner is not None:
+                return owner
+        return None
+
+
+def write_atomic(path, data, fsync=False, chunk_size=WRITE_CHUNK):
+    """Write data to path so readers see either the old file or all of it.
+
+    The bytes go to a temporary file in the same folder, written in large
+    chunks, optionally fsynced, and are then renamed over path. An
+    interrupted write leaves at most a stray temp file, never a truncated
+    output.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, temp = tempfile.mkstemp(dir=folder, prefix=f".{os.path.basename(path)}.",
+                                suffix=".tmp")
+    try:
+        with open(fd, 'wb', buffering=0) as f:
+            view = memoryview(data)
+            while view:
+                written = f.write(view[:chunk_size])
+                view = view[written:]
+            if fsync:
+                os.fsync(f.fileno())
+        # mkstemp creates the file private; give it the usual permissions
+        os.chmod(temp, 0o666 & ~UMASK)
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
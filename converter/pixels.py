@@ -0,0 +1,191 @@
+"""
+Bit depth and colour space normalization.
+
+High-bit-depth rasters are scaled to 8 bits with NumPy when it's
+installed (and with Pillow point transforms when it isn't). NumPy is
+only imported once something needs it. Colour profiles are converted
+by LittleCMS through ImageCms.
+"""
+
+import functools
+import io
+
+from PIL import Image
+
+try:
+    from PIL import ImageCms
+except ImportError:
+    ImageCms = None
+
+
+# Single-band modes wider than 8 bits
+WIDE_MODES = ('I;16', 'I;16L', 'I;16B', 'I;16N', 'I', 'F')
+
+# The wide modes each output format stores as they are
+WIDE_FORMATS = {
+    'PNG': ('I;16', 'I;16B', 'I'),
+    'Auto': ('I;16', 'I;16B', 'I'),
+    'TIFF': WIDE_MODES,
+}
+
+# Modes an embedded profile is converted from
+ICC_MODES = ('RGB', 'RGBA', 'L', 'CMYK')
+
+# Byte order of each raw 16 bit layout
+RAW16_DTYPES = {'I;16': '<u2', 'I;16L': '<u2', 'I;16B': '>u2', 'I;16N': '=u2'}
+
+# Rows scaled per step, so temporaries stay small on huge scans
+CHUNK_ROWS = 256
+
+
+@functools.lru_cache(maxsize=None)
+def numpy():
+    """The numpy module, or None if it isn't installed.
+
+    Imported on first use: it takes longer to load than the rest of the
+    engine, and most runs never touch it.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def needs_8bit(mode, output_format):
+    """Whether an image in mode has to be scaled to 8 bits for output_format."""
+    return mode in WIDE_MODES and mode not in WIDE_FORMATS.get(output_format, ())
+
+
+def _scale16(values, out):
+    """Write round(v * 255 / 65535) of a uint16 array into the uint8 array out.
+
+    Computed as (v + 128 - ((v + 128) >> 8)) >> 8, rearranged so no
+    intermediate leaves 16 bits: a few in-place passes over two uint16
+    temporaries per chunk of rows, instead of a 32-bit copy or a
+    per-pixel table lookup.
+    """
+    np = numpy()
+    step = CHUNK_ROWS
+    temp = np.empty((min(step, len(values)),) + values.shape[1:], np.uint16)
+    carry = np.empty_like(temp)
+    for top in range(0, len(values), step):
+        v = values[top:top + step]
+        t = temp[:len(v)]
+        c = carry[:len(v)]
+        np.right_shift(v, 8, out=t)
+        np.subtract(v, t, out=t)
+        # carry = ((v & 255) + 128) >> 8, the bit (v + 128) >> 8 gains over v >> 8
+        np.bitwise_and(v, 255, out=c)
+        c += 128
+        c >>= 8
+        t -= c
+        t += 128
+        np.right_shift(t, 8, out=out[top:top + step], casting='unsafe')
+
+
+def raw16_to_l(data, width, rows, rawmode, row_bytes, orientation=1):
+    """8 bit 'L' image from raw 16 bit grey rows in a buffer, without copying them.
+
+    data is a bytes-like view (e.g. of a memory map) of rows x row_bytes;
+    it's read in place, so the 16 bit raster never exists in memory.
+    Needs NumPy.
+    """
+    np = numpy()
+    rows_view = np.frombuffer(data, np.uint8, rows * row_bytes).reshape(rows, row_bytes)
+    values = rows_view[:, :width * 2].view(RAW16_DTYPES[rawmode])
+    if orientation == -1:
+        values = values[::-1]
+    out = np.empty((rows, width), np.uint8)
+    _scale16(values, out)
+    return Image.fromarray(out)
+
+
+def _to_8bit_numpy(img):
+    np = numpy()
+    values = np.asarray(img)
+    if img.mode == 'F':
+        # Float data is either normalized to 0..1 or already 0..255
+        scale = 255.0 if values.max(initial=0.0) <= 1.0 else 1.0
+        return Image.fromarray(np.clip(values * scale + 0.5, 0, 255).astype(np.uint8))
+    if img.mode == 'I' and values.max(initial=0) <= 255:
+        # 8 bit data that was stored (or decoded) as 32 bit integers
+        return Image.fromarray(np.clip(values, 0, 255).astype(np.uint8))
+    if img.mode == 'I':
+        values = np.clip(values, 0, 65535).astype(np.uint16)
+    out = np.empty(values.shape, np.uint8)
+    _scale16(values, out)
+    return Image.fromarray(out)
+
+
+def _to_8bit_pillow(img):
+    """The same as _to_8bit_numpy(), with Pillow point transforms."""
+    if img.mode == 'F':
+        scale = 255.0 if img.getextrema()[1] <= 1.0 else 1.0
+    elif img.mode == 'I' and img.getextrema()[1] <= 255:
+        scale = 1.0
+    else:
+        # Every 16 bit image is scaled, however dark, as with NumPy
+        img = img.convert('I')
+        scale = 255 / 65535
+    return img.point(lambda v: v * scale + 0.5).convert('L')
+
+
+def to_8bit(img):
+    """Scale a 16 bit (or 32 bit int / float) grey image to 8 bit 'L'.
+
+    Pillow's own convert() clips everything above 255 to white instead.
+    16 bit data is rounded to the nearest 8 bit level; other images are
+    returned unchanged.
+    """
+    if img.mode not in WIDE_MODES:
+        return img
+    img.load()
+    flat = _to_8bit_numpy(img) if numpy() is not None else _to_8bit_pillow(img)
+    flat.info = dict(img.info)
+    return flat
+
+
+@functools.lru_cache(maxsize=16)
+def _srgb_transform(icc, mode):
+    """LittleCMS transform from the profile icc to sRGB, or None if it's sRGB already.
+
+    Building a transform costs more than applying it to a thumbnail, and
+    a batch usually shares a handful of profiles, so they're cached.
+    """
+    profile = ImageCms.ImageCmsProfile(io.BytesIO(icc))
+    if 'srgb' in ImageCms.getProfileDescription(profile).lower().replace(' ', ''):
+        return None
+    out_mode = 'RGBA' if mode == 'RGBA' else 'RGB'
+    return ImageCms.buildTransform(profile, ImageCms.createProfile('sRGB'), mode, out_mode)
+
+
+def to_srgb(img):
+    """Convert img from its embedded colour profile to sRGB.
+
+    The old profile is dropped from the result. Images without a
+    profile, already in sRGB, or in a mode LittleCMS isn't given here
+    are returned as they are.
+    """
+    icc = img.info.get('icc_profile')
+    if not icc or ImageCms is None or img.mode not in ICC_MODES:
+        return img
+    try:
+        transform = _srgb_transform(icc, img.mode)
+    except (OSError, ImageCms.PyCMSError):
+        return img
+    if transform is None:
+        return img
+    out = ImageCms.applyTransform(img, transform)
+    out.info = {key: value for key, value in img.info.items() if key != 'icc_profile'}
+    return out
+
+
+def cmyk_to_rgb(img):
+    """RGB copy of a CMYK image, through its colour profile when it has a usable one."""
+    out = to_srgb(img)
+    if out.mode == 'CMYK':
+        out = img.convert('RGB')
+        # A CMYK profile would be wrong on RGB pixels
+        out.info.pop('icc_profile', None)
+    return out
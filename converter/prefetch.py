@@ -0,0 +1,36 @@
+"""
+Read-ahead of source files into memory.
+"""
+
+import os
+
+
+# Sources are read in chunks this large
+READ_CHUNK = 4 * 1024 * 1024
+
+
+class SourceData:
+    """A source file's bytes plus the stat fields the manifest needs."""
+
+    def __init__(self, data, size, mtime_ns):
+        self.data = data
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+
+def read_source(path, chunk_size=READ_CHUNK):
+    """Read a whole file into memory in large chunks."""
+    with open(path, 'rb', buffering=0) as f:
+        st = os.fstat(f.fileno())
+        data = bytearray(st.st_size)
+        view = memoryview(data)
+        filled = 0
+        while filled < len(data):
+            count = f.readinto(view[filled:filled + chunk_size])
+            if not count:
+                break
+            filled += count
+        view.release()
+        # The file may have changed size since fstat
+        data[filled:] = f.read()
+    return SourceData(data, st.st_size, st.st_mtime_ns)
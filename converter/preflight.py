@@ -0,0 +1,142 @@
+"""
+Pre-flight planning: what a run will do, estimated before it starts.
+"""
+
+import json
+import os
+
+from .frames import keeps_frames
+from .output import write_atomic
+from .profiles import profile_targets
+from .report import format_duration
+
+
+# Encoded bytes per output pixel until past runs say otherwise
+DEFAULT_BYTES_PER_PIXEL = {
+    'JPEG': 0.3, 'WebP': 0.2, 'PNG': 1.5, 'BMP': 3.0, 'TIFF': 3.0, 'GIF': 0.6, 'ICO': 4.0,
+    'Auto': 1.2,
+}
+
+# Worker seconds per source megapixel until past runs say otherwise
+DEFAULT_SECONDS_PER_MEGAPIXEL = 0.06
+
+# Results remembered per format pair; older runs are halved away past this
+HISTORY_WINDOW = 2000
+
+FIELDS = ('count', 'input_pixels', 'output_pixels', 'output_bytes', 'seconds')
+
+
+def default_history_path():
+    """Per-user throughput history, next to the manifest."""
+    return os.path.join(os.path.expanduser("~"), ".elsakr-converter", "history.json")
+
+
+class RunHistory:
+    """Throughput and output size of past conversions, per format pair.
+
+    Totals are kept per 'SOURCE->OUTPUT' (as in RunReport.summary()), so
+    estimates follow what this machine has actually done with this kind
+    of file. A pair that passes HISTORY_WINDOW results has its totals
+    halved, so recent runs outweigh old ones.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.pairs = {}
+        if path is not None:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.pairs = {name: {field: float(totals.get(field, 0)) for field in FIELDS}
+                                  for name, totals in json.load(f).items()}
+            except (OSError, ValueError, AttributeError, TypeError):
+                self.pairs = {}
+
+    def add_report(self, report):
+        """Fold the converted files of a finished RunReport in."""
+        for record in report.records:
+            if record['status'] != 'converted' or not record['input_pixels']:
+                continue
+            name = f"{record['source_format']}->{record['output_format']}"
+            totals = self.pairs.setdefault(name, dict.fromkeys(FIELDS, 0.0))
+            totals['count'] += 1
+            for field in FIELDS[1:]:
+                totals[field] += record[field]
+            if totals['count'] > HISTORY_WINDOW:
+                for field in FIELDS:
+                    totals[field] /= 2
+
+    def save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        write_atomic(self.path, json.dumps(self.pairs, indent=1).encode('utf-8'))
+
+    def _totals(self, source_format, output_format):
+        """Totals for the pair, else for every source to output_format, else None."""
+        totals = self.pairs.get(f"{source_format}->{output_format}")
+        if totals is not None:
+            return totals
+        suffix = f"->{output_format}"
+        matching = [t for name, t in self.pairs.items() if name.endswith(suffix)]
+        if not matching:
+            return None
+        return {field: sum(t[field] for t in matching) for field in FIELDS}
+
+    def rates(self, source_format, output_format):
+        """(bytes per output pixel, seconds per input pixel, measured)."""
+        totals = self._totals(source_format, output_format)
+        if totals is None or not totals['output_pixels'] or not totals['input_pixels']:
+            return (DEFAULT_BYTES_PER_PIXEL.get(output_format, 1.0),
+                    DEFAULT_SECONDS_PER_MEGAPIXEL / 1e6, False)
+        return (totals['output_bytes'] / totals['output_pixels'],
+                totals['seconds'] / totals['input_pixels'], True)
+
+
+class Preflight:
+    """A run's probed sources split into readable and rejected, with estimates.
+
+    output_bytes and seconds (wall time across the workers) come from
+    the history's rates for each source and profile; measured says
+    whether every one of them had past runs to go on. up_to_date counts
+    the files left out because their outputs are current.
+    """
+
+    def __init__(self, paths, infos, settings, history=None, workers=1, up_to_date=0):
+        self.paths = paths
+        self.up_to_date = up_to_date
+        self.sources = [info for info in infos if info.ok]
+        self.rejected = [info for info in infos if not info.ok]
+        self.input_bytes = sum(info.file_size for info in self.sources)
+        self.pixels = sum(info.pixels for info in self.sources)
+        self.output_bytes = 0
+        self.seconds = 0.0
+        self.measured = True
+
+        history = history or RunHistory()
+        worker_seconds = 0.0
+        for info in self.sources:
+            targets = profile_targets(info.size, settings.profiles)
+            for profile, target in zip(settings.profiles, targets):
+                width, height = target or info.size
+                frames = info.n_frames if keeps_frames(info, profile.output_format) else 1
+                per_pixel, per_second, measured = history.rates(info.format,
+                                                                profile.output_format)
+                self.output_bytes += width * height * frames * per_pixel
+                worker_seconds += info.pixels * frames * per_second
+                self.measured = self.measured and measured
+        self.output_bytes = int(self.output_bytes)
+        self.seconds = worker_seconds / max(1, min(workers, len(self.sources)))
+
+    def summary_text(self):
+        """One line for the GUI status and the CLI."""
+        text = f"{len(self.sources)} files ready"
+        if self.up_to_date:
+            text += f", {self.up_to_date} up to date"
+        if self.rejected:
+            text += f", {len(self.rejected)} rejected"
+        if self.sources:
+            guess = "" if self.measured else " (rough, no past runs yet)"
+            text += (f" · {self.pixels / 1e6:,.0f} MP, {self.input_bytes / 1024 ** 2:,.1f} MB in"
+                     f" · ~{self.output_bytes / 1024 ** 2:,.1f} MB out"
+                     f" · ~{format_duration(self.seconds)}{guess}")
+        return text
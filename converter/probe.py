@@ -0,0 +1,148 @@
+"""
+Header-only probing of source files, done before anything is decoded.
+
+Probing opens each source (Image.open reads its header) on a thread in
+the engine's process; the worker that converts the file opens it again
+to decode it. So a converted file is opened twice, once to probe it and
+once to convert it, and the memory budget and the plan reuse the probe
+instead of opening it a third time.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .frames import frame_count
+from .mapped import raw_layout
+
+
+# Headers are read on threads: it's mostly waiting on the disk (or share)
+PROBE_THREADS = 16
+
+
+class SourceInfo:
+    """What a source file's header says about it, or why it can't be read.
+
+    format, mode, size (width, height) and n_frames are named as on an
+    opened Image, so it can stand in for one where only the header
+    matters (memory estimates, keeps_frames()).
+    """
+
+    def __init__(self, path, file_size=0, mtime_ns=0):
+        self.path = path
+        self.file_size = file_size
+        self.mtime_ns = mtime_ns
+        self.format = None
+        self.mode = None
+        self.size = (0, 0)
+        self.n_frames = 1
+        # Pixels are one uncompressed block that can be memory-mapped
+        self.mappable = False
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def pixels(self):
+        return self.size[0] * self.size[1]
+
+
+def probe_file(path):
+    """SourceInfo of path. Only the header is read; errors are recorded, not raised.
+
+    Besides files Pillow can't identify, this catches empty files and
+    uncompressed rasters cut short, whose size is known from the header.
+    Damage inside compressed data only shows when it's decoded.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        info = SourceInfo(path)
+        info.error = e.strerror or str(e)
+        return info
+
+    info = SourceInfo(path, stat.st_size, stat.st_mtime_ns)
+    if not stat.st_size:
+        info.error = "empty file"
+        return info
+    try:
+        with Image.open(path) as img:
+            info.format = img.format
+            info.mode = img.mode
+            info.size = img.size
+            info.n_frames = frame_count(img)
+            layout = raw_layout(img)
+    except Exception as e:
+        info.error = str(e) or type(e).__name__
+        return info
+
+    if layout is not None:
+        offset, _, row_bytes, _ = layout
+        if offset + row_bytes * info.size[1] > stat.st_size:
+            info.error = "truncated file"
+        else:
+            info.mappable = True
+    return info
+
+
+class ProbeCache:
+    """SourceInfo by path, re-probed only when a file's size or mtime changes.
+
+    Kept for as long as its owner (the GUI keeps one for the session), so
+    probing the same files again costs a stat() each, not an open(); the
+    workers still open every file they convert.
+    Safe to use from several threads.
+    """
+
+    def __init__(self):
+        self._infos = {}
+        self._lock = threading.Lock()
+
+    def cached(self, path):
+        """The last SourceInfo of path without checking it's still current, or None."""
+        with self._lock:
+            return self._infos.get(path)
+
+    def get(self, path):
+        """Current SourceInfo of path, probing it if it changed or is new."""
+        info = self.cached(path)
+        if info is not None:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is not None and (stat.st_size, stat.st_mtime_ns) == (
+                    info.file_size, info.mtime_ns):
+                return info
+        info = probe_file(path)
+        with self._lock:
+            self._infos[path] = info
+        return info
+
+    def probe(self, paths, workers=PROBE_THREADS, cancelled=None):
+        """Current SourceInfo of every path, in order, probing in parallel.
+
+        cancelled() is checked between results; once it's true the
+        remaining paths aren't probed and the infos so far are returned.
+        """
+        paths = list(paths)
+        cancelled = cancelled or (lambda: False)
+        infos = []
+        if len(paths) < 2 or workers < 2:
+            for path in paths:
+                if cancelled():
+                    break
+                infos.append(self.get(path))
+            return infos
+        with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+            futures = [executor.submit(self.get, path) for path in paths]
+            for future in futures:
+                if cancelled():
+                    executor.shutdown(cancel_futures=True)
+                    break
+                infos.append(future.result())
+        return infos
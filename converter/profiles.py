@@ -0,0 +1,103 @@
+"""
+Output profiles: one encoded output made from every source.
+"""
+
+import json
+
+from .formats import AUTO_EXTENSIONS, AUTO_FORMAT, SUPPORTED_FORMATS, format_name
+from .search import SEARCHABLE_FORMATS
+from .transforms import RESIZE_MODES, target_size
+
+
+class OutputProfile:
+    """Format, quality, optional resize and filename suffix for one output."""
+
+    def __init__(self, output_format='PNG', quality=85, max_width=None, max_height=None,
+                 resize_mode='fit', suffix='', max_bytes=None, target_psnr=None):
+        if output_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        if resize_mode not in RESIZE_MODES:
+            raise ValueError(f"Unsupported resize mode: {resize_mode}")
+        if any(limit is not None and limit < 1 for limit in (max_width, max_height)):
+            raise ValueError("Max size must be at least 1 pixel")
+        self.output_format = output_format
+        self.quality = quality
+        # Optional downscale to fit (or fill) max_width x max_height
+        self.max_width = max_width or None
+        self.max_height = max_height or None
+        self.resize_mode = resize_mode
+        # Appended to the source stem, e.g. photo-1920.webp
+        self.suffix = suffix
+        # Per-image quality search for JPEG/WebP, quality is the ceiling
+        self.max_bytes = max_bytes or None
+        self.target_psnr = target_psnr
+
+    @property
+    def extension(self):
+        return SUPPORTED_FORMATS[self.output_format]
+
+    @property
+    def alternate_extensions(self):
+        """Other extensions the output may end up with, besides self.extension."""
+        if self.output_format == AUTO_FORMAT:
+            return AUTO_EXTENSIONS[1:]
+        return ()
+
+    @property
+    def searches_quality(self):
+        return (self.output_format in SEARCHABLE_FORMATS
+                and (self.max_bytes is not None or self.target_psnr is not None))
+
+    def filename(self, stem):
+        return f"{stem}{self.suffix}{self.extension}"
+
+    def filenames(self, stem):
+        """filename(stem) and the names it may be written as instead."""
+        return [f"{stem}{self.suffix}{extension}"
+                for extension in (self.extension, *self.alternate_extensions)]
+
+    @classmethod
+    def from_dict(cls, options):
+        """Build a profile from job-file style keys (format, quality, ...)."""
+        options = dict(options)
+        unknown = set(options) - {'format', 'quality', 'max_width', 'max_height',
+                                  'resize_mode', 'suffix', 'max_bytes', 'target_psnr'}
+        if unknown:
+            raise ValueError(f"Unknown profile option(s): {', '.join(sorted(unknown))}")
+        if 'format' in options:
+            options['output_format'] = format_name(options.pop('format'))
+        return cls(**options)
+
+
+def profile_targets(size, profiles):
+    """The size each profile scales an image of this size to (None = unchanged)."""
+    return [target_size(size, profile.max_width, profile.max_height, profile.resize_mode)
+            for profile in profiles]
+
+
+def parse_profile(spec):
+    """Parse 'format=webp,quality=80,max_width=1920,suffix=-1920'."""
+    options = {}
+    for item in spec.split(','):
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"Expected key=value, got '{item}'")
+        key = key.strip().replace('-', '_')
+        value = value.strip()
+        if key in ('quality', 'max_width', 'max_height', 'max_bytes'):
+            value = int(value)
+        elif key == 'target_psnr':
+            value = float(value)
+        options[key] = value
+    return OutputProfile.from_dict(options)
+
+
+def load_job(path):
+    """Read the output profiles from a JSON job file.
+
+    {"profiles": [{"format": "WebP", "quality": 80, "max_width": 1920,
+                   "suffix": "-1920"}, ...]}
+    """
+    with open(path, encoding='utf-8') as f:
+        job = json.load(f)
+    return [OutputProfile.from_dict(options) for options in job['profiles']]
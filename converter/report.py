@@ -0,0 +1,192 @@
+"""
+Per-stage timing and run reports.
+"""
+
+import csv
+import json
+import time
+from collections import defaultdict, deque
+
+
+STAGES = ('decode', 'transform', 'encode', 'write')
+
+
+class StageTimer:
+    """Accumulates wall time per pipeline stage."""
+
+    def __init__(self):
+        self.timings = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        """Charge the time since the previous lap to stage."""
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + now - self._last
+        self._last = now
+
+
+class RateMeter:
+    """Live rate of a growing count over a sliding time window.
+
+    Fed with samples of running totals (not per item), so it costs
+    nothing between the moments someone looks at it.
+    """
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self._samples = deque()
+
+    def sample(self, count, pixels=0, now=None):
+        """Record the totals reached by now and return (items/s, pixels/s)."""
+        now = time.monotonic() if now is None else now
+        samples = self._samples
+        samples.append((now, count, pixels))
+        # Keep one sample at least a window old to measure against
+        while len(samples) > 2 and now - samples[1][0] >= self.window:
+            samples.popleft()
+        start, first_count, first_pixels = samples[0]
+        elapsed = now - start
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (count - first_count) / elapsed, (pixels - first_pixels) / elapsed
+
+
+def format_duration(seconds):
+    """Short human readable duration for ETAs."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class RunReport:
+    """Collects per-file measurements for a run and summarises them."""
+
+    FIELDS = ('source', 'output', 'status', 'error', 'source_format', 'output_format',
+              'quality', 'encoder', 'input_pixels', 'output_pixels', 'input_bytes',
+              'output_bytes', 'seconds', *(f'{stage}_seconds' for stage in STAGES))
+
+    def __init__(self, output_format=None):
+        self.output_format = output_format
+        self.records = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.wall_seconds = 0.0
+
+    def add(self, result):
+        if result.skipped:
+            status = 'skipped'
+        elif not result.ok:
+            status = 'failed'
+        elif result.duplicate_of:
+            status = 'duplicate'
+        else:
+            status = 'converted'
+
+        record = {
+            'source': result.source,
+            'output': result.output,
+            'status': status,
+            'error': result.error,
+            'source_format': result.source_format,
+            'output_format': result.output_format or self.output_format,
+            'quality': result.quality,
+            'encoder': result.encoder,
+            'input_pixels': result.input_pixels,
+            'output_pixels': result.output_pixels,
+            'input_bytes': result.original_size,
+            'output_bytes': result.new_size,
+            'seconds': result.seconds,
+        }
+        for stage in STAGES:
+            record[f'{stage}_seconds'] = result.timings.get(stage, 0.0)
+        self.records.append(record)
+        self.wall_seconds = time.perf_counter() - self._start
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self._start
+
+    def summary(self):
+        """Aggregate throughput and latency figures."""
+        converted = [r for r in self.records if r['status'] == 'converted']
+        wall = self.wall_seconds or 1e-9
+        pixels = sum(r['input_pixels'] for r in converted)
+
+        by_format = defaultdict(list)
+        for record in converted:
+            by_format[f"{record['source_format']}->{record['output_format']}"].append(record)
+
+        formats = {}
+        for name, records in sorted(by_format.items()):
+            latencies = [r['seconds'] for r in records]
+            formats[name] = {
+                'count': len(records),
+                'p50_seconds': percentile(latencies, 50),
+                'p95_seconds': percentile(latencies, 95),
+                'p99_seconds': percentile(latencies, 99),
+                'stage_seconds': {stage: sum(r[f'{stage}_seconds'] for r in records)
+                                  for stage in STAGES},
+                'input_bytes': sum(r['input_bytes'] for r in records),
+                'output_bytes': sum(r['output_bytes'] for r in records),
+            }
+
+        counts = defaultdict(int)
+        for record in self.records:
+            counts[record['status']] += 1
+
+        latencies = [r['seconds'] for r in converted]
+        return {
+            'started_at': self.started_at,
+            'wall_seconds': self.wall_seconds,
+            'files': len(self.records),
+            'converted': counts['converted'],
+            'duplicates': counts['duplicate'],
+            'skipped': counts['skipped'],
+            'failed': counts['failed'],
+            'images_per_second': len(converted) / wall,
+            'megapixels_per_second': pixels / 1e6 / wall,
+            'input_bytes': sum(r['input_bytes'] for r in converted),
+            'output_bytes': sum(r['output_bytes'] for r in converted),
+            'p50_seconds': percentile(latencies, 50),
+            'p95_seconds': percentile(latencies, 95),
+            'p99_seconds': percentile(latencies, 99),
+            'formats': formats,
+        }
+
+    def summary_text(self):
+        """Short multi-line summary for the GUI and CLI."""
+        summary = self.summary()
+        return (f"Throughput: {summary['images_per_second']:.1f} img/s, "
+                f"{summary['megapixels_per_second']:.1f} MP/s\n"
+                f"Latency p50/p95/p99: {summary['p50_seconds'] * 1000:.0f}/"
+                f"{summary['p95_seconds'] * 1000:.0f}/{summary['p99_seconds'] * 1000:.0f} ms")
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.summary(), 'files': self.records}, f, indent=2)
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+            writer.writeheader()
+            writer.writerows(self.records)
+
+    def write(self, path):
+        """Write the report as CSV or JSON depending on the extension."""
+        if path.lower().endswith('.csv'):
+            self.write_csv(path)
+        else:
+            self.write_json(path)
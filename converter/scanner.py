@@ -0,0 +1,108 @@
+"""
+Recursive folder scanning built on os.scandir.
+"""
+
+import os
+import queue
+import threading
+import time
+from fnmatch import fnmatch
+
+from .formats import INPUT_EXTENSIONS
+
+
+def _matches(patterns, rel_path, name):
+    return any(fnmatch(rel_path, p) or fnmatch(name, p) for p in patterns)
+
+
+def scan_folder(root, include=None, exclude=None, max_depth=None,
+                extensions=INPUT_EXTENSIONS, cancel=None):
+    """Yield (path, size) for every image file under root.
+
+    Patterns are globs matched against both the file name and the path
+    relative to root (with '/' separators). Exclude patterns also prune
+    whole directories. max_depth=0 only scans root itself. Sizes come from
+    the DirEntry stat, so no extra getsize call is made per file.
+    """
+    stack = [(root, "", 0)]
+
+    while stack:
+        if cancel is not None and cancel.is_set():
+            return
+
+        folder, prefix, depth = stack.pop()
+        try:
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel_path = prefix + entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if max_depth is not None and depth >= max_depth:
+                        continue
+                    if exclude and _matches(exclude, rel_path, entry.name):
+                        continue
+                    subdirs.append((entry.path, rel_path + "/", depth + 1))
+                elif entry.name.lower().endswith(extensions) and entry.is_file():
+                    if include and not _matches(include, rel_path, entry.name):
+                        continue
+                    if exclude and _matches(exclude, rel_path, entry.name):
+                        continue
+                    yield entry.path, entry.stat().st_size
+            except OSError:
+                continue
+
+        # Reversed so the stack visits subfolders in name order
+        stack.extend(reversed(subdirs))
+
+
+class FolderScanner:
+    """Scans folders on a background thread and hands results over in batches.
+
+    Each batch is a (paths, sizes) pair put on self.batches; None marks the
+    end of the scan. A batch is flushed once it is full or has been
+    collecting for flush_interval seconds, so results from slow network
+    mounts still trickle in.
+    """
+
+    def __init__(self, roots, batch_size=2000, flush_interval=0.2, **options):
+        self.roots = list(roots)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.options = options
+        self.batches = queue.Queue()
+        self.found = 0
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _run(self):
+        paths, sizes = [], []
+        last_flush = time.monotonic()
+
+        try:
+            for root in self.roots:
+                for path, size in scan_folder(root, cancel=self._cancel, **self.options):
+                    paths.append(path)
+                    sizes.append(size)
+                    now = time.monotonic()
+                    if len(paths) >= self.batch_size or now - last_flush >= self.flush_interval:
+                        self.found += len(paths)
+                        self.batches.put((paths, sizes))
+                        paths, sizes = [], []
+                        last_flush = now
+        finally:
+            if paths:
+                self.found += len(paths)
+                self.batches.put((paths, sizes))
+            self.batches.put(None)
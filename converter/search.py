@@ -0,0 +1,87 @@
+"""
+Per-image quality search against a byte budget or a PSNR target.
+"""
+
+import io
+import math
+
+from PIL import Image, ImageChops, ImageStat
+
+
+SEARCHABLE_FORMATS = ('JPEG', 'WebP')
+MIN_QUALITY = 5
+
+
+def encode(img, output_format, options):
+    """Encode img into an in-memory buffer."""
+    buffer = io.BytesIO()
+    img.save(buffer, format=output_format, **options)
+    return buffer
+
+
+def psnr(reference, buffer):
+    """Peak signal-to-noise ratio (dB) of an encoded candidate vs reference."""
+    buffer.seek(0)
+    with Image.open(buffer) as candidate:
+        candidate = candidate.convert(reference.mode)
+        rms = ImageStat.Stat(ImageChops.difference(reference, candidate)).rms
+    mse = sum(value * value for value in rms) / len(rms)
+    if mse == 0:
+        return math.inf
+    return 10 * math.log10(255 * 255 / mse)
+
+
+def _largest(lo, hi, ok):
+    """Largest q in [lo, hi] with ok(q), assuming ok is true below some point."""
+    best = None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if ok(mid):
+            best, lo = mid, mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+
+def _smallest(lo, hi, ok):
+    """Smallest q in [lo, hi] with ok(q), assuming ok is true above some point."""
+    best = None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if ok(mid):
+            best, hi = mid, mid - 1
+        else:
+            lo = mid + 1
+    return best
+
+
+def search_quality(img, output_format, options, max_bytes=None, target_psnr=None):
+    """Pick the quality for one image and return (buffer, quality).
+
+    options['quality'] is the ceiling. With target_psnr the lowest quality
+    that still reaches it is chosen; with max_bytes the result is further
+    capped to the highest quality that fits (or MIN_QUALITY if nothing
+    does). Every candidate is encoded from the same decoded image into
+    memory, and each quality is encoded at most once.
+    """
+    ceiling = options.get('quality', 85)
+    candidates = {}
+
+    def candidate(quality):
+        if quality not in candidates:
+            candidates[quality] = encode(img, output_format, dict(options, quality=quality))
+        return candidates[quality]
+
+    quality = ceiling
+    if target_psnr is not None:
+        reference = img if img.mode in ('RGB', 'L') else img.convert('RGB')
+        found = _smallest(MIN_QUALITY, ceiling,
+                          lambda q: psnr(reference, candidate(q)) >= target_psnr)
+        quality = found if found is not None else ceiling
+
+    if max_bytes is not None and candidate(quality).getbuffer().nbytes > max_bytes:
+        found = _largest(MIN_QUALITY, quality - 1,
+                         lambda q: candidate(q).getbuffer().nbytes <= max_bytes)
+        quality = found if found is not None else MIN_QUALITY
+
+    return candidate(quality), quality
@@ -0,0 +1,276 @@
+"""
+Lazily generated, cached thumbnails and quality previews for the GUI.
+"""
+
+import hashlib
+import io
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from .engine import decode_for_targets, prepare_image, save_options
+from .formats import AUTO_FORMAT
+from .lossless import encode_smallest
+from .metadata import read_metadata
+from .output import write_atomic
+from .pixels import cmyk_to_rgb
+from .search import encode
+from .transforms import target_size
+
+
+THUMB_SIZE = 192
+
+# Decoded thumbnails kept in memory (RGBA at THUMB_SIZE is ~144 KB each)
+MEMORY_BYTES = 64 * 1024 * 1024
+
+# Encoded thumbnails kept on disk, oldest used dropped first
+DISK_BYTES = 256 * 1024 * 1024
+
+# Disk usage is checked again after this many new thumbnails
+PRUNE_EVERY = 256
+
+
+def default_thumbnail_dir():
+    """Per-user thumbnail cache folder, next to the manifest."""
+    return os.path.join(os.path.expanduser("~"), ".elsakr-converter", "thumbs")
+
+
+def thumbnail_key(path, size=THUMB_SIZE):
+    """Cache key of path's thumbnail; changes whenever the file does."""
+    stat = os.stat(path)
+    ident = f"{os.path.abspath(path)}\0{stat.st_mtime_ns}\0{stat.st_size}\0{size}"
+    return hashlib.blake2b(ident.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+
+def make_thumbnail(path, size=THUMB_SIZE):
+    """Decode path at reduced size and shrink it to fit size x size.
+
+    JPEGs are drafted and big uncompressed BMP/TIFF are reduced straight
+    from a memory map, so even huge sources are never decoded at full size.
+    Photos are turned upright as their EXIF orientation says.
+    """
+    with Image.open(path) as img:
+        metadata = read_metadata(img)
+        target = target_size(img.size, size, size)
+        img = decode_for_targets(img, [target] if target else [None], path, eight_bit=True)
+        img = metadata.orient(img)
+        if img.mode == 'CMYK':
+            img = cmyk_to_rgb(img)
+        has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+        # convert() also copies, so nothing keeps the file or its map open
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+    img.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return img
+
+
+def preview_encode(img, profile):
+    """Encode img with the profile's format and quality and decode it again.
+
+    Returns (decoded image, encoded byte count), showing what the
+    conversion would do to the image at this size.
+    """
+    prepared = prepare_image(img, profile.output_format)
+    if profile.output_format == AUTO_FORMAT:
+        buffer = encode_smallest(prepared)[0]
+    else:
+        buffer = encode(prepared, profile.output_format, save_options(profile))
+    buffer.seek(0)
+    with Image.open(buffer) as encoded:
+        encoded = encoded.convert(img.mode)
+    return encoded, buffer.getbuffer().nbytes
+
+
+def split_view(before, after):
+    """The left half of before next to the right half of after, with a divider."""
+    view = before.copy()
+    half = view.width // 2
+    view.paste(after.crop((half, 0, after.width, after.height)), (half, 0))
+    view.paste((255, 255, 255) + (255,) * (len(view.getbands()) - 3),
+               (half, 0, half + 1, view.height))
+    return view
+
+
+def _image_bytes(img):
+    return img.width * img.height * len(img.getbands())
+
+
+class ThumbnailCache:
+    """Thumbnails by path and mtime, in a bounded LRU in memory and on disk.
+
+    Memory holds decoded images up to memory_bytes. The disk cache keeps
+    small encoded copies across runs up to disk_bytes; a hit refreshes
+    the file's mtime so the least recently used ones are pruned first.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, folder=None, size=THUMB_SIZE, memory_bytes=MEMORY_BYTES,
+                 disk_bytes=DISK_BYTES):
+        self.folder = folder
+        self.size = size
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._used = 0
+        self._written = 0
+        self._lock = threading.Lock()
+
+    def _disk_path(self, key):
+        return os.path.join(self.folder, key[:2], key + '.thumb')
+
+    def _remember(self, key, img):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = img
+            self._used += _image_bytes(img)
+            while self._used > self.memory_bytes and len(self._memory) > 1:
+                _, old = self._memory.popitem(last=False)
+                self._used -= _image_bytes(old)
+
+    def _load(self, key):
+        path = self._disk_path(key)
+        try:
+            with Image.open(path) as img:
+                img.load()
+            os.utime(path)
+            return img
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, img):
+        path = self._disk_path(key)
+        buffer = io.BytesIO()
+        if img.mode == 'RGBA':
+            img.save(buffer, 'PNG', compress_level=1)
+        else:
+            img.save(buffer, 'JPEG', quality=90)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Another thread may be reading or writing the same thumbnail
+            write_atomic(path, buffer.getbuffer())
+        except OSError:
+            return
+        with self._lock:
+            self._written += 1
+            prune = self._written % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def get(self, path):
+        """The thumbnail of path, generating it if needed. Raises on bad images."""
+        key = thumbnail_key(path, self.size)
+        with self._lock:
+            img = self._memory.get(key)
+            if img is not None:
+                self._memory.move_to_end(key)
+                return img
+
+        img = self._load(key) if self.folder else None
+        if img is None:
+            img = make_thumbnail(path, self.size)
+            if self.folder:
+                self._store(key, img)
+        self._remember(key, img)
+        return img
+
+    def prune(self):
+        """Drop the least recently used disk thumbnails beyond disk_bytes."""
+        entries = []
+        try:
+            for bucket in os.scandir(self.folder):
+                if bucket.is_dir():
+                    for entry in os.scandir(bucket.path):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class ThumbnailLoader:
+    """Generates thumbnails and previews on background threads.
+
+    request() replaces the wanted set with the paths currently in view,
+    so scrolling quickly past thousands of rows only ever decodes what
+    the user stops on. Finished thumbnails are put on self.thumbnails as
+    (path, image or None) and previews on self.previews as (path,
+    profile, before, after, encoded bytes); only the latest preview
+    request is kept. Images that can't be read come back as None.
+    """
+
+    def __init__(self, cache, workers=2):
+        self.cache = cache
+        self.thumbnails = queue.Queue()
+        self.previews = queue.Queue()
+        self._wanted = OrderedDict()
+        self._preview = None
+        self._lock = threading.Condition()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, daemon=True)
+                         for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def request(self, paths):
+        """Generate thumbnails for paths, first first, dropping older requests."""
+        with self._lock:
+            self._wanted = OrderedDict.fromkeys(paths)
+            self._lock.notify_all()
+
+    def request_preview(self, path, profile):
+        """Preview path, encoded with profile unless it's None.
+
+        Replaces any preview that hasn't started yet.
+        """
+        with self._lock:
+            self._preview = (path, profile)
+            self._lock.notify()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+
+    def _next(self):
+        with self._lock:
+            while not self._closed and self._preview is None and not self._wanted:
+                self._lock.wait()
+            if self._closed:
+                return None, None
+            if self._preview is not None:
+                task, self._preview = self._preview, None
+                return 'preview', task
+            return 'thumbnail', self._wanted.popitem(last=False)[0]
+
+    def _run(self):
+        while True:
+            kind, task = self._next()
+            if kind is None:
+                return
+            if kind == 'thumbnail':
+                try:
+                    img = self.cache.get(task)
+                except Exception:
+                    img = None
+                self.thumbnails.put((task, img))
+                continue
+
+            path, profile = task
+            try:
+                before = self.cache.get(path)
+                after, size = (None, 0) if profile is None else preview_encode(before, profile)
+            except Exception:
+                before, after, size = None, None, 0
+            self.previews.put((path, profile, before, after, size))
@@ -0,0 +1,161 @@
+"""
+Pixel transforms applied between decoding and encoding.
+"""
+
+import math
+
+from PIL import Image
+
+
+RESIZE_MODES = ('fit', 'fill')
+
+# Modes Image.reduce() accepts
+REDUCIBLE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'RGBa', 'CMYK', 'YCbCr', 'I', 'F')
+
+
+def target_size(size, max_width=None, max_height=None, mode='fit'):
+    """Size to scale to, or None if the image already fits.
+
+    'fit' keeps the whole image inside max_width x max_height. 'fill'
+    covers the box and is cropped to it afterwards (see resize_image).
+    Images are never enlarged.
+    """
+    width, height = size
+    scales = []
+    if max_width:
+        scales.append(max_width / width)
+    if max_height:
+        scales.append(max_height / height)
+    if not scales:
+        return None
+
+    scale = max(scales) if mode == 'fill' and len(scales) == 2 else min(scales)
+    if scale >= 1:
+        return None
+    return (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale)))
+
+
+def draft_for_resize(img, max_width=None, max_height=None, mode='fit'):
+    """Ask the decoder for the smallest draft that still covers the target.
+
+    Has to happen before the image is loaded; does nothing afterwards or
+    for formats without reduced-size decoding.
+    """
+    size = target_size(img.size, max_width, max_height, mode)
+    if size is not None:
+        draft_for_targets(img, [size])
+
+
+def draft_for_targets(img, sizes):
+    """Draft at the smallest scale that still covers every size in sizes."""
+    # draft() only ever picks a scale that is still at least the requested size
+    img.draft(img.mode, (max(w for w, _ in sizes), max(h for _, h in sizes)))
+
+
+def resize_image(img, max_width=None, max_height=None, mode='fit'):
+    """Downscale img, decoding at reduced size where the format allows it.
+
+    Best called before the image is loaded (or after draft_for_resize):
+    for JPEG sources draft() makes libjpeg decode straight at 1/2, 1/4
+    or 1/8 scale. What's left is shrunk by an integer factor with
+    reduce() and only the final step uses a full Lanczos resample.
+    """
+    draft_for_resize(img, max_width, max_height, mode)
+    size = target_size(img.size, max_width, max_height, mode)
+
+    if size is not None:
+        # Palette and bilevel images can only be resized with nearest neighbour
+        if img.mode == 'P':
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        elif img.mode == '1':
+            img = img.convert('L')
+
+        factor = min(img.width // size[0], img.height // size[1])
+        if factor >= 2 and img.mode in REDUCIBLE_MODES:
+            img = img.reduce(factor)
+
+        if img.size != size:
+            img = img.resize(size, Image.Resampling.LANCZOS)
+
+    # The draft may already have landed exactly on the covering size
+    if (mode == 'fill' and max_width and max_height
+            and (img.width > max_width or img.height > max_height)):
+        crop_w, crop_h = min(max_width, img.width), min(max_height, img.height)
+        left = (img.width - crop_w) // 2
+        top = (img.height - crop_h) // 2
+        img = img.crop((left, top, left + crop_w, top + crop_h))
+
+    return img
+
+
+def has_alpha(img):
+    """True if img has an alpha band or palette transparency."""
+    return img.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La') or (
+        img.mode == 'P' and 'transparency' in img.info)
+
+
+def _flatten_palette(img, background):
+    """Blend the palette itself with the background, then expand once.
+
+    Palette transparency is per entry, so compositing the (at most 256)
+    palette colours gives exactly the per-pixel result without ever
+    building an RGBA copy of the image.
+    """
+    transparency = img.info['transparency']
+    palette = img.getpalette('RGB')
+    entries = len(palette) // 3
+
+    if isinstance(transparency, int):
+        alphas = [255] * entries
+        if transparency < entries:
+            alphas[transparency] = 0
+    else:
+        alphas = list(transparency[:entries]) + [255] * (entries - len(transparency))
+
+    blended = []
+    for index, alpha in enumerate(alphas):
+        for channel in range(3):
+            color = palette[index * 3 + channel]
+            blended.append((color * alpha + background[channel] * (255 - alpha) + 127) // 255)
+
+    # Copy the 1-byte-per-pixel index plane; the source may be shared
+    flat = img.copy()
+    flat.putpalette(blended)
+    del flat.info['transparency']
+    return flat.convert('RGB')
+
+
+def flatten_alpha(img, background=(255, 255, 255)):
+    """Composite img onto a solid background colour and return an RGB image.
+
+    RGBA images are pasted using themselves as the mask, which Pillow
+    blends in one pass straight from the alpha band (no split(), no
+    converted copy). Palette images with transparency are flattened at
+    the palette level. LA on a grey background (white by default) is
+    composited as one grey band and expanded to RGB once at the end.
+    Otherwise LA and PA have only their colour expanded to RGB, pasted
+    with the alpha band as the mask (an LA image is a mask as it is), so
+    no RGBA copy is made. Premultiplied modes are converted to RGBA
+    first. Images without alpha are just converted to RGB.
+    """
+    if img.mode == 'P' and 'transparency' in img.info and img.palette.mode == 'RGB':
+        return _flatten_palette(img, background)
+
+    if not has_alpha(img):
+        return img if img.mode == 'RGB' else img.convert('RGB')
+
+    if img.mode == 'LA' and len(set(background)) == 1:
+        grey = Image.new('L', img.size, background[0])
+        grey.paste(img.getchannel('L'), mask=img)
+        return grey.convert('RGB')
+
+    flat = Image.new('RGB', img.size, background)
+    if img.mode in ('LA', 'PA'):
+        mask = img if img.mode == 'LA' else img.getchannel('A')
+        flat.paste(img.convert('RGB'), mask=mask)
+        return flat
+
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    flat.paste(img, mask=img)
+    return flat
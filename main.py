@@ -9,9 +9,35 @@ import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
-import threading
+import multiprocessing
+import queue
 from pathlib import Path
 
+from converter import (
+    COLLISION_POLICIES,
+    INPUT_EXTENSIONS,
+    SUPPORTED_FORMATS,
+    ConversionEngine,
+    ConversionSettings,
+    FileStore,
+    FolderScanner,
+    JobQueue,
+    Manifest,
+    OutputProfile,
+    ProbeCache,
+    RunHistory,
+    RunReport,
+    ThumbnailCache,
+    ThumbnailLoader,
+    default_encoder_cache_path,
+    default_history_path,
+    default_manifest_path,
+    default_thumbnail_dir,
+    default_workers,
+    format_duration,
+    split_view,
+)
+
 
 class Colors:
     """Premium dark theme colors."""
@@ -119,79 +145,197 @@ class PremiumCard(tk.Frame):
         self.config(highlightbackground=Colors.BORDER, highlightthickness=1)
 
 
-class FileListItem(tk.Frame):
-    """Single file item in the list."""
+def format_size(size):
+    """Human readable file size."""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+# How often the progress display is refreshed while converting
+UI_FPS = 15
+
+
+class VirtualFileList(tk.Canvas):
+    """Scrollable file list that only draws the rows currently in view."""
     
-    def __init__(self, parent, filepath, on_remove=None, **kwargs):
-        super().__init__(parent, bg=Colors.BG_INPUT, **kwargs)
+    ROW_HEIGHT = 36
+    ROW_GAP = 4
+    EMPTY_TEXT = "No files added\n\nClick 'Add Files' or 'Add Folder' to start"
+    ICON_SIZE = 28
+    
+    def __init__(self, parent, store, on_remove=None, on_select=None, on_visible=None,
+                 icons=None, **kwargs):
+        super().__init__(parent, bg=Colors.BG_CARD, highlightthickness=0, **kwargs)
         
-        self.filepath = filepath
+        self.store = store
         self.on_remove = on_remove
+        self.on_select = on_select
+        self.on_visible = on_visible
+        # Row thumbnails by path, filled in by the owner as they arrive
+        self.icons = icons if icons is not None else {}
+        self.offset = 0
+        self.hover_index = None
+        self.selected = None
+        self.visible = []
+        self.scroll_command = None
+        
+        self.bind("<Configure>", lambda e: self.refresh())
+        self.bind("<MouseWheel>", self.on_mousewheel)
+        self.bind("<Button-4>", lambda e: self.yview("scroll", -3, "units"))
+        self.bind("<Button-5>", lambda e: self.yview("scroll", 3, "units"))
+        self.bind("<Button-1>", self.on_click)
+        self.bind("<Motion>", self.on_motion)
+        self.bind("<Leave>", lambda e: self.set_hover(None))
         
-        self.config(highlightbackground=Colors.BORDER, highlightthickness=1)
-        
-        # File icon and name
-        filename = os.path.basename(filepath)
-        ext = os.path.splitext(filename)[1].upper()
+    @property
+    def pitch(self):
+        return self.ROW_HEIGHT + self.ROW_GAP
         
-        info_frame = tk.Frame(self, bg=Colors.BG_INPUT)
-        info_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10, pady=8)
+    def content_height(self):
+        return len(self.store) * self.pitch
         
-        # Extension badge
-        ext_label = tk.Label(info_frame, text=ext, font=("Segoe UI", 8, "bold"),
-                            fg=Colors.PRIMARY, bg=Colors.BG_DARK, padx=5, pady=2)
-        ext_label.pack(side=tk.LEFT, padx=(0, 10))
+    def max_offset(self):
+        return max(0, self.content_height() - self.winfo_height())
         
-        # Filename
-        name_label = tk.Label(info_frame, text=filename[:40] + "..." if len(filename) > 40 else filename,
-                             font=("Segoe UI", 10), fg=Colors.TEXT_PRIMARY, bg=Colors.BG_INPUT)
-        name_label.pack(side=tk.LEFT)
+    def set_scroll_command(self, command):
+        self.scroll_command = command
         
-        # File size
-        try:
-            size = os.path.getsize(filepath)
-            size_str = self.format_size(size)
-            size_label = tk.Label(info_frame, text=size_str, font=("Segoe UI", 9),
-                                 fg=Colors.TEXT_MUTED, bg=Colors.BG_INPUT)
-            size_label.pack(side=tk.RIGHT, padx=(10, 0))
-        except:
-            pass
+    def yview(self, *args):
+        """Scrollbar protocol: moveto fraction / scroll n units|pages."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.offset = float(args[1]) * self.content_height()
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                self.offset += amount * max(self.pitch, self.winfo_height() - self.pitch)
+            else:
+                self.offset += amount * self.pitch
+        self.offset = int(min(max(self.offset, 0), self.max_offset()))
+        self.refresh()
+        
+    def on_mousewheel(self, event):
+        self.yview("scroll", -3 if event.delta > 0 else 3, "units")
+        
+    def row_at(self, x, y):
+        """Index of the row under (x, y) and whether it hit the remove button."""
+        row, within = divmod(self.offset + y, self.pitch)
+        if within >= self.ROW_HEIGHT or not 0 <= row < len(self.store):
+            return None, False
+        return int(row), x >= self.winfo_width() - 35
         
-        # Remove button
-        remove_btn = tk.Label(self, text="✕", font=("Segoe UI", 12),
-                             fg=Colors.TEXT_MUTED, bg=Colors.BG_INPUT, cursor="hand2")
-        remove_btn.pack(side=tk.RIGHT, padx=10)
-        remove_btn.bind("<Button-1>", lambda e: self.remove())
-        remove_btn.bind("<Enter>", lambda e: remove_btn.config(fg=Colors.ERROR))
-        remove_btn.bind("<Leave>", lambda e: remove_btn.config(fg=Colors.TEXT_MUTED))
-        
-    def format_size(self, size):
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024:
-                return f"{size:.1f} {unit}"
-            size /= 1024
-        return f"{size:.1f} TB"
-        
-    def remove(self):
-        if self.on_remove:
-            self.on_remove(self.filepath)
-        self.destroy()
+    def on_click(self, event):
+        index, on_remove = self.row_at(event.x, event.y)
+        if index is None:
+            return
+        if on_remove:
+            if self.on_remove:
+                self.hover_index = None
+                self.on_remove(index)
+        else:
+            self.selected = self.store[index]
+            self.refresh()
+            if self.on_select:
+                self.on_select(self.selected)
+            
+    def on_motion(self, event):
+        index, on_remove = self.row_at(event.x, event.y)
+        self.set_hover(index if on_remove else None)
+        
+    def set_hover(self, index):
+        if index != self.hover_index:
+            self.hover_index = index
+            self.config(cursor="hand2" if index is not None else "")
+            self.refresh()
+            
+    def refresh(self):
+        """Redraw the visible rows."""
+        self.delete("all")
+        width = self.winfo_width()
+        height = self.winfo_height()
+        total = len(self.store)
+        
+        if not total:
+            self.create_text(width // 2, 90, text=self.EMPTY_TEXT,
+                             font=("Segoe UI", 11), fill=Colors.TEXT_MUTED,
+                             justify="center")
+            if self.scroll_command:
+                self.scroll_command(0.0, 1.0)
+            self.set_visible([])
+            return
+            
+        first = self.offset // self.pitch
+        last = min(total, (self.offset + height) // self.pitch + 1)
+        
+        for index in range(first, last):
+            top = index * self.pitch - self.offset
+            bottom = top + self.ROW_HEIGHT
+            middle = top + self.ROW_HEIGHT // 2
+            path = self.store[index]
+            
+            selected = path == self.selected
+            self.create_rectangle(0, top, width - 1, bottom,
+                                  fill=Colors.BG_CARD_HOVER if selected else Colors.BG_INPUT,
+                                  outline=Colors.PRIMARY if selected else Colors.BORDER)
+            
+            # Thumbnail, once it has been generated
+            icon = self.icons.get(path)
+            if icon is not None:
+                self.create_image(4 + self.ICON_SIZE // 2, middle, image=icon)
+            
+            # Extension badge
+            badge = self.create_text(18 + self.ICON_SIZE, middle,
+                                     text=self.store.extension(index),
+                                     anchor="w", font=("Segoe UI", 8, "bold"),
+                                     fill=Colors.PRIMARY)
+            x1, y1, x2, y2 = self.bbox(badge)
+            self.tag_lower(self.create_rectangle(x1 - 5, y1 - 2, x2 + 5, y2 + 2,
+                                                 fill=Colors.BG_DARK, outline=""), badge)
+            
+            # Filename
+            filename = os.path.basename(path)
+            max_chars = max(10, min(40, (width - x2 - 110) // 8))
+            if len(filename) > max_chars:
+                filename = filename[:max_chars] + "..."
+            self.create_text(x2 + 15, middle, text=filename, anchor="w",
+                             font=("Segoe UI", 10), fill=Colors.TEXT_PRIMARY)
+            
+            # File size
+            size = self.store.size(index)
+            if size is not None:
+                self.create_text(width - 45, middle, text=format_size(size), anchor="e",
+                                 font=("Segoe UI", 9), fill=Colors.TEXT_MUTED)
+            
+            # Remove button
+            remove_color = Colors.ERROR if index == self.hover_index else Colors.TEXT_MUTED
+            self.create_text(width - 18, middle, text="✕", font=("Segoe UI", 12),
+                             fill=remove_color)
+            
+        if self.scroll_command:
+            content = self.content_height()
+            self.scroll_command(self.offset / content,
+                                min(1.0, (self.offset + height) / content))
+            
+        self.set_visible([self.store[index] for index in range(first, last)])
+        
+    def set_visible(self, paths):
+        """Tell the owner which rows are in view when that changes."""
+        if paths != self.visible:
+            self.visible = paths
+            if self.on_visible:
+                self.on_visible(paths)
 
 
 class ImageConverter:
     """Main application class."""
     
-    SUPPORTED_FORMATS = {
-        'PNG': '.png',
-        'JPEG': '.jpg',
-        'WebP': '.webp',
-        'BMP': '.bmp',
-        'TIFF': '.tiff',
-        'GIF': '.gif',
-        'ICO': '.ico'
-    }
+    SUPPORTED_FORMATS = SUPPORTED_FORMATS
     
-    INPUT_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tiff', '.tif', '.gif', '.ico')
+    INPUT_EXTENSIONS = INPUT_EXTENSIONS
     
     def __init__(self, root):
         self.root = root
@@ -199,16 +343,42 @@ class ImageConverter:
         self.root.geometry("1000x700")
         self.root.minsize(900, 600)
         self.root.configure(bg=Colors.BG_DARK)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Set window icon
         self.set_window_icon()
         
         # Variables
-        self.files = []
+        self.files = FileStore()
         self.output_format = tk.StringVar(value="PNG")
         self.quality = tk.IntVar(value=85)
+        self.workers = tk.IntVar(value=default_workers())
         self.output_folder = None
-        self.preserve_metadata = tk.BooleanVar(value=False)
+        self.jobs = JobQueue()
+        self.polling = False
+        self.progress_width = 0
+        self.report = None
+        # Headers probed before a run, reused while the files are unchanged
+        self.probes = ProbeCache()
+        self.history = RunHistory(default_history_path())
+        self.preserve_metadata = tk.BooleanVar(value=True)
+        self.incremental = tk.BooleanVar(value=False)
+        self.include_subfolders = tk.BooleanVar(value=True)
+        self.dedupe = tk.BooleanVar(value=False)
+        self.srgb = tk.BooleanVar(value=False)
+        self.collision = tk.StringVar(value="suffix")
+        self.max_width = tk.StringVar(value="")
+        self.max_height = tk.StringVar(value="")
+        self.max_kb = tk.StringVar(value="")
+        self.source_roots = []
+        self.scanners = []
+        
+        # Thumbnails are made off the Tk thread, only for rows in view
+        self.thumbnails = ThumbnailLoader(ThumbnailCache(default_thumbnail_dir()))
+        self.row_icons = {}
+        self.selected_file = None
+        self.preview_photo = None
+        self.compare = tk.BooleanVar(value=False)
         
         # Load logo
         self.load_logo()
@@ -216,6 +386,10 @@ class ImageConverter:
         # Build UI
         self.create_ui()
         
+        for var in (self.output_format, self.quality, self.compare):
+            var.trace_add("write", self.update_preview)
+        self._poll_thumbnails()
+        
     def resource_path(self, relative_path):
         """Get absolute path to resource."""
         try:
@@ -317,30 +491,47 @@ class ImageConverter:
         list_container = tk.Frame(files_card, bg=Colors.BG_CARD)
         list_container.pack(fill=tk.BOTH, expand=True)
         
-        # Canvas for scrolling
-        self.canvas = tk.Canvas(list_container, bg=Colors.BG_CARD, 
-                                highlightthickness=0, height=300)
+        # Preview of the selected file, next to the list
+        preview_size = self.thumbnails.cache.size
+        preview = tk.Frame(list_container, bg=Colors.BG_CARD, width=preview_size)
+        preview.pack(side=tk.RIGHT, fill=tk.Y, padx=(15, 0))
+        preview.pack_propagate(False)
+        
+        preview_box = tk.Frame(preview, bg=Colors.BG_INPUT, width=preview_size,
+                               height=preview_size)
+        preview_box.pack()
+        preview_box.pack_propagate(False)
+        
+        self.preview_label = tk.Label(preview_box, text="Select a file\nto preview it",
+                                      font=("Segoe UI", 9), fg=Colors.TEXT_MUTED,
+                                      bg=Colors.BG_INPUT)
+        self.preview_label.pack(fill=tk.BOTH, expand=True)
+        
+        self.preview_info = tk.Label(preview, text="", font=("Segoe UI", 9),
+                                     fg=Colors.TEXT_SECONDARY, bg=Colors.BG_CARD,
+                                     justify="left", wraplength=preview_size)
+        self.preview_info.pack(anchor=tk.W, pady=(8, 0))
+        
+        tk.Checkbutton(preview, text="Before / after",
+                      variable=self.compare, font=("Segoe UI", 9),
+                      fg=Colors.TEXT_PRIMARY, bg=Colors.BG_CARD,
+                      selectcolor=Colors.BG_INPUT,
+                      activebackground=Colors.BG_CARD,
+                      activeforeground=Colors.TEXT_PRIMARY).pack(anchor=tk.W, pady=(4, 0))
+        
+        # Virtualized list, only the visible rows are drawn
+        self.file_list = VirtualFileList(list_container, self.files,
+                                         on_remove=self.remove_file,
+                                         on_select=self.select_file,
+                                         on_visible=self.show_visible,
+                                         icons=self.row_icons, height=300)
         scrollbar = ttk.Scrollbar(list_container, orient="vertical", 
-                                  command=self.canvas.yview)
-        
-        self.files_frame = tk.Frame(self.canvas, bg=Colors.BG_CARD)
+                                  command=self.file_list.yview)
+        self.file_list.set_scroll_command(scrollbar.set)
         
-        self.canvas.create_window((0, 0), window=self.files_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.file_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        self.files_frame.bind("<Configure>", 
-                             lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        
-        # Empty state
-        self.empty_label = tk.Label(self.files_frame, 
-                                    text="No files added\n\nClick 'Add Files' or 'Add Folder' to start",
-                                    font=("Segoe UI", 11), fg=Colors.TEXT_MUTED,
-                                    bg=Colors.BG_CARD, justify="center")
-        self.empty_label.pack(pady=50)
-        
         # Buttons row
         btn_row = tk.Frame(files_card, bg=Colors.BG_CARD)
         btn_row.pack(fill=tk.X, pady=(15, 0))
@@ -392,9 +583,23 @@ class ImageConverter:
             rb.grid(row=i//4, column=i%4, sticky="w", padx=5, pady=2)
         
         # Quality slider (for lossy formats)
-        tk.Label(settings_card, text="Quality (JPEG/WebP)",
+        quality_header = tk.Frame(settings_card, bg=Colors.BG_CARD)
+        quality_header.pack(fill=tk.X, pady=(10, 0))
+        
+        tk.Label(quality_header, text="Quality (JPEG/WebP)",
                 font=("Segoe UI", 10), fg=Colors.TEXT_SECONDARY,
-                bg=Colors.BG_CARD).pack(anchor=tk.W, pady=(10, 0))
+                bg=Colors.BG_CARD).pack(side=tk.LEFT)
+        
+        # Optional per-image byte budget; quality becomes the ceiling
+        tk.Label(quality_header, text="KB", font=("Segoe UI", 9),
+                fg=Colors.TEXT_MUTED, bg=Colors.BG_CARD).pack(side=tk.RIGHT, padx=(4, 0))
+        tk.Entry(quality_header, textvariable=self.max_kb, width=6,
+                font=("Segoe UI", 10), bg=Colors.BG_INPUT, fg=Colors.TEXT_PRIMARY,
+                insertbackground=Colors.TEXT_PRIMARY, relief='flat',
+                highlightthickness=1,
+                highlightbackground=Colors.BORDER).pack(side=tk.RIGHT, ipady=2)
+        tk.Label(quality_header, text="max", font=("Segoe UI", 9),
+                fg=Colors.TEXT_MUTED, bg=Colors.BG_CARD).pack(side=tk.RIGHT, padx=(0, 4))
         
         quality_frame = tk.Frame(settings_card, bg=Colors.BG_CARD)
         quality_frame.pack(fill=tk.X, pady=(8, 15))
@@ -410,6 +615,24 @@ class ImageConverter:
         
         self.quality.trace_add("write", self.update_quality_label)
         
+        # Optional downscale
+        size_frame = tk.Frame(settings_card, bg=Colors.BG_CARD)
+        size_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        tk.Label(size_frame, text="Max Size (px)",
+                font=("Segoe UI", 10), fg=Colors.TEXT_SECONDARY,
+                bg=Colors.BG_CARD).pack(side=tk.LEFT)
+        
+        for i, var in enumerate((self.max_height, self.max_width)):
+            if i:
+                tk.Label(size_frame, text="×", font=("Segoe UI", 10),
+                        fg=Colors.TEXT_MUTED, bg=Colors.BG_CARD).pack(side=tk.RIGHT, padx=4)
+            tk.Entry(size_frame, textvariable=var, width=6,
+                    font=("Segoe UI", 10), bg=Colors.BG_INPUT, fg=Colors.TEXT_PRIMARY,
+                    insertbackground=Colors.TEXT_PRIMARY, relief='flat',
+                    highlightthickness=1,
+                    highlightbackground=Colors.BORDER).pack(side=tk.RIGHT, ipady=3)
+        
         # Output folder
         tk.Label(settings_card, text="Output Folder",
                 font=("Segoe UI", 10), fg=Colors.TEXT_SECONDARY,
@@ -432,6 +655,76 @@ class ImageConverter:
         browse_btn.pack(side=tk.RIGHT)
         browse_btn.bind("<Button-1>", lambda e: self.select_output_folder())
         
+        # Worker processes
+        workers_frame = tk.Frame(settings_card, bg=Colors.BG_CARD)
+        workers_frame.pack(fill=tk.X, pady=(15, 0))
+        
+        tk.Label(workers_frame, text="Worker Processes",
+                font=("Segoe UI", 10), fg=Colors.TEXT_SECONDARY,
+                bg=Colors.BG_CARD).pack(side=tk.LEFT)
+        
+        workers_spin = tk.Spinbox(workers_frame, from_=1, to=max(64, default_workers()),
+                                  textvariable=self.workers, width=4,
+                                  font=("Segoe UI", 10), bg=Colors.BG_INPUT,
+                                  fg=Colors.TEXT_PRIMARY, buttonbackground=Colors.BG_INPUT,
+                                  insertbackground=Colors.TEXT_PRIMARY,
+                                  relief='flat', highlightthickness=1,
+                                  highlightbackground=Colors.BORDER)
+        workers_spin.pack(side=tk.RIGHT)
+        
+        # Outputs that would land on an existing source or on each other
+        collision_frame = tk.Frame(settings_card, bg=Colors.BG_CARD)
+        collision_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        tk.Label(collision_frame, text="If Names Clash",
+                font=("Segoe UI", 10), fg=Colors.TEXT_SECONDARY,
+                bg=Colors.BG_CARD).pack(side=tk.LEFT)
+        
+        collision_menu = tk.OptionMenu(collision_frame, self.collision, *COLLISION_POLICIES)
+        collision_menu.config(font=("Segoe UI", 10), fg=Colors.TEXT_PRIMARY,
+                              bg=Colors.BG_INPUT, activebackground=Colors.BG_CARD_HOVER,
+                              activeforeground=Colors.TEXT_PRIMARY, relief='flat',
+                              highlightthickness=0, width=9)
+        collision_menu["menu"].config(font=("Segoe UI", 10), fg=Colors.TEXT_PRIMARY,
+                                      bg=Colors.BG_INPUT)
+        collision_menu.pack(side=tk.RIGHT)
+        
+        # Incremental mode
+        tk.Checkbutton(settings_card, text="Skip unchanged files",
+                      variable=self.incremental, font=("Segoe UI", 10),
+                      fg=Colors.TEXT_PRIMARY, bg=Colors.BG_CARD,
+                      selectcolor=Colors.BG_INPUT,
+                      activebackground=Colors.BG_CARD,
+                      activeforeground=Colors.TEXT_PRIMARY).pack(anchor=tk.W, pady=(10, 0))
+        
+        tk.Checkbutton(settings_card, text="Include subfolders",
+                      variable=self.include_subfolders, font=("Segoe UI", 10),
+                      fg=Colors.TEXT_PRIMARY, bg=Colors.BG_CARD,
+                      selectcolor=Colors.BG_INPUT,
+                      activebackground=Colors.BG_CARD,
+                      activeforeground=Colors.TEXT_PRIMARY).pack(anchor=tk.W)
+        
+        tk.Checkbutton(settings_card, text="Convert duplicate images once",
+                      variable=self.dedupe, font=("Segoe UI", 10),
+                      fg=Colors.TEXT_PRIMARY, bg=Colors.BG_CARD,
+                      selectcolor=Colors.BG_INPUT,
+                      activebackground=Colors.BG_CARD,
+                      activeforeground=Colors.TEXT_PRIMARY).pack(anchor=tk.W)
+        
+        tk.Checkbutton(settings_card, text="Convert colours to sRGB",
+                      variable=self.srgb, font=("Segoe UI", 10),
+                      fg=Colors.TEXT_PRIMARY, bg=Colors.BG_CARD,
+                      selectcolor=Colors.BG_INPUT,
+                      activebackground=Colors.BG_CARD,
+                      activeforeground=Colors.TEXT_PRIMARY).pack(anchor=tk.W)
+        
+        tk.Checkbutton(settings_card, text="Keep metadata (EXIF, XMP)",
+                      variable=self.preserve_metadata, font=("Segoe UI", 10),
+                      fg=Colors.TEXT_PRIMARY, bg=Colors.BG_CARD,
+                      selectcolor=Colors.BG_INPUT,
+                      activebackground=Colors.BG_CARD,
+                      activeforeground=Colors.TEXT_PRIMARY).pack(anchor=tk.W)
+        
         # Convert button
         self.convert_btn = PremiumButton(right, text="🚀 Convert All",
                                          command=self.convert_all,
@@ -451,16 +744,47 @@ class ImageConverter:
                                      bg=Colors.BG_DARK)
         self.status_label.pack(pady=(8, 0))
         
+        # Job controls
+        controls = tk.Frame(progress_frame, bg=Colors.BG_DARK)
+        controls.pack(pady=(4, 0))
+        
+        self.pause_btn = tk.Label(controls, text="Pause", cursor="hand2",
+                                  font=("Segoe UI", 9), fg=Colors.TEXT_MUTED,
+                                  bg=Colors.BG_DARK)
+        self.pause_btn.pack(side=tk.LEFT, padx=8)
+        self.pause_btn.bind("<Button-1>", lambda e: self.toggle_pause())
+        
+        cancel_btn = tk.Label(controls, text="Cancel", cursor="hand2",
+                             font=("Segoe UI", 9), fg=Colors.TEXT_MUTED,
+                             bg=Colors.BG_DARK)
+        cancel_btn.pack(side=tk.LEFT, padx=8)
+        cancel_btn.bind("<Button-1>", lambda e: self.cancel_job())
+        
+        for btn in (self.pause_btn, cancel_btn):
+            btn.bind("<Enter>", lambda e: e.widget.config(fg=Colors.PRIMARY))
+            btn.bind("<Leave>", lambda e: e.widget.config(fg=Colors.TEXT_MUTED))
+        
         # Stats Card
         stats_card = PremiumCard(right, padx=20, pady=15)
         stats_card.pack(fill=tk.X, pady=(15, 0))
         
-        tk.Label(stats_card, text="📊 Statistics",
+        stats_header = tk.Frame(stats_card, bg=Colors.BG_CARD)
+        stats_header.pack(fill=tk.X, pady=(0, 10))
+        
+        tk.Label(stats_header, text="📊 Statistics",
                 font=("Segoe UI Semibold", 11), fg=Colors.TEXT_PRIMARY,
-                bg=Colors.BG_CARD).pack(anchor=tk.W, pady=(0, 10))
+                bg=Colors.BG_CARD).pack(side=tk.LEFT)
+        
+        export_btn = tk.Label(stats_header, text="Export report", cursor="hand2",
+                             font=("Segoe UI", 9), fg=Colors.TEXT_MUTED,
+                             bg=Colors.BG_CARD)
+        export_btn.pack(side=tk.RIGHT)
+        export_btn.bind("<Button-1>", lambda e: self.export_report())
+        export_btn.bind("<Enter>", lambda e: export_btn.config(fg=Colors.PRIMARY))
+        export_btn.bind("<Leave>", lambda e: export_btn.config(fg=Colors.TEXT_MUTED))
         
         self.stats_label = tk.Label(stats_card, 
-                                    text="Converted: 0\nFailed: 0\nSaved: 0 MB",
+                                    text="Converted: 0\nSkipped: 0\nFailed: 0\nSaved: 0 MB",
                                     font=("Segoe UI", 10), fg=Colors.TEXT_SECONDARY,
                                     bg=Colors.BG_CARD, justify="left")
         self.stats_label.pack(anchor=tk.W)
@@ -480,62 +804,161 @@ class ImageConverter:
             filetypes=filetypes
         )
         
-        for path in paths:
-            if path not in self.files:
-                self.files.append(path)
-                self.add_file_item(path)
-                
-        self.update_file_count()
+        self.files.extend(paths)
+        self.files_changed()
         
     def add_folder(self):
-        """Add all images from a folder."""
+        """Add all images from a folder, scanning it in the background."""
         folder = filedialog.askdirectory(title="Select Folder")
-        
-        if folder:
-            for file in os.listdir(folder):
-                if file.lower().endswith(self.INPUT_EXTENSIONS):
-                    path = os.path.join(folder, file)
-                    if path not in self.files:
-                        self.files.append(path)
-                        self.add_file_item(path)
-                        
-        self.update_file_count()
-        
-    def add_file_item(self, filepath):
-        """Add a file item to the list."""
-        if self.empty_label.winfo_exists():
-            self.empty_label.destroy()
+        if not folder:
+            return
+            
+        self.source_roots.append(folder)
+        max_depth = None if self.include_subfolders.get() else 0
+        scanner = FolderScanner([folder], max_depth=max_depth,
+                                extensions=self.INPUT_EXTENSIONS)
+        self.scanners.append(scanner)
+        scanner.start()
+        self._poll_scan(scanner)
+        
+    def _poll_scan(self, scanner):
+        """Move scanned batches into the file list."""
+        if scanner not in self.scanners:
+            # Cancelled by Clear All
+            return
             
-        item = FileListItem(self.files_frame, filepath, 
-                           on_remove=self.remove_file)
-        item.pack(fill=tk.X, pady=2)
+        finished = False
+        try:
+            while True:
+                batch = scanner.batches.get_nowait()
+                if batch is None:
+                    finished = True
+                    break
+                paths, sizes = batch
+                self.files.extend(paths, sizes)
+        except queue.Empty:
+            pass
+            
+        self.files_changed()
         
-    def remove_file(self, filepath):
-        """Remove a file from the list."""
-        if filepath in self.files:
-            self.files.remove(filepath)
-        self.update_file_count()
+        if finished:
+            self.scanners.remove(scanner)
+            if not self.scanners:
+                self.status_label.config(text="Ready")
+        else:
+            found = sum(s.found for s in self.scanners)
+            self.status_label.config(text=f"Scanning... {found} images found")
+            self.root.after(100, self._poll_scan, scanner)
         
-        if not self.files:
-            self.empty_label = tk.Label(self.files_frame,
-                                        text="No files added\n\nClick 'Add Files' or 'Add Folder' to start",
-                                        font=("Segoe UI", 11), fg=Colors.TEXT_MUTED,
-                                        bg=Colors.BG_CARD, justify="center")
-            self.empty_label.pack(pady=50)
+    def remove_file(self, index):
+        """Remove a file from the list."""
+        self.files.remove_at(index)
+        self.files_changed()
         
     def clear_files(self):
         """Clear all files."""
-        self.files = []
-        for widget in self.files_frame.winfo_children():
-            widget.destroy()
-            
-        self.empty_label = tk.Label(self.files_frame,
-                                    text="No files added\n\nClick 'Add Files' or 'Add Folder' to start",
-                                    font=("Segoe UI", 11), fg=Colors.TEXT_MUTED,
-                                    bg=Colors.BG_CARD, justify="center")
-        self.empty_label.pack(pady=50)
+        for scanner in self.scanners:
+            scanner.cancel()
+        self.scanners = []
+        self.files.clear()
+        self.source_roots = []
+        self.files_changed()
+        
+    def files_changed(self):
+        """Refresh the list and the count after the queue changed."""
+        if self.selected_file is not None and self.selected_file not in self.files:
+            self.select_file(None)
+        self.file_list.yview("scroll", 0, "units")
         self.update_file_count()
         
+    def show_visible(self, paths):
+        """Keep icons for the rows in view only and ask for the missing ones."""
+        visible = set(paths)
+        for path in [path for path in self.row_icons if path not in visible]:
+            del self.row_icons[path]
+        self.thumbnails.request([path for path in paths if path not in self.row_icons])
+        
+    def select_file(self, path):
+        """Show path (or nothing) in the preview pane."""
+        self.selected_file = self.file_list.selected = path
+        self.preview_photo = None
+        self.preview_label.config(image="", text="Loading..." if path else
+                                  "Select a file\nto preview it")
+        self.preview_info.config(text=os.path.basename(path) if path else "")
+        self.update_preview()
+        
+    def preview_profile(self):
+        """Settings the before/after preview encodes with, or None when it's off."""
+        if not self.compare.get():
+            return None
+        return OutputProfile(self.output_format.get(), self.quality.get())
+        
+    def update_preview(self, *args):
+        """Ask for a new preview of the selected file."""
+        if self.selected_file is not None:
+            self.thumbnails.request_preview(self.selected_file, self.preview_profile())
+            
+    def _poll_thumbnails(self):
+        """Turn finished thumbnails into row icons and show the latest preview."""
+        changed = False
+        try:
+            while True:
+                path, img = self.thumbnails.thumbnails.get_nowait()
+                if path not in self.file_list.visible:
+                    continue
+                icon = None
+                if img is not None:
+                    icon = img.copy()
+                    icon.thumbnail((VirtualFileList.ICON_SIZE, VirtualFileList.ICON_SIZE))
+                    icon = ImageTk.PhotoImage(icon)
+                # None marks a file that can't be read, so it isn't asked for again
+                self.row_icons[path] = icon
+                changed = True
+        except queue.Empty:
+            pass
+            
+        preview = None
+        try:
+            while True:
+                preview = self.thumbnails.previews.get_nowait()
+        except queue.Empty:
+            pass
+        if preview is not None:
+            self.show_preview(*preview)
+            
+        if changed:
+            self.file_list.refresh()
+        # Cheap when idle: it only looks at two queues
+        self.root.after(1000 // UI_FPS, self._poll_thumbnails)
+        
+    def show_preview(self, path, profile, before, after, size):
+        """Display a finished preview if it still matches the selection and settings."""
+        current = self.preview_profile()
+        if path != self.selected_file or (
+                vars(profile) if profile else None) != (vars(current) if current else None):
+            return
+            
+        name = os.path.basename(path)
+        if before is None:
+            self.preview_photo = None
+            self.preview_label.config(image="", text="Can't preview\nthis file")
+            self.preview_info.config(text=name)
+            return
+            
+        if after is not None:
+            image = split_view(before, after)
+            setting = profile.output_format
+            if profile.output_format in ('JPEG', 'WebP'):
+                setting += f" {profile.quality}%"
+            info = (f"{name}\nBefore | After ({setting})\n"
+                    f"{format_size(size)} at preview size")
+        else:
+            image = before
+            info = name
+        self.preview_photo = ImageTk.PhotoImage(image)
+        self.preview_label.config(image=self.preview_photo, text="")
+        self.preview_info.config(text=info)
+        
     def update_file_count(self):
         """Update the file count label."""
         count = len(self.files)
@@ -550,16 +973,33 @@ class ImageConverter:
             self.folder_entry.insert(0, folder)
             
     def update_progress(self, value):
-        """Update progress bar."""
-        self.progress_canvas.delete("progress")
+        """Update progress bar, moving the existing bar rather than redrawing it."""
         width = self.progress_canvas.winfo_width()
-        fill_width = width * (value / 100)
+        fill_width = int(width * (value / 100))
+        if fill_width == self.progress_width:
+            return
+        self.progress_width = fill_width
         
-        if fill_width > 0:
+        if not self.progress_canvas.find_withtag("progress"):
             self.progress_canvas.create_rectangle(
-                0, 0, fill_width, 6,
+                0, 0, 0, 6,
                 fill=Colors.PRIMARY, outline="", tags="progress"
             )
+        self.progress_canvas.coords("progress", 0, 0, fill_width, 6)
+            
+    def export_report(self):
+        """Save the last run's per-file timings as JSON or CSV."""
+        if self.report is None:
+            messagebox.showinfo("No Report", "Run a conversion first.")
+            return
+            
+        path = filedialog.asksaveasfilename(
+            title="Export Run Report",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("CSV", "*.csv")]
+        )
+        if path:
+            self.report.write(path)
             
     def convert_all(self):
         """Convert all files."""
@@ -567,92 +1007,198 @@ class ImageConverter:
             messagebox.showwarning("No Files", "Please add some images first.")
             return
             
-        thread = threading.Thread(target=self._convert_thread)
-        thread.start()
-        
-    def _convert_thread(self):
-        """Thread for converting files."""
-        total = len(self.files)
-        converted = 0
-        failed = 0
-        saved_bytes = 0
-        
-        output_format = self.output_format.get()
-        ext = self.SUPPORTED_FORMATS[output_format]
-        quality = self.quality.get()
+        try:
+            workers = self.workers.get()
+        except tk.TclError:
+            workers = default_workers()
+            
+        try:
+            max_kb = float(self.max_kb.get()) if self.max_kb.get().strip() else None
+        except ValueError:
+            max_kb = -1
+        if max_kb is not None and max_kb <= 0:
+            messagebox.showwarning("Invalid Size", "Max file size must be a positive number of KB.")
+            return
+            
+        try:
+            max_width = int(self.max_width.get()) if self.max_width.get().strip() else None
+            max_height = int(self.max_height.get()) if self.max_height.get().strip() else None
+            settings = ConversionSettings(self.output_format.get(), self.quality.get(),
+                                          output_folder=self.output_folder,
+                                          source_roots=self.source_roots,
+                                          max_width=max_width, max_height=max_height,
+                                          max_bytes=int(max_kb * 1024) if max_kb else None,
+                                          collision=self.collision.get(),
+                                          srgb=self.srgb.get(),
+                                          strip_metadata=not self.preserve_metadata.get(),
+                                          encoder_cache=default_encoder_cache_path())
+        except ValueError:
+            messagebox.showwarning("Invalid Size", "Max size must be a positive whole number of pixels.")
+            return
+            
+        if self.jobs.current is not None or self.jobs.pending():
+            # Queue behind the running conversion instead of racing it
+            choice = messagebox.askyesnocancel(
+                "Conversion Running",
+                "A conversion is already running.\n\n"
+                "Yes: run this one next\n"
+                "No: add it to the end of the queue\n"
+                "Cancel: don't start it"
+            )
+            if choice is None:
+                return
+            priority = 1 if choice else 0
+        else:
+            priority = 0
+            
+        manifest = Manifest(default_manifest_path()) if self.incremental.get() else None
+        engine = ConversionEngine(settings, workers=workers, manifest=manifest,
+                                  dedupe=self.dedupe.get(), probes=self.probes,
+                                  history=self.history)
+        # Snapshot the list; later edits don't change a queued job
+        self.jobs.submit(engine, list(self.files), priority=priority, report=RunReport())
+        
+        if not self.polling:
+            self.polling = True
+            self._poll_results()
+        
+    def toggle_pause(self):
+        """Pause or resume the running conversion."""
+        job = self.jobs.current
+        if job is None:
+            return
+        if job.state == job.PAUSED:
+            self.jobs.resume()
+            self.pause_btn.config(text="Pause")
+        else:
+            self.jobs.pause()
+            self.pause_btn.config(text="Resume")
+        self._show_progress()
+        
+    def cancel_job(self):
+        """Cancel the running conversion; queued ones still run."""
+        job = self.jobs.current
+        if job is None:
+            return
+        if job.done < job.total / 2 or messagebox.askyesno(
+                "Cancel Conversion", f"Stop converting? {job.done}/{job.total} are done."):
+            self.jobs.cancel(job)
+            self.status_label.config(text="Cancelling...")
+            
+    def _show_progress(self):
+        """Show the running job's progress, throughput and ETA."""
+        job = self.jobs.current
+        if job is None:
+            return
+        snap = job.snapshot()
+        queued = len(self.jobs.pending())
         
-        # Get output folder
-        output_folder = self.output_folder
+        if snap['checking']:
+            text = f"Checking {len(job.files)} files..."
+        elif snap['state'] == job.PAUSED:
+            text = f"Paused at {snap['done']}/{snap['total']}"
+        else:
+            text = f"Converting {snap['done']}/{snap['total']}..."
+        if snap['rejected']:
+            text += f" ({snap['rejected']} unreadable)"
+        if queued:
+            text += f" ({queued} queued)"
+        if snap['per_second'] > 0:
+            text += (f"\n{snap['per_second']:.1f} img/s · "
+                     f"{snap['megapixels_per_second']:.1f} MP/s · "
+                     f"ETA {format_duration(snap['eta_seconds'])}")
+        elif snap['eta_seconds'] is not None:
+            text += f"\n{job.plan.summary_text()}"
+        self.status_label.config(text=text)
+        self.update_progress((snap['done'] / snap['total']) * 100 if snap['total'] else 0)
+        
+    def _poll_results(self):
+        """Refresh the progress display at UI_FPS until the job queue is idle.
+
+        Results never pass through Tk: the job queue's thread tallies them
+        and this only reads a snapshot once per frame.
+        """
+        try:
+            while True:
+                self._finish_run(self.jobs.completed.get_nowait())
+        except queue.Empty:
+            pass
+            
+        self._show_progress()
         
-        for i, filepath in enumerate(self.files):
+        if self.jobs.current is None and not self.jobs.pending() and self.jobs.completed.empty():
+            self.polling = False
+            self.pause_btn.config(text="Pause")
+        else:
+            self.root.after(1000 // UI_FPS, self._poll_results)
+            
+    def _finish_run(self, job):
+        """Show the final stats once a job has finished or been cancelled."""
+        converted = job.converted
+        skipped = job.skipped
+        failed = job.failed
+        if job.engine.manifest is not None:
+            job.engine.manifest.close()
+        job.report.finish()
+        self.report = job.report
+        if job.state != job.CANCELLED:
+            self.history.add_report(job.report)
             try:
-                self.root.after(0, lambda s=f"Converting {i+1}/{total}...": 
-                               self.status_label.config(text=s))
-                self.root.after(0, lambda p=((i+1)/total)*100: self.update_progress(p))
-                
-                # Open image
-                img = Image.open(filepath)
-                
-                # Determine output path
-                if output_folder:
-                    out_dir = output_folder
-                else:
-                    out_dir = os.path.dirname(filepath)
-                    
-                filename = os.path.splitext(os.path.basename(filepath))[0]
-                output_path = os.path.join(out_dir, f"{filename}{ext}")
-                
-                # Handle format-specific conversions
-                if output_format in ('JPEG', 'BMP'):
-                    # These formats don't support transparency
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        if img.mode == 'P':
-                            img = img.convert('RGBA')
-                        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                        img = background
-                    elif img.mode != 'RGB':
-                        img = img.convert('RGB')
-                
-                # Save with appropriate settings
-                save_kwargs = {}
-                
-                if output_format == 'JPEG':
-                    save_kwargs['quality'] = quality
-                    save_kwargs['optimize'] = True
-                elif output_format == 'WebP':
-                    save_kwargs['quality'] = quality
-                elif output_format == 'PNG':
-                    save_kwargs['optimize'] = True
-                    
-                original_size = os.path.getsize(filepath)
-                img.save(output_path, **save_kwargs)
-                new_size = os.path.getsize(output_path)
-                
-                saved_bytes += original_size - new_size
-                converted += 1
-                
-            except Exception as e:
-                print(f"Error converting {filepath}: {e}")
-                failed += 1
-                
-        # Update stats
-        saved_mb = saved_bytes / (1024 * 1024)
-        self.root.after(0, lambda: self.stats_label.config(
-            text=f"Converted: {converted}\nFailed: {failed}\nSaved: {saved_mb:.2f} MB"
-        ))
+                self.history.save()
+            except OSError:
+                pass
         
-        self.root.after(0, lambda: self.update_progress(100))
-        self.root.after(0, lambda: self.status_label.config(text="✓ Done!"))
-        
-        if failed == 0:
-            self.root.after(0, lambda: messagebox.showinfo(
+        # Update stats
+        saved_mb = job.saved_bytes / (1024 * 1024)
+        stats = f"Converted: {converted}\nSkipped: {skipped}\nFailed: {failed}\nSaved: {saved_mb:.2f} MB"
+        if job.plan is not None and job.plan.rejected:
+            stats += f"\nUnreadable (not started): {len(job.plan.rejected)}"
+        if job.engine.dedupe:
+            dedup = job.engine.dedup_stats
+            stats += (f"\nDuplicates: {dedup['duplicates']} "
+                      f"({dedup['bytes_avoided'] / (1024 * 1024):.1f} MB, "
+                      f"{dedup['seconds_avoided']:.1f} s avoided)")
+        if converted:
+            stats += "\n" + job.report.summary_text()
+        self.stats_label.config(text=stats)
+        
+        if job.state == job.CANCELLED:
+            self.status_label.config(text=f"Cancelled after {job.done}/{job.total}")
+            return
+            
+        self.update_progress(100)
+        self.status_label.config(text="✓ Done!")
+        if self.jobs.pending():
+            # The next job starts right away; don't block it with a dialog
+            return
+            
+        if job.error:
+            messagebox.showerror("Conversion Failed", job.error)
+        elif failed == 0 and skipped:
+            messagebox.showinfo(
+                "Success", f"All {converted + skipped} images are up to date "
+                           f"({converted} converted, {skipped} unchanged)."
+            )
+        elif failed == 0:
+            messagebox.showinfo(
                 "Success", f"All {converted} images converted successfully!"
-            ))
+            )
         else:
-            self.root.after(0, lambda: messagebox.showwarning(
-                "Completed", f"Converted: {converted}\nFailed: {failed}"
-            ))
+            # Every failure is in the run report; show the first few here
+            failures = [f"{os.path.basename(record['source'])}: {record['error']}"
+                        for record in job.report.records if record['status'] == 'failed']
+            details = "\n".join(failures[:5])
+            if len(failures) > 5:
+                details += f"\n... and {len(failures) - 5} more (Export report for all)"
+            messagebox.showwarning(
+                "Completed", f"Converted: {converted}\nFailed: {failed}\n\n{details}"
+            )
+            
+    def on_close(self):
+        """Cancel running and queued jobs so worker processes exit promptly."""
+        self.jobs.close()
+        self.thumbnails.close()
+        self.root.destroy()
 
 
 def main():
@@ -662,4 +1208,5 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+
+from PIL import Image
+
+from converter.dedup import find_duplicates
+from converter.engine import ConversionEngine, ConversionSettings
+from converter.profiles import OutputProfile
+
+
+def make_sources(folder):
+    """c.jpg and d.jpg with the same bytes, and e.jpg a hard link to d.jpg."""
+    paths = [os.path.join(folder, name) for name in ('c.jpg', 'd.jpg', 'e.jpg')]
+    Image.new('RGB', (32, 24), (200, 30, 30)).save(paths[0])
+    with open(paths[0], 'rb') as src, open(paths[1], 'wb') as dst:
+        dst.write(src.read())
+    os.link(paths[1], paths[2])
+    return paths
+
+
+def test_aliases_follow_their_representative(tmp_path):
+    c, d, e = make_sources(tmp_path)
+    unique, duplicates = find_duplicates([c, d, e])
+    assert unique == [c]
+    assert duplicates == {c: [d, e]}
+
+
+def test_every_input_gets_a_result(tmp_path):
+    paths = make_sources(tmp_path)
+    engine = ConversionEngine(ConversionSettings('PNG'), workers=1, dedupe=True)
+    results = list(engine.iter_results(paths))
+    assert sorted(result.source for result in results) == sorted(paths)
+    assert all(result.ok for result in results)
+    for result in results:
+        assert os.path.exists(result.output)
+
+
+def suffixed_settings():
+    """Two WebP outputs, photo.webp and photo-x.webp, skipping taken names."""
+    profiles = [OutputProfile('WebP'), OutputProfile('WebP', suffix='-x')]
+    return ConversionSettings(profiles=profiles, collision='skip')
+
+
+def convert_all(paths, settings):
+    engine = ConversionEngine(settings, workers=1, dedupe=True)
+    results = list(engine.iter_results(paths))
+    assert len(results) == len(paths) * engine.outputs_per_file
+    return {(os.path.basename(result.source), result.profile): result for result in results}
+
+
+def test_collision_skips_are_reported_with_outputs_left(tmp_path):
+    a, ax = tmp_path / 'a.png', tmp_path / 'a-x.png'
+    Image.new('RGB', (8, 8), 'red').save(a)
+    Image.new('RGB', (8, 8), 'blue').save(ax)
+    results = convert_all([str(a), str(ax)], suffixed_settings())
+    assert results['a-x.png', 0].skipped and not results['a-x.png', 0].ok
+    assert results['a-x.png', 1].ok and not results['a-x.png', 1].skipped
+
+
+def test_duplicates_get_their_collision_skips(tmp_path):
+    a, ax = tmp_path / 'a.png', tmp_path / 'a-x.png'
+    Image.new('RGB', (8, 8), 'red').save(a)
+    shutil.copyfile(a, ax)
+    results = convert_all([str(a), str(ax)], suffixed_settings())
+    assert results['a-x.png', 0].skipped
+    assert results['a-x.png', 1].duplicate_of == str(a)
+    assert os.path.exists(results['a-x.png', 1].output)
+
+
+def test_duplicates_convert_outputs_their_original_skips(tmp_path):
+    a, b, taken = tmp_path / 'a.png', tmp_path / 'b.png', tmp_path / 'a-x.webp'
+    Image.new('RGB', (8, 8), 'red').save(a)
+    shutil.copyfile(a, b)
+    Image.new('RGB', (8, 8), 'blue').save(taken)
+    results = convert_all([str(a), str(b), str(taken)], suffixed_settings())
+    assert results['a.png', 1].skipped
+    assert results['b.png', 0].duplicate_of == str(a)
+    assert results['b.png', 1].ok and not results['b.png', 1].skipped
+    assert os.path.exists(tmp_path / 'b-x.webp')
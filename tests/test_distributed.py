@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+
+from PIL import Image
+
+from converter import distributed
+from converter.distributed import Coordinator, Worker
+from converter.engine import ConversionEngine, ConversionSettings
+
+
+def test_outputs_are_planned_as_absolute_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Image.new('RGB', (8, 8)).save('a.png')
+    settings = ConversionSettings('WebP', output_folder='out')
+    coordinator = Coordinator(settings, ['a.png'], address=('127.0.0.1', 0), chunk_files=1)
+    try:
+        list(coordinator._plan_chunks())
+        [chunk] = coordinator._chunks.values()
+        [(filepath, outputs)] = chunk.tasks
+    finally:
+        coordinator.close()
+    assert outputs == {0: str(tmp_path / 'out' / 'a.webp')}
+    assert os.path.isabs(filepath)
+    # The caller's settings are left as they were
+    assert settings.output_folder == 'out'
+
+
+def test_a_lost_chunk_is_abandoned_and_converted_again(tmp_path, monkeypatch):
+    files = []
+    for name in ('a.png', 'b.png'):
+        Image.new('RGB', (8, 8)).save(tmp_path / name)
+        files.append(str(tmp_path / name))
+    engines = []
+
+    class SlowEngine(ConversionEngine):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            engines.append(self)
+
+        def iter_results(self, files, planned=None):
+            for result in super().iter_results(files, planned):
+                # Long enough for the lease to be renewed in between
+                time.sleep(0.25)
+                yield result
+
+    monkeypatch.setattr(distributed, 'ConversionEngine', SlowEngine)
+    coordinator = Coordinator(ConversionSettings('WebP'), files, address=('127.0.0.1', 0),
+                              chunk_files=2, lease_seconds=0.3)
+    renew = coordinator._renew
+
+    def renew_after_losing_once(owner, number):
+        if len(engines) == 2:
+            # As if the lease had run out and the chunk was taken back
+            with coordinator._lock:
+                coordinator._requeue(coordinator._chunks[number])
+        return renew(owner, number)
+
+    coordinator._renew = renew_after_losing_once
+    worker = Worker(coordinator.address, coordinator.token, workers=1)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    results = list(coordinator.iter_results())
+    thread.join(5)
+
+    # engines[0] is the coordinator's own; the worker's first chunk was lost
+    assert len(engines) == 3
+    assert engines[1].cancelled and not engines[2].cancelled
+    assert sorted(result.source for result in results) == files
+    # Counted by the coordinator: it may close before the worker hears back
+    assert coordinator.workers == {worker.name: 1}
@@ -0,0 +1,88 @@
+import os
+import time
+
+from PIL import Image
+
+from converter import engine as engine_module
+from converter.engine import ConversionEngine, ConversionSettings
+from converter.manifest import Manifest
+from converter.prefetch import read_source
+from converter.probe import ProbeCache
+
+
+def make_sources(folder, count):
+    paths = [os.path.join(folder, f"{n}.jpg") for n in range(count)]
+    for path in paths:
+        Image.new('RGB', (16, 16), (20, 120, 220)).save(path)
+    return paths
+
+
+def test_probe_stops_once_cancelled(tmp_path):
+    paths = make_sources(tmp_path, 40)
+    for workers in (1, 4):
+        probes = ProbeCache()
+        probed = []
+        get = probes.get
+
+        def slow_get(path):
+            time.sleep(0.005)
+            probed.append(path)
+            return get(path)
+
+        probes.get = slow_get
+        infos = probes.probe(paths, workers, cancelled=lambda: len(probed) >= 3)
+        assert len(infos) <= len(probed) < len(paths)
+
+
+def test_preflight_of_a_cancelled_run_probes_nothing(tmp_path):
+    paths = make_sources(tmp_path, 5)
+    engine = ConversionEngine(ConversionSettings('PNG'), workers=1)
+    engine.cancel()
+    assert engine.preflight(paths).sources == []
+
+
+def test_manifest_is_asked_once_per_output(tmp_path):
+    paths = make_sources(tmp_path, 3)
+    manifest = Manifest(str(tmp_path / 'manifest.db'))
+    list(ConversionEngine(ConversionSettings('PNG'), workers=1,
+                          manifest=manifest).iter_results(paths))
+
+    asked = []
+    is_current = manifest.is_current
+    manifest.is_current = lambda *args: asked.append(args) or is_current(*args)
+    engine = ConversionEngine(ConversionSettings('PNG'), workers=1, manifest=manifest)
+    results = list(engine.iter_results(paths))
+    assert all(result.skipped and result.ok for result in results)
+    assert len(asked) == len(paths)
+
+
+def test_prefetch_stays_within_the_memory_budget(tmp_path, monkeypatch):
+    paths = []
+    for n in range(16):
+        path = str(tmp_path / f"{n}.png")
+        Image.frombytes('RGB', (256, 256), os.urandom(256 * 256 * 3)).save(path)
+        paths.append(path)
+    file_size = os.path.getsize(paths[0])
+    budget = 5 * file_size
+    engine = ConversionEngine(ConversionSettings('PNG', output_folder=str(tmp_path / 'out')),
+                              workers=1, memory_budget=budget, prefetch=12)
+
+    read, admitted, held = [], [], []
+
+    def counting_read(path, *args):
+        read.append(path)
+        # Bytes read ahead that no worker has taken yet, and the engine's own count
+        held.append((file_size * (len(read) - len(admitted)), engine.memory_in_use))
+        return read_source(path, *args)
+
+    task_args = engine._task_args
+
+    def counting_task_args(filepath, outputs, source=None):
+        admitted.append(filepath)
+        return task_args(filepath, outputs, source)
+
+    monkeypatch.setattr(engine_module, 'read_source', counting_read)
+    monkeypatch.setattr(engine, '_task_args', counting_task_args)
+    results = list(engine.iter_results(paths))
+    assert len(results) == len(paths) and all(result.ok for result in results)
+    assert max(max(pair) for pair in held) <= budget
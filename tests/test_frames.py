@@ -0,0 +1,20 @@
+from PIL import Image
+
+from converter.engine import ConversionSettings, convert_file
+from converter.frames import ICO_SIZES
+
+
+def test_ico_has_every_size_once(tmp_path):
+    source = tmp_path / 'app.ico'
+    big = Image.radial_gradient('L').convert('RGBA').resize((256, 256))
+    big.save(source, sizes=[(16, 16), (32, 32), (256, 256)])
+
+    settings = ConversionSettings('ICO', output_folder=str(tmp_path / 'out'))
+    [result] = convert_file(str(source), settings)
+    assert result.ok, result.error
+
+    with Image.open(result.output) as icon:
+        assert len(icon.ico.entry) == len(ICO_SIZES)
+        assert icon.ico.sizes() == set(ICO_SIZES)
+        for size in ICO_SIZES:
+            assert icon.ico.getimage(size).size == size
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+
+from PIL import Image
+
+from converter.engine import ConversionEngine, ConversionSettings
+from converter.manifest import Manifest
+
+
+def convert(path, manifest, **settings):
+    engine = ConversionEngine(ConversionSettings('WebP', **settings), workers=1,
+                              manifest=manifest)
+    [result] = engine.iter_results([path])
+    assert result.ok
+    return result
+
+
+def make_source(tmp_path, colour='red'):
+    path = str(tmp_path / 'a.png')
+    Image.new('RGB', (16, 16), colour).save(path)
+    return path
+
+
+def test_unchanged_source_is_skipped(tmp_path):
+    path = make_source(tmp_path)
+    manifest = Manifest(str(tmp_path / 'manifest.db'))
+    assert not convert(path, manifest).skipped
+    result = convert(path, manifest)
+    assert result.skipped and result.output == str(tmp_path / 'a.webp')
+
+
+def test_changed_mtime_is_redone(tmp_path):
+    path = make_source(tmp_path)
+    manifest = Manifest(str(tmp_path / 'manifest.db'))
+    convert(path, manifest)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert not convert(path, manifest).skipped
+    assert convert(path, manifest).skipped
+
+
+def test_touched_but_identical_source_is_skipped_with_hashes(tmp_path):
+    path = make_source(tmp_path)
+    manifest = Manifest(str(tmp_path / 'manifest.db'), use_hash=True)
+    convert(path, manifest)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert convert(path, manifest).skipped
+    # The new mtime is remembered, so the next check doesn't hash again
+    assert manifest.lookup(path, str(tmp_path / 'a.webp'))[1] == st.st_mtime_ns + 10**9
+
+
+def test_changed_size_is_redone(tmp_path):
+    path = make_source(tmp_path)
+    manifest = Manifest(str(tmp_path / 'manifest.db'), use_hash=True)
+    convert(path, manifest)
+    st = os.stat(path)
+    Image.new('RGB', (32, 32), 'blue').save(path)
+    # Same mtime, so only the size gives the change away
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert os.path.getsize(path) != st.st_size
+    assert not convert(path, manifest).skipped
+
+
+def test_changed_settings_are_redone(tmp_path):
+    path = make_source(tmp_path)
+    manifest = Manifest(str(tmp_path / 'manifest.db'))
+    convert(path, manifest, quality=80)
+    assert not convert(path, manifest, quality=60).skipped
+    assert convert(path, manifest, quality=60).skipped
+
+
+def test_changed_or_missing_output_is_redone(tmp_path):
+    path = make_source(tmp_path)
+    manifest = Manifest(str(tmp_path / 'manifest.db'))
+    output = convert(path, manifest).output
+    with open(output, 'ab') as f:
+        f.write(b'extra')
+    assert not convert(path, manifest).skipped
+    os.remove(output)
+    assert not convert(path, manifest).skipped
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = make_source(tmp_path)
+    db = str(tmp_path / 'manifest.db')
+    manifest = Manifest(db)
+    convert(path, manifest)
+    manifest.close()
+    assert convert(path, Manifest(db)).skipped
+
+
+def test_older_layouts_are_dropped(tmp_path):
+    db = str(tmp_path / 'manifest.db')
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE outputs (source TEXT)")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+    path = make_source(tmp_path)
+    manifest = Manifest(db)
+    assert not convert(path, manifest).skipped
+    assert convert(path, manifest).skipped
@@ -0,0 +1,16 @@
+from PIL import Image
+
+from converter.mapped import raw_layout
+
+
+def test_raw_layout_reads_plain_tuple_tiles(tmp_path):
+    path = tmp_path / 'strip.bmp'
+    Image.new('RGB', (40, 30), (10, 20, 30)).save(path)
+    with Image.open(path) as img:
+        expected = raw_layout(img)
+        # Pillow before 11 has plain tuples, without the named fields
+        img.tile = [tuple(tile) for tile in img.tile]
+        assert raw_layout(img) == expected
+    assert expected is not None
+    offset, rawmode, row_bytes, orientation = expected
+    assert (rawmode, row_bytes, orientation) == ('BGR', 120, -1)
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from converter.output import OutputPlanner, write_atomic
+
+
+def test_suffix_picks_the_first_free_name(tmp_path):
+    source = str(tmp_path / 'a.png')
+    planner = OutputPlanner([source], 'suffix')
+    assert planner.claim(source, source) == str(tmp_path / 'a-1.png')
+    assert planner.claim('b.png', source) == str(tmp_path / 'a-2.png')
+    assert planner.owner(str(tmp_path / 'a-1.png')) == source
+
+
+def test_skip_leaves_taken_names_out():
+    planner = OutputPlanner(['a.png'], 'skip')
+    assert planner.claim('a.png', 'a.png') is None
+    assert planner.claim('b.png', 'out.webp') == 'out.webp'
+    assert planner.claim('c.png', 'out.webp') is None
+    assert planner.owner('out.webp') == 'b.png'
+
+
+def test_overwrite_keeps_the_path():
+    planner = OutputPlanner([], 'overwrite')
+    assert planner.claim('a.png', 'out.webp') == 'out.webp'
+    assert planner.claim('b.png', 'out.webp') == 'out.webp'
+    assert planner.owner('out.webp') == 'b.png'
+
+
+def test_alternate_extensions_are_claimed_together():
+    planner = OutputPlanner([], 'suffix')
+    assert planner.claim('a.bmp', 'out.png', ('.webp',)) == 'out.png'
+    assert planner.claim('b.bmp', 'out.webp') == 'out-1.webp'
+    assert planner.owner('out.png', ('.webp',)) == 'a.bmp'
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        OutputPlanner([], 'rename')
+
+
+def test_write_atomic_replaces_the_file(tmp_path):
+    path = tmp_path / 'out.bin'
+    path.write_bytes(b'old')
+    write_atomic(str(path), b'new' * 10, chunk_size=4)
+    assert path.read_bytes() == b'new' * 10
+    assert os.listdir(tmp_path) == ['out.bin']
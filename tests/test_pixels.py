@@ -0,0 +1,31 @@
+import pytest
+from PIL import Image
+
+from converter.pixels import _to_8bit_numpy, _to_8bit_pillow
+
+pytest.importorskip('numpy')
+
+
+def grey16(values, mode='I;16'):
+    img = Image.new('I', (len(values), 1))
+    img.putdata(values)
+    return img if mode == 'I' else img.convert(mode)
+
+
+@pytest.mark.parametrize('values', [
+    list(range(0, 256)),
+    list(range(0, 65536, 97)) + [65535],
+    [0, 1, 127, 128, 129, 255, 256, 257, 385, 32767, 32768, 65534, 65535],
+])
+@pytest.mark.parametrize('mode', ['I;16', 'I;16B', 'I'])
+def test_numpy_and_pillow_paths_agree(values, mode):
+    img = grey16(values, mode)
+    with_numpy, with_pillow = _to_8bit_numpy(img), _to_8bit_pillow(img)
+    assert with_pillow.mode == with_numpy.mode == 'L'
+    assert with_pillow.tobytes() == with_numpy.tobytes()
+
+
+def test_dark_16bit_image_stays_dark():
+    # Every value fits in 8 bits, but it's still 16 bit data
+    flat = _to_8bit_pillow(grey16([0, 100, 200, 255]))
+    assert flat.tobytes() == bytes([0, 0, 1, 1])
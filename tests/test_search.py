@@ -0,0 +1,96 @@
+import math
+import random
+
+import pytest
+from PIL import Image
+
+from converter import search
+from converter.search import MIN_QUALITY, _largest, _smallest, psnr, search_quality
+
+
+def photo():
+    """Noise over a gradient: its size and PSNR both follow quality."""
+    noise = Image.frombytes('L', (128, 128), random.Random(0).randbytes(128 * 128))
+    noise = Image.blend(noise, Image.new('L', noise.size, 128), 0.7)
+    gradient = Image.linear_gradient('L').resize((128, 128))
+    return Image.merge('RGB', (noise, gradient, Image.blend(noise, gradient, 0.5)))
+
+
+def size_at(img, output_format, quality):
+    return search.encode(img, output_format, {'quality': quality}).getbuffer().nbytes
+
+
+@pytest.fixture
+def encodes(monkeypatch):
+    """Qualities encoded by search_quality, in order."""
+    seen = []
+    encode = search.encode
+
+    def counting_encode(img, output_format, options):
+        seen.append(options['quality'])
+        return encode(img, output_format, options)
+
+    monkeypatch.setattr(search, 'encode', counting_encode)
+    return seen
+
+
+def test_bisection_finds_the_boundary():
+    assert _largest(5, 95, lambda q: q <= 42) == 42
+    assert _largest(5, 95, lambda q: False) is None
+    assert _smallest(5, 95, lambda q: q >= 42) == 42
+    assert _smallest(5, 95, lambda q: False) is None
+
+
+@pytest.mark.parametrize('output_format', ['JPEG', 'WebP'])
+def test_max_bytes_picks_the_highest_quality_that_fits(output_format, encodes):
+    img = photo()
+    max_bytes = (size_at(img, output_format, 30) + size_at(img, output_format, 70)) // 2
+    encodes.clear()
+    buffer, quality = search_quality(img, output_format, {'quality': 90}, max_bytes=max_bytes)
+    assert buffer.getbuffer().nbytes <= max_bytes
+    assert 30 <= quality < 70
+    # Each quality at most once, and about log2(range) of them
+    assert len(encodes) == len(set(encodes)) <= 2 + math.ceil(math.log2(90 - MIN_QUALITY))
+
+
+def test_max_bytes_that_fits_keeps_the_ceiling(encodes):
+    buffer, quality = search_quality(photo(), 'JPEG', {'quality': 80}, max_bytes=10**9)
+    assert quality == 80
+    assert encodes == [80]
+
+
+def test_max_bytes_out_of_reach_falls_back_to_the_minimum():
+    buffer, quality = search_quality(photo(), 'JPEG', {'quality': 80}, max_bytes=10)
+    assert quality == MIN_QUALITY
+
+
+@pytest.mark.parametrize('output_format', ['JPEG', 'WebP'])
+def test_target_psnr_picks_the_lowest_quality_that_reaches_it(output_format, encodes):
+    img = photo()
+    low, high = (psnr(img, search.encode(img, output_format, {'quality': quality}))
+                 for quality in (20, 80))
+    target = (low + high) / 2
+    encodes.clear()
+    buffer, quality = search_quality(img, output_format, {'quality': 95}, target_psnr=target)
+    assert psnr(img, buffer) >= target
+    assert 20 < quality <= 80
+    assert len(encodes) == len(set(encodes)) <= 1 + math.ceil(math.log2(95 - MIN_QUALITY + 1))
+
+
+def test_target_psnr_out_of_reach_keeps_the_ceiling():
+    buffer, quality = search_quality(photo(), 'JPEG', {'quality': 70}, target_psnr=200.0)
+    assert quality == 70
+
+
+def test_max_bytes_caps_a_psnr_choice():
+    img = photo()
+    max_bytes = size_at(img, 'JPEG', 40)
+    buffer, quality = search_quality(img, 'JPEG', {'quality': 95}, max_bytes=max_bytes,
+                                     target_psnr=60.0)
+    assert buffer.getbuffer().nbytes <= max_bytes
+    assert quality <= 40
+
+
+def test_lossless_candidate_has_infinite_psnr():
+    img = photo()
+    assert psnr(img, search.encode(img, 'PNG', {})) == math.inf
@@ -0,0 +1,25 @@
+import pytest
+from PIL import Image, ImageChops
+
+from converter.transforms import flatten_alpha
+
+
+def make_source(mode):
+    gradient = Image.linear_gradient('L').resize((64, 48))
+    if mode == 'LA':
+        return Image.merge('LA', (gradient, gradient.rotate(90, expand=True).resize((64, 48))))
+    rgba = Image.merge('RGBA', (gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT),
+                                gradient.transpose(Image.Transpose.FLIP_TOP_BOTTOM),
+                                gradient.transpose(Image.Transpose.ROTATE_180)))
+    return rgba if mode == 'RGBA' else rgba.convert('PA')
+
+
+@pytest.mark.parametrize('mode', ['RGBA', 'LA', 'PA'])
+@pytest.mark.parametrize('background', [(255, 255, 255), (10, 200, 60)])
+def test_flatten_matches_alpha_composite(mode, background):
+    img = make_source(mode)
+    expected = Image.alpha_composite(Image.new('RGBA', img.size, background + (255,)),
+                                     img.convert('RGBA')).convert('RGB')
+    flat = flatten_alpha(img, background)
+    assert flat.mode == 'RGB'
+    assert ImageChops.difference(flat, expected).getbbox() is None